@@ -0,0 +1,8 @@
+"""
+Throughput benchmarks for jsonlog-cli.
+
+Run `python -m benchmarks` from the `jsonlog-cli` directory to generate synthetic logs
+and measure how quickly each stream and pattern reads them, both in-process and
+through the `jsonlog` command. Results are compared with `benchmarks/baseline.json`,
+which `--save` replaces. Baselines are only comparable on the same machine.
+"""
@@ -0,0 +1,245 @@
+"""
+Run the benchmarks, comparing the results with a stored baseline.
+
+Each case runs in a new Python process so that its peak RSS can be measured, and
+is repeated to take the fastest time. In-process cases time reading a file through a
+stream or a `StreamHandler`; `cli-*` cases time a whole run of `jsonlog`, including
+starting Python.
+"""
+
+import json
+import os
+import pathlib
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import typing
+
+import click
+
+import benchmarks.generators
+import jsonlog_cli.config
+import jsonlog_cli.pattern
+import jsonlog_cli.stream
+
+ROOT = pathlib.Path(__file__).parent.parent
+BASELINE_PATH = ROOT / "benchmarks" / "baseline.json"
+
+KEYVALUE = {"multiline_keys": ["traceback", "stacktrace"]}
+TEMPLATE = {"format": "{timestamp} {level:<8} {name|-} {message}"}
+
+TARGETS = (
+    "json-stream",
+    "buffered-json-stream",
+    "kv",
+    "template",
+    "raw",
+    "cli-kv",
+    "cli-template",
+    "cli-raw",
+)
+
+Result = typing.Dict[str, float]
+
+
+def config(multiline: bool) -> typing.Dict[str, typing.Any]:
+    """The patterns used by the benchmarks, in the config file format."""
+    return {
+        "keyvalues": {"benchmark": {**KEYVALUE, "multiline_json": multiline}},
+        "templates": {"benchmark": {**TEMPLATE, "multiline_json": multiline}},
+    }
+
+
+def peak_rss() -> float:
+    """Return this process's peak RSS in MiB."""
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, but macOS reports bytes.
+    return maxrss / 1024 / (1024 if sys.platform == "darwin" else 1)
+
+
+def run_in_process(target: str, path: str, multiline: bool) -> None:
+    if target in ("json-stream", "buffered-json-stream"):
+        stream_class = (
+            jsonlog_cli.stream.JSONStream
+            if target == "json-stream"
+            else jsonlog_cli.stream.BufferedJSONStream
+        )
+        with open(path, encoding="utf-8") as file:
+            for _ in stream_class(file).consume():
+                pass
+        return
+
+    patterns = jsonlog_cli.config.Config.parse_obj(config(multiline))
+    pattern: jsonlog_cli.pattern.Pattern
+    if target == "kv":
+        pattern = patterns.keyvalues["benchmark"]
+    elif target == "template":
+        pattern = patterns.templates["benchmark"]
+    else:
+        pattern = jsonlog_cli.pattern.RawPattern(multiline_json=True)
+
+    with open(path, encoding="utf-8") as file:
+        with jsonlog_cli.stream.StreamHandler(pattern) as handler:
+            handler.consume([file])
+
+
+def run_cli(target: str, path: str, config_path: str) -> None:
+    # The CLI's imports are part of the time taken to run a command.
+    import jsonlog_cli.cli
+
+    _, _, command = target.partition("-")
+    args = {
+        "kv": ["kv", "--pattern", "benchmark"],
+        "template": ["template", "--template", "benchmark"],
+        "raw": ["raw"],
+    }[command]
+    jsonlog_cli.cli.main.main(
+        ["--config", config_path, "--log-path", os.devnull, *args, path],
+        prog_name="jsonlog",
+        standalone_mode=False,
+    )
+
+
+@click.group(invoke_without_command=True)
+@click.option("--records", default=20_000, show_default=True, help="Records per log.")
+@click.option("--repeat", default=3, show_default=True, help="Runs of each case.")
+@click.option(
+    "-d",
+    "--dataset",
+    "datasets",
+    type=click.Choice(list(benchmarks.generators.DATASETS)),
+    multiple=True,
+    help="Only generate these logs.",
+)
+@click.option(
+    "-t",
+    "--target",
+    "targets",
+    type=click.Choice(TARGETS),
+    multiple=True,
+    help="Only run these cases.",
+)
+@click.option(
+    "--baseline",
+    "baseline_path",
+    type=click.Path(dir_okay=False),
+    default=str(BASELINE_PATH),
+    show_default=True,
+    help="Results to compare with.",
+)
+@click.option("--save", is_flag=True, help="Save the results to the baseline.")
+@click.pass_context
+def main(
+    ctx: click.Context,
+    records: int,
+    repeat: int,
+    datasets: typing.Sequence[str],
+    targets: typing.Sequence[str],
+    baseline_path: str,
+    save: bool,
+) -> None:
+    """Measure throughput for each log and case."""
+    if ctx.invoked_subcommand is not None:
+        return
+
+    baseline: typing.Dict[str, Result] = {}
+    if os.path.exists(baseline_path):
+        with open(baseline_path) as file:
+            baseline = json.load(file)
+
+    results: typing.Dict[str, Result] = {}
+    with tempfile.TemporaryDirectory(prefix="jsonlog-benchmarks-") as directory:
+        for name in datasets or benchmarks.generators.DATASETS:
+            dataset = benchmarks.generators.DATASETS[name]
+            path = pathlib.Path(directory) / f"{name}.log"
+            size = benchmarks.generators.write(dataset, path, records)
+            config_path = pathlib.Path(directory) / f"{name}.json"
+            config_path.write_text(json.dumps(config(dataset.multiline)))
+
+            for target in targets or TARGETS:
+                case = f"{name}/{target}"
+                runs = [
+                    run_case(target, path, config_path, dataset.multiline, directory)
+                    for _ in range(repeat)
+                ]
+                seconds = min(run["seconds"] for run in runs)
+                results[case] = {
+                    "mb_per_second": round(size / seconds / 1e6, 2),
+                    "records_per_second": round(records / seconds),
+                    "peak_rss_mib": round(max(run["peak_rss_mib"] for run in runs), 1),
+                }
+                click.echo(report(case, results[case], baseline.get(case)))
+
+    if save:
+        # Cases that weren't run keep their previous results.
+        with open(baseline_path, "w") as file:
+            json.dump({**baseline, **results}, file, indent=2, sort_keys=True)
+            file.write("\n")
+
+
+@main.command(hidden=True)
+@click.argument("target", type=click.Choice(TARGETS))
+@click.argument("path")
+@click.argument("config_path")
+@click.option("--multiline", is_flag=True)
+def case(target: str, path: str, config_path: str, multiline: bool) -> None:
+    """Run a single case, printing its time and peak RSS as JSON."""
+    results = sys.stdout
+    sys.stdout = sys.stderr = open(os.devnull, "w", encoding="utf-8")
+
+    start = time.perf_counter()
+    if target.startswith("cli-"):
+        run_cli(target, path, config_path)
+    else:
+        run_in_process(target, path, multiline)
+    seconds = time.perf_counter() - start
+
+    json.dump({"seconds": seconds, "peak_rss_mib": peak_rss()}, results)
+
+
+def run_case(
+    target: str,
+    path: pathlib.Path,
+    config_path: pathlib.Path,
+    multiline: bool,
+    directory: str,
+) -> Result:
+    command = [sys.executable, "-m", "benchmarks", "case", target]
+    command += [str(path), str(config_path)]
+    if multiline:
+        command.append("--multiline")
+    # Keep the config cache out of the user's cache directory.
+    env = {**os.environ, "XDG_CACHE_HOME": directory}
+
+    start = time.perf_counter()
+    output = subprocess.run(
+        command, cwd=ROOT, env=env, check=True, stdout=subprocess.PIPE
+    )
+    elapsed = time.perf_counter() - start
+
+    result: Result = json.loads(output.stdout)
+    if target.startswith("cli-"):
+        # Starting Python and importing the CLI are part of running a command.
+        result["seconds"] = elapsed
+    return result
+
+
+def report(case: str, result: Result, baseline: typing.Optional[Result]) -> str:
+    columns = [f"{case:<36}"]
+    for key, unit in (
+        ("mb_per_second", "MB/s"),
+        ("records_per_second", "records/s"),
+        ("peak_rss_mib", "MiB"),
+    ):
+        text = f"{result[key]:>10,} {unit}"
+        if baseline and baseline.get(key):
+            change = (result[key] - baseline[key]) / baseline[key]
+            text += f" ({change:+.0%})"
+        columns.append(f"{text:<26}")
+    return "".join(columns).rstrip()
+
+
+if __name__ == "__main__":
+    main()
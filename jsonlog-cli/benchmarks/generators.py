@@ -0,0 +1,196 @@
+"""
+Deterministic synthetic logs.
+
+Each generator takes a seeded `random.Random` and a number of records, and yields the
+text of each record (including its trailing newline). The same seed always produces
+the same logs, so runs of the benchmarks can be compared.
+"""
+
+import datetime
+import json
+import logging
+import pathlib
+import random
+import typing
+
+import jsonlog.formatter
+
+Generator = typing.Callable[[random.Random, int], typing.Iterator[str]]
+
+START = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+
+LEVELS = ("DEBUG", "INFO", "INFO", "INFO", "WARNING", "ERROR")
+NAMES = ("app", "app.db", "app.http", "app.tasks", "urllib3.connectionpool")
+WORDS = (
+    "request",
+    "user",
+    "session",
+    "cache",
+    "retrying",
+    "connection",
+    "timeout",
+    "completed",
+    "failed",
+    "started",
+)
+PATHS = ("/", "/login", "/api/v1/items", "/api/v1/users", "/static/app.js")
+
+
+class Formatter(jsonlog.formatter.JSONFormatter):
+    def format_time(self, time: float) -> jsonlog.formatter.JSONValue:
+        """Use UTC, so that the output doesn't depend on the local timezone."""
+        utc = datetime.datetime.fromtimestamp(time, datetime.timezone.utc)
+        return utc.isoformat(timespec=self.timespec)
+
+
+class Dataset(typing.NamedTuple):
+    name: str
+    description: str
+    generate: Generator
+    multiline: bool = False
+
+
+def timestamp(i: int) -> str:
+    time = START + datetime.timedelta(milliseconds=250 * i)
+    return time.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def sentence(rng: random.Random, length: int = 6) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(length))
+
+
+def traceback(rng: random.Random, frames: int) -> str:
+    lines = ["Traceback (most recent call last):"]
+    for i in range(frames):
+        module = rng.choice(NAMES).replace(".", "/")
+        lines.append(f'  File "/srv/{module}.py", line {rng.randint(1, 900)}, in f{i}')
+        lines.append(f"    {rng.choice(WORDS)}({rng.choice(WORDS)}, timeout=30)")
+    lines.append(f"ValueError: {sentence(rng)}")
+    return "\n".join(lines)
+
+
+def jsonlog_records(rng: random.Random, count: int) -> typing.Iterator[str]:
+    """Records written by `jsonlog.formatter.JSONFormatter`."""
+    formatter = Formatter()
+    for i in range(count):
+        level = rng.choice(LEVELS)
+        record = logging.makeLogRecord(
+            {
+                "name": rng.choice(NAMES),
+                "levelname": level,
+                "levelno": logging.getLevelName(level),
+                "msg": "%s %d",
+                "args": (sentence(rng), i),
+                "created": START.timestamp() + i / 4,
+                "user": f"u{rng.randint(0, 1000)}",
+                "request_id": f"{rng.getrandbits(64):016x}",
+            }
+        )
+        yield formatter.format(record) + "\n"
+
+
+def elasticsearch(rng: random.Random, count: int) -> typing.Iterator[str]:
+    """Pretty-printed records like Elasticsearch writes, some with stack traces."""
+    for i in range(count):
+        record: typing.Dict[str, typing.Any] = {
+            "type": "server",
+            "timestamp": timestamp(i),
+            "level": rng.choice(LEVELS),
+            "component": f"o.e.{rng.choice(WORDS)}.{rng.choice(WORDS)}",
+            "cluster.name": "benchmark",
+            "node.name": f"node-{rng.randint(0, 4)}",
+            "message": sentence(rng, 10),
+        }
+        if rng.random() < 0.2:
+            record["stacktrace"] = traceback(rng, 8).splitlines()
+        yield json.dumps(record, indent=2) + "\n"
+
+
+def access(rng: random.Random, count: int) -> typing.Iterator[str]:
+    """Wide access logs, with the keys most patterns use near the start."""
+    for i in range(count):
+        record: typing.Dict[str, typing.Any] = {
+            "timestamp": timestamp(i),
+            "level": "INFO",
+            "message": f"GET {rng.choice(PATHS)}",
+            "status": rng.choice((200, 200, 200, 301, 404, 500)),
+            "duration_ms": round(rng.uniform(0.1, 900.0), 3),
+            "client_ip": ".".join(str(rng.randint(1, 254)) for _ in range(4)),
+            "user_agent": f"Mozilla/5.0 ({rng.choice(WORDS)}) Gecko/20100101",
+        }
+        for n in range(40):
+            record[f"header_{n}"] = f"{rng.choice(WORDS)}-{rng.getrandbits(32):08x}"
+        yield json.dumps(record) + "\n"
+
+
+def nested(rng: random.Random, count: int) -> typing.Iterator[str]:
+    """Records with deeply nested objects and arrays."""
+    for i in range(count):
+        value: typing.Any = {"leaf": sentence(rng, 3), "n": rng.randint(0, 100)}
+        for depth in range(12):
+            value = {f"level{depth}": value, "items": [depth, rng.random(), None]}
+        record = {
+            "timestamp": timestamp(i),
+            "level": rng.choice(LEVELS),
+            "message": sentence(rng),
+            "context": value,
+        }
+        yield json.dumps(record) + "\n"
+
+
+def tracebacks(rng: random.Random, count: int) -> typing.Iterator[str]:
+    """Error records where every record has a long traceback."""
+    for i in range(count):
+        record = {
+            "timestamp": timestamp(i),
+            "level": "ERROR",
+            "name": rng.choice(NAMES),
+            "message": sentence(rng),
+            "traceback": traceback(rng, rng.randint(10, 30)),
+        }
+        yield json.dumps(record) + "\n"
+
+
+def garbage(rng: random.Random, count: int) -> typing.Iterator[str]:
+    """Records mixed with plain text, truncated JSON and blank lines."""
+    for i in range(count):
+        line = json.dumps(
+            {
+                "timestamp": timestamp(i),
+                "level": rng.choice(LEVELS),
+                "message": sentence(rng),
+            }
+        )
+        roll = rng.random()
+        if roll < 0.1:
+            line = f"{timestamp(i)} plain text: {sentence(rng)}"
+        elif roll < 0.2:
+            end = rng.randint(1, len(line) - 1)
+            line = line[:end]
+        elif roll < 0.25:
+            line = ""
+        elif roll < 0.3:
+            line = json.dumps([sentence(rng, 2), i])
+        yield line + "\n"
+
+
+DATASETS: typing.Dict[str, Dataset] = {
+    dataset.name: dataset
+    for dataset in (
+        Dataset("jsonlog", "jsonlog's JSONFormatter", jsonlog_records),
+        Dataset("elasticsearch", "multiline JSON", elasticsearch, multiline=True),
+        Dataset("access", "wide access logs", access),
+        Dataset("nested", "deeply nested values", nested),
+        Dataset("tracebacks", "long tracebacks", tracebacks),
+        Dataset("garbage", "lines that aren't JSON", garbage),
+    )
+}
+
+
+def write(dataset: Dataset, path: pathlib.Path, records: int, seed: int = 0) -> int:
+    """Write a dataset to a file, returning its size in bytes."""
+    rng = random.Random(f"{dataset.name}-{seed}")
+    with path.open("w", encoding="utf-8") as file:
+        for text in dataset.generate(rng, records):
+            file.write(text)
+    return path.stat().st_size
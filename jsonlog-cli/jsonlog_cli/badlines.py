@@ -0,0 +1,85 @@
+"""
+Classify and count lines that can't be parsed as JSON records.
+
+Most lines that aren't records can be recognised without trying to decode them (they
+are blank, or don't start with `{`), which is much cheaper than raising and catching
+a `JSONDecodeError` for each one. Only the first few bad lines are written to the
+internal log, followed by a count of each kind of bad line once the input has been
+read.
+"""
+
+import collections
+import json
+import logging
+import textwrap
+import typing
+
+log = logging.getLogger(__name__)
+
+BLANK = "blank"
+NOT_OBJECT = "not an object"
+INCOMPLETE = "incomplete object"
+INVALID = "invalid JSON"
+
+# How many bad lines are written to the internal log before the rest are only counted.
+LOG_LIMIT = 10
+
+
+def classify(string: str) -> typing.Optional[str]:
+    """Return why a string can't be a JSON object, or None if it might be one."""
+    stripped = string.strip()
+    if not stripped:
+        return BLANK
+    if stripped[0] != "{":
+        return NOT_OBJECT
+    if stripped[-1] != "}":
+        return INCOMPLETE
+    return None
+
+
+class BadLines:
+    """Count lines that couldn't be parsed, logging only the first few."""
+
+    counts: typing.Counter[str]
+    limit: int
+
+    def __init__(self, limit: int = LOG_LIMIT) -> None:
+        self.counts = collections.Counter()
+        self.limit = limit
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    def add(self, reason: str, string: str) -> None:
+        self.counts[reason] += 1
+        total = self.total
+        if total > self.limit:
+            return
+
+        extra: typing.Dict[str, typing.Optional[str]] = {
+            "reason": reason,
+            "excerpt": textwrap.shorten(string, 100),
+        }
+        if reason == INVALID:
+            extra["error"] = error(string)
+        log.warning("Could not parse JSON", extra=extra)
+        if total == self.limit:
+            log.warning("Only counting further lines that could not be parsed")
+
+    def report(self) -> None:
+        """Log how many lines of each kind couldn't be parsed, if there were any."""
+        if self.counts:
+            log.warning(
+                "Lines that could not be parsed",
+                extra={"total": self.total, "counts": dict(self.counts)},
+            )
+
+
+def error(string: str) -> typing.Optional[str]:
+    """Describe why a string isn't valid JSON."""
+    try:
+        json.loads(string)
+    except json.JSONDecodeError as exc:
+        return str(exc)
+    return None
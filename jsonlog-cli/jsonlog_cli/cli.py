@@ -1,22 +1,525 @@
+import functools
+import json
 import logging
 import typing
 
 import click
 import xdg
 
+import jsonlog_cli.badlines
 import jsonlog_cli.config
+import jsonlog_cli.inputs
+import jsonlog_cli.levels
 import jsonlog_cli.pattern
+import jsonlog_cli.record
 import jsonlog_cli.stream
+import jsonlog_cli.tail
+import jsonlog_cli.template
+import jsonlog_cli.text
+import jsonlog_cli.timestamp
+
+# Modules that are only needed by some options or commands are imported when
+# they're used, so that starting the CLI doesn't wait for them.
+if typing.TYPE_CHECKING:
+    import jsonlog_cli.collapse
+    import jsonlog_cli.database
+    import jsonlog_cli.filter
+    import jsonlog_cli.live
+    import jsonlog_cli.sample
+    import jsonlog_cli.split
 
 log = logging.getLogger(__name__)
 
 DEFAULT_CONFIG_PATH = xdg.XDG_CONFIG_HOME / "jsonlog" / "config.json"
 DEFAULT_LOG_PATH = xdg.XDG_CACHE_HOME / "jsonlog" / "internal.log"
+DEFAULT_CONFIG_CACHE_PATH = xdg.XDG_CACHE_HOME / "jsonlog" / "config.pickle"
 
 streams_argument = click.argument(
-    "streams", type=click.File(encoding="utf-8"), metavar="STREAM", nargs=-1
+    "streams",
+    type=click.Path(exists=True, dir_okay=False, allow_dash=True),
+    metavar="STREAM",
+    nargs=-1,
+)
+
+where_option = click.option(
+    "-w",
+    "--where",
+    "where",
+    type=click.STRING,
+    multiple=True,
+    metavar="EXPR",
+    help="Only show records matching an expression (e.g. 'level>=warning').",
+)
+
+since_option = click.option(
+    "--since",
+    "since",
+    type=click.STRING,
+    metavar="TIME",
+    help="Only show records at or after a time (e.g. '2020-01-01T12:00', '10m').",
+)
+
+until_option = click.option(
+    "--until",
+    "until",
+    type=click.STRING,
+    metavar="TIME",
+    help="Only show records before a time.",
+)
+
+level_option = click.option(
+    "--level",
+    "level",
+    type=click.STRING,
+    metavar="LEVEL",
+    help="Only show records at or above a level (e.g. 'warning').",
+)
+
+follow_option = click.option(
+    "-F",
+    "--follow",
+    "follow",
+    is_flag=True,
+    help="Keep reading files as they grow, following truncation and rotation.",
+)
+
+lines_option = click.option(
+    "-n",
+    "--lines",
+    "lines",
+    type=click.IntRange(min=0),
+    metavar="N",
+    help="Only show the last N records of each stream.",
+)
+
+live_option = click.option(
+    "-L",
+    "--live",
+    "live",
+    is_flag=True,
+    help="Read all streams at the same time, showing records as they arrive.",
+)
+
+listen_option = click.option(
+    "--listen",
+    "listen",
+    type=click.STRING,
+    multiple=True,
+    metavar="ADDRESS",
+    help="Also read from connections to a TCP [HOST:]PORT or Unix socket path.",
+)
+
+prefix_option = click.option(
+    "--prefix",
+    "prefix",
+    is_flag=True,
+    help="Prefix each line with the stream it came from, instead of headers.",
+)
+
+merge_option = click.option(
+    "-M",
+    "--merge",
+    "merge",
+    is_flag=True,
+    help="Interleave records from all streams in timestamp order.",
+)
+
+slop_option = click.option(
+    "--slop",
+    "slop",
+    type=click.FloatRange(min=0),
+    default=0.0,
+    metavar="SECONDS",
+    help="Reorder records within each stream that are out of order by this much.",
+)
+
+collapse_option = click.option(
+    "-C",
+    "--collapse",
+    "collapse",
+    is_flag=True,
+    help="Show repeated records once, with a count (ignoring timestamps).",
+)
+
+collapse_key_option = click.option(
+    "--collapse-key",
+    "collapse_keys",
+    type=click.STRING,
+    multiple=True,
+    metavar="KEY",
+    help="Only compare these keys when collapsing repeated records.",
+)
+
+collapse_window_option = click.option(
+    "--collapse-window",
+    "collapse_window",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    metavar="N",
+    help="Also collapse records repeated within the last N distinct records.",
+)
+
+sample_option = click.option(
+    "--sample",
+    "sample",
+    type=click.FloatRange(min=0, max=1),
+    metavar="RATE",
+    help="Only show a random fraction of lines (e.g. 0.01), without decoding the rest.",
+)
+
+reservoir_option = click.option(
+    "--reservoir",
+    "reservoir",
+    type=click.IntRange(min=1),
+    metavar="N",
+    help="Only show N records chosen at random from the whole input.",
+)
+
+sample_by_option = click.option(
+    "--sample-by",
+    "sample_by",
+    type=click.STRING,
+    metavar="KEY",
+    help="Keep a --reservoir of N records for each value of a key (e.g. 'level').",
+)
+
+seed_option = click.option(
+    "--seed",
+    "seed",
+    type=click.INT,
+    help="Seed the random choices made by --sample and --reservoir.",
 )
 
+timestamp_key_option = click.option(
+    "--timestamp-key",
+    "timestamp_key",
+    type=click.STRING,
+    metavar="KEY",
+    help="Override the key for each record's timestamp.",
+)
+
+timestamp_format_option = click.option(
+    "--timestamp-format",
+    "timestamp_format",
+    type=click.STRING,
+    metavar="FORMAT",
+    help="Parse timestamps with a strptime format instead of as ISO 8601 or numbers.",
+)
+
+
+def stream_options(f: typing.Callable) -> typing.Callable:
+    """Add the arguments and options shared by commands that format streams."""
+    decorators = (
+        streams_argument,
+        where_option,
+        since_option,
+        until_option,
+        level_option,
+        lines_option,
+        follow_option,
+        live_option,
+        listen_option,
+        prefix_option,
+        merge_option,
+        slop_option,
+        collapse_option,
+        collapse_key_option,
+        collapse_window_option,
+        sample_option,
+        reservoir_option,
+        sample_by_option,
+        seed_option,
+        timestamp_key_option,
+        timestamp_format_option,
+    )
+    for decorator in reversed(decorators):
+        f = decorator(f)
+    return f
+
+
+def open_json_streams(
+    paths: typing.Sequence[str],
+    pattern: jsonlog_cli.pattern.Pattern,
+    where: "typing.Optional[jsonlog_cli.filter.Filter]" = None,
+) -> typing.Iterator[typing.Tuple[str, jsonlog_cli.stream.JSONStream]]:
+    """
+    Open each input as a stream of records, for commands that don't format them.
+
+    Lines that couldn't be parsed are reported once every input has been read.
+    """
+    stream_class = (
+        jsonlog_cli.stream.BufferedJSONStream
+        if pattern.is_multiline_json()
+        else jsonlog_cli.stream.JSONStream
+    )
+    seek = create_seek(where, pattern)
+    bad_lines = jsonlog_cli.badlines.BadLines()
+    for path in paths or [jsonlog_cli.inputs.STDIN]:
+        for stream in jsonlog_cli.inputs.open_streams([path], seek=seek):
+            yield path, stream_class(
+                stream,
+                prefilter=where.prefilter if where else None,
+                bad_lines=bad_lines,
+            )
+    bad_lines.report()
+
+
+def start_profiler(ctx: click.Context, output: typing.Optional[str]) -> None:
+    """Time each stage of the pipeline until the command exits."""
+    import jsonlog_cli.profile
+
+    profiler = jsonlog_cli.profile.Profiler(output=output)
+    profiler.start()
+    ctx.call_on_close(profiler.stop)
+
+
+def parse_where(
+    where: typing.Sequence[str],
+    pattern: jsonlog_cli.pattern.Pattern,
+    since: typing.Optional[str] = None,
+    until: typing.Optional[str] = None,
+    level: typing.Optional[str] = None,
+) -> "typing.Optional[jsonlog_cli.filter.Filter]":
+    """
+    Compile --where expressions, using the pattern's level key for levels.
+
+    Also adds the minimum level and time range from --level, --since and --until.
+    """
+    if not where and since is None and until is None and level is None:
+        return None
+
+    import jsonlog_cli.filter
+
+    try:
+        return jsonlog_cli.filter.Filter.parse(
+            where,
+            level_key=pattern.level_key,
+            level=parse_level(level),
+            since=parse_time(since, "'--since'"),
+            until=parse_time(until, "'--until'"),
+            timestamps=jsonlog_cli.timestamp.TimestampParser(
+                pattern.timestamp_key, format=pattern.timestamp_format
+            ),
+        )
+    except jsonlog_cli.filter.FilterError as error:
+        raise click.BadParameter(str(error), param_hint="'--where'")
+
+
+def select_pattern(
+    config: jsonlog_cli.config.Config,
+    kv_name: str,
+    template_name: typing.Optional[str],
+    template_format: typing.Optional[str],
+) -> jsonlog_cli.pattern.Pattern:
+    """Choose a key-value pattern, or a template if --template or --format is given."""
+    if template_name is None and template_format is None:
+        return config.keyvalues[kv_name]
+
+    template: jsonlog_cli.pattern.TemplatePattern
+    template = config.templates[template_name or "default"]
+    if template_format is not None:
+        try:
+            template = template.replace(
+                format=jsonlog_cli.template.Template.of(template_format)
+            )
+        except jsonlog_cli.template.TemplateError as error:
+            raise click.BadParameter(str(error), param_hint="'--format'")
+    return template
+
+
+def parse_level(value: typing.Optional[str]) -> typing.Optional[int]:
+    """Parse a level name or number for --level."""
+    if value is None:
+        return None
+    level_number = jsonlog_cli.levels.level_number(value)
+    if level_number is None and value.isdigit():
+        level_number = int(value)
+    if level_number is None:
+        raise click.BadParameter(f"Unknown level {value!r}", param_hint="'--level'")
+    return level_number
+
+
+def parse_time(
+    value: typing.Optional[str], param_hint: str
+) -> typing.Optional[jsonlog_cli.timestamp.Timestamp]:
+    if value is None:
+        return None
+    try:
+        return jsonlog_cli.timestamp.parse_time(value)
+    except jsonlog_cli.timestamp.TimestampError as error:
+        raise click.BadParameter(str(error), param_hint=param_hint)
+
+
+def create_seek(
+    where: "typing.Optional[jsonlog_cli.filter.Filter]",
+    pattern: jsonlog_cli.pattern.Pattern,
+) -> typing.Optional[jsonlog_cli.inputs.Seek]:
+    """Skip parts of files that can't match a filter, using an index or a search."""
+    # Skipping parts of files relies on each line being a record, so isn't possible
+    # with multiline JSON.
+    if where is None or pattern.is_multiline_json():
+        return None
+
+    import jsonlog_cli.search
+
+    return functools.partial(jsonlog_cli.search.seek, where)
+
+
+def create_collapser(
+    collapse: bool,
+    keys: typing.Sequence[str],
+    window: int,
+    pattern: jsonlog_cli.pattern.Pattern,
+) -> "typing.Optional[jsonlog_cli.collapse.Collapser]":
+    """Collapse repeated records if --collapse or --collapse-key are given."""
+    if not collapse and not keys:
+        return None
+
+    import jsonlog_cli.collapse
+
+    return jsonlog_cli.collapse.Collapser(
+        keys=keys or None, timestamp_key=pattern.timestamp_key, window=window
+    )
+
+
+def create_samplers(
+    sample: typing.Optional[float],
+    reservoir: typing.Optional[int],
+    sample_by: typing.Optional[str],
+    seed: typing.Optional[int],
+) -> typing.Tuple[
+    "typing.Optional[jsonlog_cli.sample.Bernoulli]",
+    "typing.Optional[jsonlog_cli.sample.Reservoir]",
+]:
+    """Sample lines if --sample is given, and records if --reservoir is given."""
+    if sample_by is not None and reservoir is None:
+        raise click.UsageError("--sample-by can only be used with --reservoir.")
+    if sample is None and reservoir is None:
+        return None, None
+
+    import random
+
+    import jsonlog_cli.sample
+
+    rng = random.Random(seed)
+    return (
+        None if sample is None else jsonlog_cli.sample.Bernoulli(sample, rng=rng),
+        None
+        if reservoir is None
+        else jsonlog_cli.sample.Reservoir(reservoir, key=sample_by, rng=rng),
+    )
+
+
+def parse_listen(
+    listen: typing.Sequence[str],
+) -> typing.List["jsonlog_cli.live.Address"]:
+    if not listen:
+        return []
+
+    import jsonlog_cli.live
+
+    try:
+        return [jsonlog_cli.live.Address.parse(address) for address in listen]
+    except ValueError as error:
+        raise click.BadParameter(str(error), param_hint="'--listen'")
+
+
+def consume(
+    pattern: jsonlog_cli.pattern.Pattern,
+    streams: typing.Sequence[str],
+    where: typing.Sequence[str],
+    since: typing.Optional[str],
+    until: typing.Optional[str],
+    level: typing.Optional[str],
+    lines: typing.Optional[int],
+    follow: bool,
+    live: bool,
+    listen: typing.Sequence[str],
+    prefix: bool,
+    merge: bool,
+    slop: float,
+    collapse: bool,
+    collapse_keys: typing.Sequence[str],
+    collapse_window: int,
+    sample: typing.Optional[float],
+    reservoir: typing.Optional[int],
+    sample_by: typing.Optional[str],
+    seed: typing.Optional[int],
+    timestamp_key: typing.Optional[str],
+    timestamp_format: typing.Optional[str],
+) -> None:
+    """Format each stream using a pattern."""
+    if merge and (follow or live or listen):
+        raise click.UsageError("--merge can't be used with --follow or --live.")
+    if lines is not None and (merge or live or listen):
+        raise click.UsageError("--lines can't be used with --merge or --live.")
+    if reservoir is not None and (lines is not None or follow or live or listen):
+        raise click.UsageError(
+            "--reservoir can't be used with --lines, --follow or --live."
+        )
+    # Runs are only shown once they've ended, so the latest record would be held back
+    # for as long as a followed input stays quiet.
+    if (collapse or collapse_keys) and (follow or live or listen):
+        raise click.UsageError("--collapse can't be used with --follow or --live.")
+
+    pattern = pattern.replace(
+        timestamp_key=timestamp_key, timestamp_format=timestamp_format
+    )
+    where_filter = parse_where(where, pattern, since=since, until=until, level=level)
+    addresses = parse_listen(listen)
+    collapser = create_collapser(collapse, collapse_keys, collapse_window, pattern)
+    sampler, reservoir_sampler = create_samplers(sample, reservoir, sample_by, seed)
+
+    seek = create_seek(where_filter, pattern)
+
+    handler = jsonlog_cli.stream.StreamHandler(
+        pattern,
+        where=where_filter,
+        prefix=prefix,
+        collapser=collapser,
+        sampler=sampler,
+        reservoir=reservoir_sampler,
+    )
+    with handler:
+        if live or addresses:
+            # STDIN is only read by default if there's nothing else to read.
+            paths = streams or ([] if addresses else [jsonlog_cli.inputs.STDIN])
+            handler.live(paths, addresses, follow=follow)
+            return
+
+        if merge:
+            with jsonlog_cli.inputs.open_all(streams, seek=seek) as opened:
+                handler.merge(opened, slop=slop)
+            return
+
+        # Reading the end of each file replaces skipping to the parts that match.
+        tail = None if lines is None else jsonlog_cli.tail.Tail(handler, lines)
+
+        if not follow:
+            if tail is not None:
+                tail.consume(streams)
+            else:
+                handler.consume(jsonlog_cli.inputs.open_streams(streams, seek=seek))
+            return
+
+        # Compressed archives can't grow, so they're read before following the
+        # remaining files. STDIN is always followed until it's closed, so there's
+        # nothing to do differently if it's the only stream left.
+        archives = [s for s in streams if jsonlog_cli.inputs.is_compressed(s)]
+        growing = [s for s in streams if s not in archives]
+        if archives:
+            if tail is not None:
+                tail.consume(archives)
+            else:
+                handler.consume(jsonlog_cli.inputs.open_streams(archives))
+        if any(s != jsonlog_cli.inputs.STDIN for s in growing):
+            handler.follow(growing, None if tail is None else tail.positions(growing))
+        elif tail is not None:
+            tail.consume(growing)
+        elif growing or not archives:
+            handler.consume(jsonlog_cli.inputs.open_streams(growing), follow=True)
+
 
 class AliasedGroup(click.Group):
     def list_commands(self, ctx: typing.Any) -> typing.Sequence[str]:
@@ -55,14 +558,39 @@ class AliasedGroup(click.Group):
     show_default=True,
     help="Log level for internal logs.",
 )
+@click.option(
+    "--profile",
+    "profile",
+    is_flag=True,
+    help="Show the time spent in each stage on STDERR when finished.",
+)
+@click.option(
+    "--profile-output",
+    "profile_output",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Also write cProfile data for the whole run to a file.",
+)
 @click.pass_context
-def main(ctx: click.Context, log_path: str, log_level: str, config_path: str) -> None:
+def main(
+    ctx: click.Context,
+    log_path: str,
+    log_level: str,
+    config_path: str,
+    profile: bool,
+    profile_output: typing.Optional[str],
+) -> None:
     """
     Format JSON messages.
     """
+    if profile or profile_output:
+        start_profiler(ctx, profile_output)
+
     jsonlog_cli.config.configure_logging(log_path, log_level)
+    jsonlog_cli.text.watch_terminal_size()
 
-    ctx.obj = jsonlog_cli.config.Config.load(config_path)
+    ctx.obj = jsonlog_cli.config.Config.load(
+        config_path, cache_path=DEFAULT_CONFIG_CACHE_PATH.as_posix()
+    )
 
     if ctx.invoked_subcommand is None:
         ctx.invoke(format_key_value)
@@ -78,7 +606,7 @@ def display_config(config: jsonlog_cli.config.Config) -> None:
 
 
 @click.command("key-value")
-@streams_argument
+@stream_options
 @click.option(
     "-p",
     "--pattern",
@@ -122,12 +650,12 @@ def display_config(config: jsonlog_cli.config.Config) -> None:
 @click.pass_obj
 def format_key_value(
     config: jsonlog_cli.config.Config,
-    streams: typing.Sequence[jsonlog_cli.stream.TextStream],
     kv_name: str,
     kv_level_key: typing.Optional[str],
     kv_multiline_keys: typing.Sequence[str],
     kv_priority_keys: typing.Sequence[str],
     kv_remove_keys: typing.Sequence[str],
+    **options: typing.Any,
 ) -> None:
     """
     Format messages as coloured key=value lines (aliases: k, kv).
@@ -141,21 +669,35 @@ def format_key_value(
 
     log.debug("Selected pattern", extra={"pattern": pattern.dict()})
 
-    with jsonlog_cli.stream.StreamHandler(pattern=pattern) as handler:
-        handler.consume(streams)
+    consume(pattern, **options)
 
 
 @click.command("raw")
-@streams_argument
-def format_raw(streams: typing.Sequence[jsonlog_cli.stream.TextStream]) -> None:
+@click.option(
+    "--compact",
+    "compact",
+    is_flag=True,
+    help="Re-encode records without spaces after separators.",
+)
+@click.option(
+    "--sort-keys",
+    "sort_keys",
+    is_flag=True,
+    help="Re-encode records with sorted keys.",
+)
+@stream_options
+def format_raw(compact: bool, sort_keys: bool, **options: typing.Any) -> None:
     """
     Format messages as JSON lines (aliases: r).
 
     Buffers JSON so messages split over multiple lines will be output as a single line.
+    Records that are already on a single line are output unchanged, unless --compact
+    or --sort-keys are given.
     """
-    pattern = jsonlog_cli.pattern.RawPattern(multiline_json=True)
-    with jsonlog_cli.stream.StreamHandler(pattern=pattern) as handler:
-        handler.consume(streams)
+    pattern = jsonlog_cli.pattern.RawPattern(
+        multiline_json=True, compact=compact, sort_keys=sort_keys
+    )
+    consume(pattern, **options)
 
 
 @click.command("template")
@@ -184,26 +726,629 @@ def format_raw(streams: typing.Sequence[jsonlog_cli.stream.TextStream]) -> None:
     metavar="TEMPLATE",
     help="Override the template's format.",
 )
-@streams_argument
+@stream_options
 @click.pass_obj
 def format_template(
     config: jsonlog_cli.config.Config,
-    streams: typing.Sequence[jsonlog_cli.stream.TextStream],
     template_multiline_keys: typing.Sequence[str],
     template_name: str,
     template_format: str,
+    **options: typing.Any,
 ) -> None:
     """Format messages as templated lines (aliases: t)."""
     template: jsonlog_cli.pattern.TemplatePattern = config.templates[template_name]
+    if template_format is not None:
+        try:
+            template_format = jsonlog_cli.template.Template.of(template_format)
+        except jsonlog_cli.template.TemplateError as error:
+            raise click.BadParameter(str(error), param_hint="'--format'")
     template = template.replace(format=template_format)
     template = template.add_multiline_keys(template_multiline_keys)
 
-    with jsonlog_cli.stream.StreamHandler(pattern=template) as handler:
-        handler.consume(streams)
+    consume(template, **options)
+
+
+@click.command("index")
+@click.argument(
+    "paths",
+    type=click.Path(exists=True, dir_okay=False),
+    metavar="FILE",
+    nargs=-1,
+    required=True,
+)
+@click.option(
+    "-p",
+    "--pattern",
+    "kv_name",
+    type=click.STRING,
+    default="default",
+    help="Use the level and timestamp keys from a named key-value pattern.",
+)
+@click.option(
+    "-l",
+    "--level-key",
+    "level_key",
+    type=click.STRING,
+    help="Override the key for each record's log level.",
+)
+@timestamp_key_option
+@timestamp_format_option
+@click.pass_obj
+def build_index(
+    config: jsonlog_cli.config.Config,
+    paths: typing.Sequence[str],
+    kv_name: str,
+    level_key: typing.Optional[str],
+    timestamp_key: typing.Optional[str],
+    timestamp_format: typing.Optional[str],
+) -> None:
+    """
+    Index files so --since, --until, --level and --where can skip through them.
+
+    Indexes are written alongside each file, and are updated incrementally when
+    files grow (aliases: i).
+    """
+    import jsonlog_cli.index
+
+    pattern: jsonlog_cli.pattern.KeyValuePattern = config.keyvalues[kv_name]
+    pattern = pattern.replace(
+        level_key=level_key,
+        timestamp_key=timestamp_key,
+        timestamp_format=timestamp_format,
+    )
+
+    for path in paths:
+        try:
+            index = jsonlog_cli.index.Index.update(
+                path,
+                level_key=pattern.level_key,
+                timestamp_key=pattern.timestamp_key,
+                timestamp_format=pattern.timestamp_format,
+            )
+        except (OSError, ValueError) as error:
+            raise click.FileError(path, hint=str(error))
+        click.echo(f"Indexed {path} ({len(index.blocks)} blocks)", err=True)
+
+
+def open_database(path: str) -> "jsonlog_cli.database.Database":
+    import sqlite3
+    import jsonlog_cli.database
+
+    try:
+        return jsonlog_cli.database.Database.open(path)
+    except (jsonlog_cli.database.DatabaseError, sqlite3.Error) as error:
+        raise click.FileError(path, hint=str(error))
+
+
+@click.command("load")
+@streams_argument
+@click.option(
+    "--db",
+    "db_path",
+    type=click.Path(dir_okay=False),
+    required=True,
+    metavar="PATH",
+    help="Path to the SQLite database, which is created if it doesn't exist.",
+)
+@click.option(
+    "-p",
+    "--pattern",
+    "kv_name",
+    type=click.STRING,
+    default="default",
+    help="Use the level, timestamp and multiline JSON settings of a named pattern.",
+)
+@click.option(
+    "-l",
+    "--level-key",
+    "level_key",
+    type=click.STRING,
+    help="Override the key for each record's log level.",
+)
+@click.option(
+    "--name-key",
+    "name_key",
+    type=click.STRING,
+    default="name",
+    show_default=True,
+    help="The key for each record's logger name.",
+)
+@click.option(
+    "--message-key",
+    "message_key",
+    type=click.STRING,
+    default="message",
+    show_default=True,
+    help="The key for each record's message.",
+)
+@timestamp_key_option
+@timestamp_format_option
+@click.pass_obj
+def load_database(
+    config: jsonlog_cli.config.Config,
+    streams: typing.Sequence[str],
+    db_path: str,
+    kv_name: str,
+    level_key: typing.Optional[str],
+    name_key: str,
+    message_key: str,
+    timestamp_key: typing.Optional[str],
+    timestamp_format: typing.Optional[str],
+) -> None:
+    """
+    Load records into a SQLite database to query with `jsonlog query` (aliases: l).
+
+    Each record is stored with its timestamp, level, name and message in indexed
+    columns. Loading a file again replaces its records, and is skipped if it hasn't
+    changed. Lines that aren't JSON are skipped.
+    """
+    import jsonlog_cli.database
+
+    pattern: jsonlog_cli.pattern.KeyValuePattern = config.keyvalues[kv_name]
+    pattern = pattern.replace(
+        level_key=level_key,
+        timestamp_key=timestamp_key,
+        timestamp_format=timestamp_format,
+    )
+    columns = jsonlog_cli.database.Columns(
+        timestamp_key=pattern.timestamp_key,
+        timestamp_format=pattern.timestamp_format,
+        level_key=pattern.level_key,
+        name_key=name_key,
+        message_key=message_key,
+    )
+    with open_database(db_path) as database:
+        for path, json_stream in open_json_streams(streams, pattern):
+            if database.loaded(path, columns):
+                click.echo(f"Skipped {path} (unchanged)", err=True)
+                continue
+            count = database.load(path, json_stream, columns)
+            click.echo(f"Loaded {path} ({count} records)", err=True)
+
+
+@click.command("query")
+@click.option(
+    "--db",
+    "db_path",
+    type=click.Path(exists=True, dir_okay=False),
+    required=True,
+    metavar="PATH",
+    help="Path to a SQLite database written by `jsonlog load`.",
+)
+@where_option
+@since_option
+@until_option
+@level_option
+@click.option(
+    "--name",
+    "name",
+    type=click.STRING,
+    metavar="NAME",
+    help="Only show records from a logger and its children.",
+)
+@click.option(
+    "--by-time",
+    "by_time",
+    is_flag=True,
+    help="Order records by timestamp instead of the order they were loaded in.",
+)
+@click.option(
+    "-p",
+    "--pattern",
+    "kv_name",
+    type=click.STRING,
+    default="default",
+    help="Use a named key-value pattern from configured templates",
+)
+@click.option(
+    "-t",
+    "--template",
+    "template_name",
+    type=click.STRING,
+    metavar="NAME",
+    help="Use a named template instead of a key-value pattern.",
+)
+@click.option(
+    "-f",
+    "--format",
+    "template_format",
+    type=click.STRING,
+    metavar="TEMPLATE",
+    help="Use a template format instead of a key-value pattern.",
+)
+@click.pass_obj
+def query_database(
+    config: jsonlog_cli.config.Config,
+    db_path: str,
+    where: typing.Sequence[str],
+    since: typing.Optional[str],
+    until: typing.Optional[str],
+    level: typing.Optional[str],
+    name: typing.Optional[str],
+    by_time: bool,
+    kv_name: str,
+    template_name: typing.Optional[str],
+    template_format: typing.Optional[str],
+) -> None:
+    """
+    Format records from a database built by `jsonlog load` (aliases: q).
+
+    --since, --until, --level and --name use the database's indexes, and --where
+    is applied to the records they select.
+    """
+    pattern = select_pattern(config, kv_name, template_name, template_format)
+    where_filter = parse_where(where, pattern)
+    with open_database(db_path) as database:
+        records = database.query(
+            level=parse_level(level),
+            since=parse_time(since, "'--since'"),
+            until=parse_time(until, "'--until'"),
+            name=name,
+            by_time=by_time,
+        )
+        with jsonlog_cli.stream.StreamHandler(pattern, where=where_filter) as handler:
+            handler.consume([records])
+
+
+@click.command("split")
+@streams_argument
+@click.option(
+    "-b",
+    "--by",
+    "key",
+    type=click.STRING,
+    required=True,
+    metavar="KEY",
+    help="Split records by the value of a key.",
+)
+@click.option(
+    "-o",
+    "--out",
+    "output",
+    type=click.STRING,
+    required=True,
+    metavar="PATH",
+    help="Path of each file, with {value} replaced by the key's value.",
+)
+@click.option(
+    "--compress",
+    "compression",
+    type=click.Choice(["gzip", "bz2", "xz"]),
+    help="Compress each file.",
+)
+@click.option(
+    "--max-open",
+    "max_open",
+    type=click.IntRange(min=1),
+    default=64,
+    show_default=True,
+    metavar="N",
+    help="How many files to keep open at once.",
+)
+@where_option
+@since_option
+@until_option
+@level_option
+@click.option(
+    "-p",
+    "--pattern",
+    "kv_name",
+    type=click.STRING,
+    metavar="NAME",
+    help="Write records formatted with a named key-value pattern.",
+)
+@click.option(
+    "-t",
+    "--template",
+    "template_name",
+    type=click.STRING,
+    metavar="NAME",
+    help="Write records formatted with a named template.",
+)
+@click.option(
+    "-f",
+    "--format",
+    "template_format",
+    type=click.STRING,
+    metavar="TEMPLATE",
+    help="Write records formatted with a template format.",
+)
+@timestamp_key_option
+@timestamp_format_option
+@click.pass_obj
+def split_streams(
+    config: jsonlog_cli.config.Config,
+    streams: typing.Sequence[str],
+    key: str,
+    output: str,
+    compression: typing.Optional[str],
+    max_open: int,
+    where: typing.Sequence[str],
+    since: typing.Optional[str],
+    until: typing.Optional[str],
+    level: typing.Optional[str],
+    kv_name: typing.Optional[str],
+    template_name: typing.Optional[str],
+    template_format: typing.Optional[str],
+    timestamp_key: typing.Optional[str],
+    timestamp_format: typing.Optional[str],
+) -> None:
+    """
+    Split records into a file for each value of a key (e.g. --out 'out/{value}.log').
+
+    Records are written unchanged unless a pattern or template is given, and lines
+    that aren't JSON are skipped. Records without the key are written to 'none'.
+    """
+    import jsonlog_cli.split
+
+    render = any(o is not None for o in (kv_name, template_name, template_format))
+    pattern = select_pattern(
+        config, kv_name or "default", template_name, template_format
+    )
+    pattern = pattern.replace(
+        timestamp_key=timestamp_key, timestamp_format=timestamp_format
+    )
+    where_filter = parse_where(where, pattern, since=since, until=until, level=level)
+
+    try:
+        splitter = jsonlog_cli.split.Splitter(
+            key, output, compression=compression, max_open=max_open
+        )
+    except ValueError as error:
+        raise click.BadParameter(str(error), param_hint="'--out'")
+
+    count = 0
+    with splitter:
+        for _, json_stream in open_json_streams(streams, pattern, where_filter):
+            count += splitter.split(
+                json_stream,
+                render=unstyled(pattern.format_record) if render else None,
+                where=where_filter,
+            )
+    click.echo(f"Wrote {count} records to {len(splitter.pool.opened)} files", err=True)
+
+
+def unstyled(
+    render: typing.Callable[[jsonlog_cli.record.Record], str]
+) -> typing.Callable[[jsonlog_cli.record.Record], str]:
+    """Remove colours from formatted records, as they're written to files."""
+    return lambda record: click.unstyle(render(record))
+
+
+@click.command("stats")
+@streams_argument
+@where_option
+@since_option
+@until_option
+@level_option
+@click.option(
+    "-g",
+    "--group-by",
+    "group_by",
+    type=click.STRING,
+    multiple=True,
+    metavar="KEY",
+    help="Count records grouped by the values of keys (defaults to the level key).",
+)
+@click.option(
+    "--top",
+    "top",
+    type=click.STRING,
+    multiple=True,
+    metavar="KEY",
+    help="Show the most frequent values of a key.",
+)
+@click.option(
+    "-u",
+    "--unique",
+    "unique",
+    type=click.STRING,
+    multiple=True,
+    metavar="KEY",
+    help="Count the distinct values of a key.",
+)
+@click.option(
+    "-i",
+    "--interval",
+    "interval",
+    type=click.STRING,
+    metavar="DURATION",
+    help="Count records in time buckets of a duration (e.g. '5m', '1h').",
+)
+@click.option(
+    "--limit",
+    "limit",
+    type=click.IntRange(min=1),
+    default=20,
+    show_default=True,
+    metavar="N",
+    help="Show at most this many groups and top values.",
+)
+@click.option(
+    "--exact",
+    "exact",
+    is_flag=True,
+    help="Count exactly, using memory for every distinct value.",
+)
+@click.option("--json", "as_json", is_flag=True, help="Output the results as JSON.")
+@click.option(
+    "-p",
+    "--pattern",
+    "kv_name",
+    type=click.STRING,
+    default="default",
+    help="Use the level and timestamp keys from a named key-value pattern.",
+)
+@click.option(
+    "-l",
+    "--level-key",
+    "level_key",
+    type=click.STRING,
+    help="Override the key for each record's log level.",
+)
+@timestamp_key_option
+@timestamp_format_option
+@click.pass_obj
+def display_stats(
+    config: jsonlog_cli.config.Config,
+    streams: typing.Sequence[str],
+    where: typing.Sequence[str],
+    since: typing.Optional[str],
+    until: typing.Optional[str],
+    level: typing.Optional[str],
+    group_by: typing.Sequence[str],
+    top: typing.Sequence[str],
+    unique: typing.Sequence[str],
+    interval: typing.Optional[str],
+    limit: int,
+    exact: bool,
+    as_json: bool,
+    kv_name: str,
+    level_key: typing.Optional[str],
+    timestamp_key: typing.Optional[str],
+    timestamp_format: typing.Optional[str],
+) -> None:
+    """
+    Count records, their most frequent values and distinct values (aliases: s).
+
+    Counts are approximate for keys with many distinct values, unless --exact is
+    given. Approximate counts are shown with the most they might be over by.
+    """
+    import jsonlog_cli.sketch
+    import jsonlog_cli.stats
+
+    pattern: jsonlog_cli.pattern.KeyValuePattern = config.keyvalues[kv_name]
+    pattern = pattern.replace(
+        level_key=level_key,
+        timestamp_key=timestamp_key,
+        timestamp_format=timestamp_format,
+    )
+    where_filter = parse_where(where, pattern, since=since, until=until, level=level)
+
+    interval_seconds = None
+    if interval is not None:
+        try:
+            interval_seconds = jsonlog_cli.timestamp.parse_duration(interval)
+        except jsonlog_cli.timestamp.TimestampError as error:
+            raise click.BadParameter(str(error), param_hint="'--interval'")
+        if interval_seconds <= 0:
+            raise click.BadParameter("Must be positive", param_hint="'--interval'")
+
+    if not (group_by or top or unique or interval):
+        group_by = [pattern.level_key]
+
+    stats = jsonlog_cli.stats.Stats(
+        group_by=group_by,
+        top=top,
+        unique=unique,
+        timestamps=jsonlog_cli.timestamp.TimestampParser(
+            pattern.timestamp_key, format=pattern.timestamp_format
+        ),
+        interval=interval_seconds,
+        exact=exact,
+        capacity=max(jsonlog_cli.sketch.CAPACITY, limit * 10),
+    )
+
+    for _, json_stream in open_json_streams(streams, pattern, where_filter):
+        stats.consume(json_stream, where_filter)
+
+    summary = stats.summary(limit)
+    if as_json:
+        click.echo(json.dumps(summary, indent=2))
+    else:
+        click.echo(jsonlog_cli.stats.format_summary(summary))
+
+
+@click.command("export")
+@streams_argument
+@click.option(
+    "--fields",
+    "fields",
+    type=click.STRING,
+    multiple=True,
+    required=True,
+    metavar="KEYS",
+    help="Comma-separated keys to export (e.g. 'timestamp,level,http.status').",
+)
+@click.option(
+    "--format",
+    "export_format",
+    type=click.Choice(["tsv", "csv", "ndjson"]),
+    default="tsv",
+    show_default=True,
+    help="Output format.",
+)
+@click.option("--header", "header", is_flag=True, help="Start with a row of keys.")
+@where_option
+@since_option
+@until_option
+@level_option
+@click.option(
+    "-p",
+    "--pattern",
+    "kv_name",
+    type=click.STRING,
+    default="default",
+    help="Use the level, timestamp and multiline JSON settings of a named pattern.",
+)
+@timestamp_key_option
+@timestamp_format_option
+@click.pass_obj
+def export_fields(
+    config: jsonlog_cli.config.Config,
+    streams: typing.Sequence[str],
+    fields: typing.Sequence[str],
+    export_format: str,
+    header: bool,
+    where: typing.Sequence[str],
+    since: typing.Optional[str],
+    until: typing.Optional[str],
+    level: typing.Optional[str],
+    kv_name: str,
+    timestamp_key: typing.Optional[str],
+    timestamp_format: typing.Optional[str],
+) -> None:
+    """
+    Export fields from each record as TSV, CSV or NDJSON (aliases: e).
+
+    Output is never styled or wrapped, and missing values are left empty. Lines
+    that aren't JSON are skipped.
+    """
+    import jsonlog_cli.export
+
+    keys = [key.strip() for value in fields for key in value.split(",")]
+    if not all(keys):
+        raise click.BadParameter("Keys can't be empty", param_hint="'--fields'")
+    exporter = jsonlog_cli.export.Exporter(keys, format=export_format)
+
+    pattern: jsonlog_cli.pattern.KeyValuePattern = config.keyvalues[kv_name]
+    pattern = pattern.replace(
+        timestamp_key=timestamp_key, timestamp_format=timestamp_format
+    )
+    where_filter = parse_where(where, pattern, since=since, until=until, level=level)
+
+    output = click.get_text_stream("stdout")
+    if header:
+        output.write(exporter.header())
+
+    for _, json_stream in open_json_streams(streams, pattern, where_filter):
+        exporter.export(json_stream, output, where_filter)
+    output.flush()
 
 
 main.add_command(display_config)
 main.add_command(display_config, name="c")
+main.add_command(export_fields)
+main.add_command(export_fields, name="e")
+main.add_command(load_database)
+main.add_command(load_database, name="l")
+main.add_command(query_database)
+main.add_command(query_database, name="q")
+main.add_command(split_streams)
+main.add_command(display_stats)
+main.add_command(display_stats, name="s")
+main.add_command(build_index)
+main.add_command(build_index, name="i")
 main.add_command(format_key_value)
 main.add_command(format_key_value, name="k")
 main.add_command(format_key_value, name="kv")
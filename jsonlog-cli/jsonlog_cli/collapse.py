@@ -0,0 +1,107 @@
+"""
+Fold repeated records into one, like `uniq -c` for structured logs.
+
+Records are fingerprinted on a set of keys (by default everything except the
+timestamp), and records with the same fingerprint as one of the last few distinct
+records are counted instead of being shown again. Each group of records is shown
+once it falls out of that window, or once the input ends.
+"""
+
+import collections
+import json
+import typing
+
+import jsonlog_cli.keypath
+import jsonlog_cli.record
+import jsonlog_cli.types
+
+Fingerprint = typing.Tuple[typing.Optional[str], str]
+
+
+class Group:
+    """The first of a run of records, and how many times it was repeated."""
+
+    __slots__ = ("line", "record", "source", "count", "first", "last")
+
+    line: str
+    record: typing.Optional[jsonlog_cli.record.Record]
+    source: typing.Optional[str]
+    count: int
+    first: jsonlog_cli.types.Value
+    last: jsonlog_cli.types.Value
+
+    def __init__(
+        self,
+        line: str,
+        record: typing.Optional[jsonlog_cli.record.Record],
+        source: typing.Optional[str] = None,
+        timestamp: jsonlog_cli.types.Value = None,
+    ) -> None:
+        self.line = line
+        self.record = record
+        self.source = source
+        self.count = 1
+        self.first = timestamp
+        self.last = timestamp
+
+
+class Collapser:
+    keys: typing.Optional[typing.Sequence[jsonlog_cli.keypath.KeyPath]]
+    timestamp_key: jsonlog_cli.keypath.KeyPath
+    window: int
+    groups: "collections.OrderedDict[Fingerprint, Group]"
+
+    def __init__(
+        self,
+        keys: typing.Optional[typing.Sequence[str]] = None,
+        timestamp_key: str = "timestamp",
+        window: int = 1,
+    ) -> None:
+        self.keys = (
+            None if keys is None else [jsonlog_cli.keypath.KeyPath(k) for k in keys]
+        )
+        self.timestamp_key = jsonlog_cli.keypath.KeyPath(timestamp_key)
+        self.window = window
+        self.groups = collections.OrderedDict()
+
+    def fingerprint(self, record: jsonlog_cli.record.Record) -> str:
+        """Encode the values records are compared on, so they can be hashed."""
+        values: typing.Any
+        if self.keys is not None:
+            values = [record.extract(key) for key in self.keys]
+        else:
+            values = record.data
+            if self.timestamp_key.simple and self.timestamp_key in values:
+                values = {k: v for k, v in values.items() if k != self.timestamp_key}
+        return json.dumps(values, sort_keys=True, separators=(",", ":"))
+
+    def add(
+        self,
+        line: str,
+        record: typing.Optional[jsonlog_cli.record.Record],
+        source: typing.Optional[str] = None,
+    ) -> typing.Iterator[Group]:
+        """Add a record, yielding any groups that are complete."""
+        if record is None:
+            # Lines that aren't JSON end every run, so that output stays in order.
+            yield from self.flush()
+            yield Group(line, record, source)
+            return
+
+        timestamp = record.extract(self.timestamp_key)
+        key = (source, self.fingerprint(record))
+        group = self.groups.get(key)
+        if group is not None:
+            group.count += 1
+            group.last = timestamp
+            return
+
+        self.groups[key] = Group(line, record, source, timestamp)
+        if len(self.groups) > self.window:
+            _, oldest = self.groups.popitem(last=False)
+            yield oldest
+
+    def flush(self) -> typing.Iterator[Group]:
+        """Yield every group that hasn't been shown yet."""
+        groups, self.groups = self.groups, collections.OrderedDict()
+        return iter(groups.values())
@@ -9,7 +9,7 @@ class Colour(pydantic.BaseModel):
     bold: typing.Optional[bool] = None
 
     def __bool__(self) -> bool:
-        return bool(self.fg)
+        return bool(self.fg or self.bold)
 
     def style(self, text: str) -> str:
         return click.style(text, fg=self.fg, bold=self.bold) if self else text
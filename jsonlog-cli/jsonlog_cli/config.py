@@ -1,5 +1,17 @@
+"""
+Configuration for named patterns, read from a JSON file.
+
+Validating a configuration file with pydantic is slow compared to the rest of the
+CLI's startup, so the validated configuration is cached (as a pickle) alongside
+the details of the file it was loaded from. The cache is used for as long as the
+file's modification time and size, and the source of the modules that define the
+configuration, stay the same.
+"""
+
 import logging
+import os
 import pathlib
+import pickle
 import sys
 import typing
 
@@ -7,49 +19,75 @@ import pydantic
 
 import jsonlog
 import jsonlog_cli.colours
+import jsonlog_cli.keypath
 import jsonlog_cli.pattern
+import jsonlog_cli.template
 
 log = logging.getLogger(__name__)
 
-DEFAULT_KEYVALUES = {
-    "default": jsonlog_cli.pattern.KeyValuePattern(
-        multiline_keys=("traceback", "stacktrace")
-    ),
-    "elasticsearch": jsonlog_cli.pattern.KeyValuePattern(
-        priority_keys=(
-            "timestamp",
-            "level",
-            "type",
-            "component",
-            "cluster.name",
-            "node.name",
-            "message",
+# Bump this if the cache file's format changes.
+CACHE_VERSION = 1
+
+# Changes to these modules can change the defaults or what a cached config contains.
+CACHE_SOURCES = (
+    jsonlog_cli.colours.__file__,
+    jsonlog_cli.keypath.__file__,
+    jsonlog_cli.pattern.__file__,
+    jsonlog_cli.template.__file__,
+    __file__,
+)
+
+CacheKey = typing.Tuple[typing.Any, ...]
+
+
+def default_keyvalues() -> typing.Dict[str, jsonlog_cli.pattern.KeyValuePattern]:
+    return {
+        "default": jsonlog_cli.pattern.KeyValuePattern(
+            multiline_keys=("traceback", "stacktrace")
+        ),
+        "elasticsearch": jsonlog_cli.pattern.KeyValuePattern(
+            priority_keys=(
+                "timestamp",
+                "level",
+                "type",
+                "component",
+                "cluster.name",
+                "node.name",
+                "message",
+            ),
+            multiline_keys=("stacktrace",),
+            multiline_json=True,
+        ),
+        "jsonlog": jsonlog_cli.pattern.KeyValuePattern(
+            priority_keys=("timestamp", "level", "name", "message"),
+            multiline_keys=("traceback",),
+        ),
+        "snyk": jsonlog_cli.pattern.KeyValuePattern(
+            priority_keys=("time", "msg", "reason.response.body.message"),
+            multiline_keys=("__json__",),
+            colours={
+                20: jsonlog_cli.colours.Colour(fg="cyan"),
+                50: jsonlog_cli.colours.Colour(fg="red"),
+            },
+            timestamp_key="time",
+        ),
+        "jaeger": jsonlog_cli.pattern.KeyValuePattern(
+            multiline_keys=("errorVerbose", "stacktrace"), timestamp_key="ts",
+        ),
+        "vault": jsonlog_cli.pattern.KeyValuePattern(
+            level_key="@level",
+            priority_keys=("@timestamp", "@module", "@message"),
+            timestamp_key="@timestamp",
         ),
-        multiline_keys=("stacktrace",),
-        multiline_json=True,
-    ),
-    "jsonlog": jsonlog_cli.pattern.KeyValuePattern(
-        priority_keys=("timestamp", "level", "name", "message"),
-        multiline_keys=("traceback",),
-    ),
-    "snyk": jsonlog_cli.pattern.KeyValuePattern(
-        priority_keys=("time", "msg", "reason.response.body.message"),
-        multiline_keys=("__json__",),
-        colours={
-            20: jsonlog_cli.colours.Colour(fg="cyan"),
-            50: jsonlog_cli.colours.Colour(fg="red"),
-        },
-    ),
-    "jaeger": jsonlog_cli.pattern.KeyValuePattern(
-        multiline_keys=("errorVerbose", "stacktrace")
-    ),
-    "vault": jsonlog_cli.pattern.KeyValuePattern(
-        level_key="@level", priority_keys=("@timestamp", "@module", "@message"),
-    ),
-}
-DEFAULT_TEMPLATES = {
-    "default": jsonlog_cli.pattern.TemplatePattern(format="{__line__}"),
-}
+    }
+
+
+def default_templates() -> typing.Dict[str, jsonlog_cli.pattern.TemplatePattern]:
+    return {
+        "default": jsonlog_cli.pattern.TemplatePattern(
+            format=jsonlog_cli.template.Template.of("{__line__}")
+        ),
+    }
 
 
 class Config(pydantic.BaseModel):
@@ -61,15 +99,31 @@ class Config(pydantic.BaseModel):
     )
 
     @classmethod
-    def load(cls, filename: str) -> "Config":
+    def load(cls, filename: str, cache_path: typing.Optional[str] = None) -> "Config":
+        """Load a config file, using a cached copy if the file hasn't changed."""
         path: pathlib.Path = pathlib.Path(filename)
+        key = cache_key(path)
+
+        if cache_path is not None:
+            cached = read_cache(pathlib.Path(cache_path), key)
+            if cached is not None:
+                return cached
+
+        config = cls.parse(path)
+
+        if cache_path is not None:
+            write_cache(pathlib.Path(cache_path), key, config)
+
+        return config
+
+    @classmethod
+    def parse(cls, path: pathlib.Path) -> "Config":
+        """Validate a config file, adding its patterns to the default patterns."""
         log.info(
             "Loading configuration from file",
             extra={"path": str(path), "exists": path.exists()},
         )
-        config = cls(
-            keyvalues=DEFAULT_KEYVALUES.copy(), templates=DEFAULT_TEMPLATES.copy(),
-        )
+        config = cls(keyvalues=default_keyvalues(), templates=default_templates())
 
         if path.exists():
             log.info(
@@ -83,13 +137,85 @@ class Config(pydantic.BaseModel):
         return config
 
 
+def cache_key(path: pathlib.Path) -> CacheKey:
+    """Describe a config file and the code that reads it, to check a cache against."""
+    try:
+        status = os.stat(path)
+    except OSError:
+        file: typing.Optional[typing.Tuple[int, int]] = None
+    else:
+        file = (status.st_mtime_ns, status.st_size)
+    sources = tuple(os.stat(source).st_mtime_ns for source in CACHE_SOURCES)
+    return CACHE_VERSION, str(path.absolute()), file, sources
+
+
+def read_cache(cache_path: pathlib.Path, key: CacheKey) -> typing.Optional[Config]:
+    try:
+        with cache_path.open("rb") as file:
+            cached_key, config = pickle.load(file)
+    except FileNotFoundError:
+        return None
+    except Exception as error:
+        # A cache from another version might not unpickle, and is just replaced.
+        log.info(
+            "Ignoring unreadable configuration cache",
+            extra={"path": str(cache_path), "error": str(error)},
+        )
+        return None
+
+    if cached_key != key or not isinstance(config, Config):
+        return None
+    log.info("Using cached configuration", extra={"path": str(cache_path)})
+    return config
+
+
+def write_cache(cache_path: pathlib.Path, key: CacheKey, config: Config) -> None:
+    """Write a cache atomically, so that concurrent runs never see part of one."""
+    temporary = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        with temporary.open("wb") as file:
+            pickle.dump((key, config), file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, cache_path)
+    except OSError as error:
+        log.warning(
+            "Could not write configuration cache",
+            extra={"path": str(cache_path), "error": str(error)},
+        )
+
+
+class LogFile:
+    """
+    A file for internal logs that's only opened when something is logged.
+
+    Most runs don't log anything at the default level, so they don't need to
+    create the file (or the directory containing it).
+    """
+
+    path: pathlib.Path
+    file: typing.Optional[typing.TextIO]
+
+    def __init__(self, path: str) -> None:
+        self.path = pathlib.Path(path)
+        self.file = None
+
+    def write(self, text: str) -> None:
+        if self.file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.file = self.path.open("a", encoding="utf-8")
+        self.file.write(text)
+
+    def flush(self) -> None:
+        if self.file is not None:
+            self.file.flush()
+
+
 def configure_logging(path: str, level: str) -> None:
     """
-    If given a path to a potential logfile, ensure the containing directory exists.
+    Log to STDERR or to a file, which is only created when something is logged.
     """
     logging_level = logging._nameToLevel[level.upper()]
     if path == "-":
         jsonlog.basicConfig(level=logging_level, stream=sys.stderr)
     else:
-        pathlib.Path(path).parent.mkdir(exist_ok=True)
-        jsonlog.basicConfig(level=logging_level, filename=path)
+        jsonlog.basicConfig(level=logging_level, stream=LogFile(path))
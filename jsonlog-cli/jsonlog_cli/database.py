@@ -0,0 +1,286 @@
+"""
+Load records into a SQLite database, so they can be queried without parsing the
+files they came from again.
+
+`jsonlog load` reads each file once, storing every record's JSON alongside columns
+promoted from its timestamp, level, logger name and message, and `jsonlog query`
+reads them back through the usual patterns. Time ranges, levels and names are looked
+up with indexes on those columns, and anything else is filtered as records are read.
+
+Records are inserted in batches inside a single transaction for each file. Loading a
+file again replaces its records, unless it hasn't changed since it was last loaded
+with the same keys.
+"""
+
+import itertools
+import json
+import logging
+import os
+import sqlite3
+import typing
+
+import jsonlog_cli.export
+import jsonlog_cli.inputs
+import jsonlog_cli.keypath
+import jsonlog_cli.levels
+import jsonlog_cli.stream
+import jsonlog_cli.timestamp
+import jsonlog_cli.types
+
+log = logging.getLogger(__name__)
+
+VERSION = 1
+
+# How many records to insert with each statement.
+BATCH_SIZE = 10_000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER,
+    mtime_ns INTEGER,
+    keys TEXT NOT NULL,
+    records INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS records (
+    id INTEGER PRIMARY KEY,
+    source INTEGER NOT NULL REFERENCES sources (id),
+    timestamp REAL,
+    level TEXT,
+    level_number INTEGER,
+    name TEXT,
+    message TEXT,
+    json TEXT NOT NULL
+);
+"""
+
+# Indexes are created once records have been inserted, which is quicker than
+# updating them for each record when a database is first loaded.
+INDEXES = """
+CREATE INDEX IF NOT EXISTS records_source ON records (source);
+CREATE INDEX IF NOT EXISTS records_timestamp ON records (timestamp);
+CREATE INDEX IF NOT EXISTS records_level_number ON records (level_number);
+CREATE INDEX IF NOT EXISTS records_name ON records (name);
+CREATE INDEX IF NOT EXISTS records_message ON records (message);
+"""
+
+Row = typing.Tuple[
+    int,
+    typing.Optional[float],
+    typing.Optional[str],
+    typing.Optional[int],
+    typing.Optional[str],
+    typing.Optional[str],
+    str,
+]
+
+
+class DatabaseError(Exception):
+    pass
+
+
+class Columns:
+    """Extracts the promoted columns from each record."""
+
+    timestamps: jsonlog_cli.timestamp.TimestampParser
+    level_key: jsonlog_cli.keypath.KeyPath
+    name_key: jsonlog_cli.keypath.KeyPath
+    message_key: jsonlog_cli.keypath.KeyPath
+
+    def __init__(
+        self,
+        timestamp_key: str = "timestamp",
+        timestamp_format: typing.Optional[str] = None,
+        level_key: str = "level",
+        name_key: str = "name",
+        message_key: str = "message",
+    ) -> None:
+        self.timestamps = jsonlog_cli.timestamp.TimestampParser(
+            timestamp_key, format=timestamp_format
+        )
+        self.level_key = jsonlog_cli.keypath.KeyPath.of(level_key)
+        self.name_key = jsonlog_cli.keypath.KeyPath.of(name_key)
+        self.message_key = jsonlog_cli.keypath.KeyPath.of(message_key)
+
+    def keys(self) -> typing.List[str]:
+        return [
+            self.timestamps.key,
+            self.level_key,
+            self.name_key,
+            self.message_key,
+        ]
+
+    def describe(self) -> str:
+        """Describe the keys, so a file is reloaded if they change."""
+        return json.dumps([*self.keys(), self.timestamps.format])
+
+    def rows(
+        self, source: int, stream: jsonlog_cli.stream.JSONStream
+    ) -> typing.Iterator[Row]:
+        """Yield a row for each record in a stream, skipping lines that aren't JSON."""
+        # Keys are compiled once, as extracting them is most of the cost of loading.
+        timestamp = jsonlog_cli.export.accessor(
+            jsonlog_cli.keypath.KeyPath.of(self.timestamps.key)
+        )
+        level = jsonlog_cli.export.accessor(self.level_key)
+        name = jsonlog_cli.export.accessor(self.name_key)
+        message = jsonlog_cli.export.accessor(self.message_key)
+        parse, level_number = self.timestamps.parse, jsonlog_cli.levels.level_number
+
+        for _, record in stream.consume():
+            if record is None:
+                continue
+            try:
+                parsed = parse(timestamp(record))
+            except (jsonlog_cli.timestamp.TimestampError, ValueError, OverflowError):
+                parsed = None
+            level_value = level(record)
+            yield (
+                source,
+                parsed,
+                text(level_value),
+                level_number(level_value),
+                text(name(record)),
+                text(message(record)),
+                record.line.strip(),
+            )
+
+
+class Database:
+    connection: sqlite3.Connection
+
+    def __init__(self, connection: sqlite3.Connection) -> None:
+        self.connection = connection
+
+    @classmethod
+    def open(cls, path: str) -> "Database":
+        connection = sqlite3.connect(path)
+        version = connection.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, VERSION):
+            connection.close()
+            raise DatabaseError(f"Unsupported database version {version}")
+
+        connection.executescript(SCHEMA)
+        connection.execute(f"PRAGMA user_version = {VERSION}")
+        # The database can always be loaded again, so it isn't synced to disk.
+        connection.execute("PRAGMA synchronous = OFF")
+        return cls(connection)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self) -> "Database":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def loaded(self, path: str, columns: Columns) -> bool:
+        """Check if a file has been loaded since it last changed."""
+        status = stat(path)
+        if status is None:
+            return False
+        row = self.connection.execute(
+            "SELECT size, mtime_ns, keys FROM sources WHERE path = ?", (path,)
+        ).fetchone()
+        return row == (*status, columns.describe())
+
+    def load(
+        self, path: str, stream: jsonlog_cli.stream.JSONStream, columns: Columns
+    ) -> int:
+        """Replace the records loaded from a file, returning how many were loaded."""
+        size, mtime_ns = stat(path) or (None, None)
+        count = 0
+        with self.connection:
+            cursor = self.connection.cursor()
+            row = cursor.execute(
+                "SELECT id FROM sources WHERE path = ?", (path,)
+            ).fetchone()
+            if row is None:
+                cursor.execute(
+                    "INSERT INTO sources (path, keys) VALUES (?, '')", (path,)
+                )
+                source = cursor.lastrowid
+            else:
+                source = row[0]
+                cursor.execute("DELETE FROM records WHERE source = ?", (source,))
+
+            rows = columns.rows(source, stream)
+            while True:
+                batch = list(itertools.islice(rows, BATCH_SIZE))
+                if not batch:
+                    break
+                count += self.insert(cursor, batch)
+
+            cursor.execute(
+                "UPDATE sources SET size = ?, mtime_ns = ?, keys = ?, records = ?"
+                " WHERE id = ?",
+                (size, mtime_ns, columns.describe(), count, source),
+            )
+            cursor.executescript(INDEXES)
+        return count
+
+    @staticmethod
+    def insert(cursor: sqlite3.Cursor, rows: typing.Sequence[Row]) -> int:
+        cursor.executemany(
+            "INSERT INTO records"
+            " (source, timestamp, level, level_number, name, message, json)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        return len(rows)
+
+    def query(
+        self,
+        level: typing.Optional[int] = None,
+        since: typing.Optional[jsonlog_cli.timestamp.Timestamp] = None,
+        until: typing.Optional[jsonlog_cli.timestamp.Timestamp] = None,
+        name: typing.Optional[str] = None,
+        by_time: bool = False,
+    ) -> typing.Iterator[str]:
+        """
+        Yield the JSON of each matching record, in the order they were loaded.
+
+        Records match a name if it's their logger's name or one of its parents.
+        """
+        clauses: typing.List[str] = []
+        parameters: typing.List[typing.Any] = []
+        if level is not None:
+            clauses.append("level_number >= ?")
+            parameters.append(level)
+        if since is not None:
+            clauses.append("timestamp >= ?")
+            parameters.append(since)
+        if until is not None:
+            clauses.append("timestamp < ?")
+            parameters.append(until)
+        if name is not None:
+            # Children sort between "name." and "name/", so the index can be used.
+            clauses.append("(name = ? OR (name >= ? AND name < ?))")
+            parameters.extend([name, f"{name}.", f"{name}/"])
+
+        sql = "SELECT json FROM records"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY timestamp, id" if by_time else " ORDER BY id"
+
+        log.debug("Querying records", extra={"sql": sql, "parameters": parameters})
+        for (line,) in self.connection.execute(sql, parameters):
+            yield line
+
+
+def text(value: jsonlog_cli.types.Value) -> typing.Optional[str]:
+    """Store values as text, encoding anything that isn't a string as JSON."""
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value)
+
+
+def stat(path: str) -> typing.Optional[typing.Tuple[int, int]]:
+    """Return a file's size and modification time, or None if it's STDIN."""
+    if path == jsonlog_cli.inputs.STDIN:
+        return None
+    status = os.stat(path)
+    return status.st_size, status.st_mtime_ns
@@ -0,0 +1,125 @@
+"""
+Export fields from records as TSV, CSV or NDJSON, for spreadsheets and pipelines.
+
+Unlike templates, exports are never styled or wrapped, and missing values are empty
+rather than errors. Each field is compiled into an accessor once, and rows are written
+in batches.
+
+TSV escapes backslashes, tabs and newlines as `\\\\`, `\\t` and `\\n` (like PostgreSQL's
+text format) so that every row is a single line. Values that aren't strings are
+written as JSON, and missing or null values are empty.
+"""
+
+import csv
+import io
+import json
+import re
+import typing
+
+import jsonlog_cli.keypath
+import jsonlog_cli.record
+import jsonlog_cli.stream
+import jsonlog_cli.types
+
+if typing.TYPE_CHECKING:
+    import jsonlog_cli.filter
+
+FORMATS = ("tsv", "csv", "ndjson")
+
+# How many rows to collect before writing them.
+BATCH_SIZE = 1024
+
+TSV_SPECIAL = re.compile(r"[\\\t\n\r]")
+TSV_ESCAPES = {"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"}
+
+Accessor = typing.Callable[[jsonlog_cli.record.Record], jsonlog_cli.types.Value]
+Row = typing.List[jsonlog_cli.types.Value]
+
+
+def accessor(path: jsonlog_cli.keypath.KeyPath) -> Accessor:
+    """Compile a key into a function that extracts its value from a record."""
+    if path.special:
+        return lambda record: record[path]
+    if path.simple:
+        key = str(path)
+        return lambda record: record.data.get(key)
+    return lambda record: path.extract(record.data)
+
+
+def text(value: jsonlog_cli.types.Value) -> str:
+    """Format a value as text, writing anything that isn't a string as JSON."""
+    if isinstance(value, str):
+        return value
+    if value is None:
+        return ""
+    return json.dumps(value, separators=(",", ":"))
+
+
+def escape_tsv(value: str) -> str:
+    if TSV_SPECIAL.search(value) is None:
+        return value
+    return TSV_SPECIAL.sub(lambda match: TSV_ESCAPES[match.group()], value)
+
+
+class Exporter:
+    fields: typing.List[jsonlog_cli.keypath.KeyPath]
+    format: str
+    accessors: typing.List[Accessor]
+
+    def __init__(self, fields: typing.Sequence[str], format: str = "tsv") -> None:
+        if format not in FORMATS:
+            raise ValueError(f"Unknown format {format!r}")
+        self.fields = [jsonlog_cli.keypath.KeyPath.of(field) for field in fields]
+        self.format = format
+        self.accessors = [accessor(field) for field in self.fields]
+
+    def row(self, record: jsonlog_cli.record.Record) -> Row:
+        return [get(record) for get in self.accessors]
+
+    def header(self) -> str:
+        """Return a row naming each field, or nothing for NDJSON."""
+        if self.format == "ndjson":
+            return ""
+        return self.format_rows([list(self.fields)])
+
+    def format_rows(self, rows: typing.Sequence[Row]) -> str:
+        if self.format == "tsv":
+            return "".join(
+                "\t".join([escape_tsv(text(value)) for value in row]) + "\n"
+                for row in rows
+            )
+
+        if self.format == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer, lineterminator="\n")
+            writer.writerows([[text(value) for value in row] for row in rows])
+            return buffer.getvalue()
+
+        fields = self.fields
+        return "".join(
+            json.dumps(dict(zip(fields, row)), separators=(",", ":")) + "\n"
+            for row in rows
+        )
+
+    def export(
+        self,
+        stream: jsonlog_cli.stream.JSONStream,
+        output: typing.IO[str],
+        where: "typing.Optional[jsonlog_cli.filter.Filter]" = None,
+    ) -> int:
+        """Write a row for each record in a stream, returning how many were written."""
+        rows: typing.List[Row] = []
+        count = 0
+        for _, record in stream.consume():
+            if record is None or (where is not None and not where.match(record)):
+                continue
+            rows.append(self.row(record))
+            if len(rows) >= BATCH_SIZE:
+                output.write(self.format_rows(rows))
+                count += len(rows)
+                rows = []
+
+        if rows:
+            output.write(self.format_rows(rows))
+            count += len(rows)
+        return count
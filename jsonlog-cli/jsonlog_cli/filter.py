@@ -0,0 +1,514 @@
+"""
+Filter expressions for selecting records, used by `--where`.
+
+Expressions compare values extracted from a record with literal values:
+
+    level>=warning
+    name=~^app\\.
+    status in (500, 503)
+    exists(traceback) and not message=~'^(GET|HEAD) '
+
+Each expression is compiled once into a predicate over a `Record`. Where possible a
+"prefilter" is also derived - a set of substrings that must appear in the raw line
+for the predicate to match - so that most lines can be rejected before they're
+parsed as JSON.
+"""
+
+import json
+import operator
+import re
+import typing
+
+import jsonlog_cli.keypath
+import jsonlog_cli.levels
+import jsonlog_cli.record
+import jsonlog_cli.timestamp
+import jsonlog_cli.types
+
+Predicate = typing.Callable[[jsonlog_cli.record.Record], bool]
+Prefilter = typing.Callable[[str], bool]
+
+# A prefilter in conjunctive normal form: every clause must have at least one of its
+# substrings present in a line. None means there are no constraints on the line.
+Clauses = typing.Optional[typing.Tuple[typing.FrozenSet[str], ...]]
+
+TOKEN_PATTERN = re.compile(
+    r"""
+    \s*(?:
+        (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+        |(?P<operator>=~|!~|==|!=|<=|>=|=|<|>)
+        |(?P<punctuation>[(),])
+        |(?P<word>[^\s()=!<>~,"']+)
+    )
+    """,
+    re.VERBOSE,
+)
+
+# Literal strings that are safe to search for in an encoded JSON line. JSON encoders
+# may escape other characters (e.g. non-ascii characters, '/', or '<' and '>').
+SAFE_PATTERN = re.compile(r"[\w .:@+,;#$%*()|^~-]*", re.ASCII)
+
+COMPARISONS: typing.Mapping[str, typing.Callable[[typing.Any, typing.Any], bool]] = {
+    "=": operator.eq,
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+class FilterError(ValueError):
+    """Raised when a filter expression can't be parsed."""
+
+
+class Token(typing.NamedTuple):
+    kind: str
+    text: str
+
+
+class Literal(typing.NamedTuple):
+    """A literal value, retaining the text it was parsed from."""
+
+    text: str
+    value: jsonlog_cli.types.Value
+
+    @classmethod
+    def parse(cls, token: Token) -> "Literal":
+        if token.kind == "string":
+            return cls(token.text, token.text)
+
+        keywords: typing.Mapping[str, jsonlog_cli.types.Value]
+        keywords = {"true": True, "false": False, "null": None}
+        if token.text in keywords:
+            return cls(token.text, keywords[token.text])
+
+        for number in (int, float):
+            try:
+                return cls(token.text, number(token.text))
+            except ValueError:
+                pass
+
+        return cls(token.text, token.text)
+
+    def equals(self, value: jsonlog_cli.types.Value) -> bool:
+        """Compare a record value with this literal, allowing numeric strings."""
+        if isinstance(value, bool) != isinstance(self.value, bool):
+            return False
+        return value == self.value or (isinstance(value, str) and value == self.text)
+
+    def substring(self) -> typing.Optional[str]:
+        """Text that must be present in a JSON line containing this value."""
+        if isinstance(self.value, str):
+            if SAFE_PATTERN.fullmatch(self.value):
+                return json.dumps(self.value)
+        elif isinstance(self.value, bool):
+            # Also matches the strings "true" and "false".
+            return json.dumps(self.value)
+        # Numbers can be written in many ways (`10` is also `10.0` or `1e1`).
+        return None
+
+
+class Node(typing.NamedTuple):
+    predicate: Predicate
+    clauses: Clauses
+
+
+class Filter:
+    """
+    A compiled filter expression.
+
+    The minimum level and time range are kept alongside the expression, as well as
+    the prefilter's clauses, so that an index can be used to skip records that
+    can't match.
+    """
+
+    expression: str
+    node: Node
+    clauses: Clauses
+    prefilter: typing.Optional[Prefilter]
+    level_key: str
+    level: typing.Optional[int]
+    since: typing.Optional[jsonlog_cli.timestamp.Timestamp]
+    until: typing.Optional[jsonlog_cli.timestamp.Timestamp]
+    timestamps: typing.Optional[jsonlog_cli.timestamp.TimestampParser]
+
+    def __init__(
+        self,
+        expression: str,
+        node: Node,
+        level_key: str = "level",
+        level: typing.Optional[int] = None,
+        since: typing.Optional[jsonlog_cli.timestamp.Timestamp] = None,
+        until: typing.Optional[jsonlog_cli.timestamp.Timestamp] = None,
+        timestamps: typing.Optional[jsonlog_cli.timestamp.TimestampParser] = None,
+    ) -> None:
+        self.expression = expression
+        self.node = node
+        self.clauses = node.clauses
+        self.prefilter = compile_prefilter(node.clauses)
+        self.level_key = level_key
+        self.level = level
+        self.since = since
+        self.until = until
+        self.timestamps = timestamps
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.expression!r})"
+
+    @classmethod
+    def parse(
+        cls,
+        expressions: typing.Sequence[str],
+        level_key: str = "level",
+        level: typing.Optional[int] = None,
+        since: typing.Optional[jsonlog_cli.timestamp.Timestamp] = None,
+        until: typing.Optional[jsonlog_cli.timestamp.Timestamp] = None,
+        timestamps: typing.Optional[jsonlog_cli.timestamp.TimestampParser] = None,
+    ) -> typing.Optional["Filter"]:
+        """
+        Compile expressions into a single filter that requires all of them to match.
+
+        Comparisons against `level_key` treat level names as numbers, so that
+        `level>=warning` matches records at the "error" or "critical" levels.
+
+        Records can also be limited to a minimum level, and to timestamps between
+        `since` (inclusive) and `until` (exclusive) parsed by `timestamps`.
+        """
+        nodes = [Parser(e, level_key).parse() for e in expressions]
+        descriptions = [f"({e})" for e in expressions]
+
+        if level is not None:
+            path = jsonlog_cli.keypath.KeyPath.of(level_key)
+            nodes.append(level_comparison(path, operator.ge, level))
+            descriptions.append(f"({level_key}>={level})")
+
+        if since is not None or until is not None:
+            if timestamps is None:
+                raise FilterError("A timestamp parser is needed to filter by time")
+            nodes.append(time_range(timestamps, since, until))
+            descriptions.append(f"({since} <= {timestamps.key} < {until})")
+
+        if not nodes:
+            return None
+
+        expression = " and ".join(descriptions)
+        return cls(
+            expression,
+            conjunction(nodes),
+            level_key=level_key,
+            level=level,
+            since=since,
+            until=until,
+            timestamps=timestamps,
+        )
+
+    def match(self, record: jsonlog_cli.record.Record) -> bool:
+        return self.node.predicate(record)
+
+    def match_line(self, line: str) -> bool:
+        """Return False if a line can't possibly contain a matching record."""
+        return self.prefilter is None or self.prefilter(line)
+
+
+class Parser:
+    """A recursive descent parser for filter expressions."""
+
+    expression: str
+    level_key: str
+    tokens: typing.List[Token]
+    position: int
+
+    def __init__(self, expression: str, level_key: str) -> None:
+        self.expression = expression
+        self.level_key = level_key
+        self.tokens = self.tokenize(expression)
+        self.position = 0
+
+    @staticmethod
+    def tokenize(expression: str) -> typing.List[Token]:
+        tokens = []
+        position = 0
+        expression = expression.rstrip()
+        while position < len(expression):
+            match = TOKEN_PATTERN.match(expression, position)
+            if match is None or match.lastgroup is None:
+                raise FilterError(f"Unexpected character at {expression[position:]!r}")
+            kind, text = match.lastgroup, match.group(match.lastgroup)
+            if kind == "string":
+                text = re.sub(r"\\([\\'\"])", r"\1", text[1:-1])
+            tokens.append(Token(kind, text))
+            position = match.end()
+        return tokens
+
+    def parse(self) -> Node:
+        node = self.parse_or()
+        token = self.peek()
+        if token is not None:
+            raise FilterError(f"Unexpected {token.text!r} in {self.expression!r}")
+        return node
+
+    def peek(self) -> typing.Optional[Token]:
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return None
+
+    def next(self, description: str) -> Token:
+        token = self.peek()
+        if token is None:
+            raise FilterError(f"Expected {description} at end of {self.expression!r}")
+        self.position += 1
+        return token
+
+    def accept_keyword(self, keyword: str) -> bool:
+        token = self.peek()
+        if token and token.kind == "word" and token.text.casefold() == keyword:
+            self.position += 1
+            return True
+        return False
+
+    def expect(self, text: str) -> None:
+        token = self.next(repr(text))
+        if token.text != text:
+            raise FilterError(f"Expected {text!r}, found {token.text!r}")
+
+    def parse_or(self) -> Node:
+        nodes = [self.parse_and()]
+        while self.accept_keyword("or"):
+            nodes.append(self.parse_and())
+        return disjunction(nodes) if len(nodes) > 1 else nodes[0]
+
+    def parse_and(self) -> Node:
+        nodes = [self.parse_not()]
+        while self.accept_keyword("and"):
+            nodes.append(self.parse_not())
+        return conjunction(nodes) if len(nodes) > 1 else nodes[0]
+
+    def parse_not(self) -> Node:
+        if self.accept_keyword("not"):
+            predicate = self.parse_not().predicate
+            return Node(lambda record: not predicate(record), None)
+        return self.parse_atom()
+
+    def parse_atom(self) -> Node:
+        token = self.next("an expression")
+
+        if token.kind == "punctuation" and token.text == "(":
+            node = self.parse_or()
+            self.expect(")")
+            return node
+
+        if token.kind == "word" and token.text.casefold() == "exists":
+            self.expect("(")
+            path = self.parse_path(self.next("a key"))
+            self.expect(")")
+            return exists(path)
+
+        path = self.parse_path(token)
+
+        if self.accept_keyword("in"):
+            return self.parse_in(path)
+
+        if self.accept_keyword("not"):
+            if not self.accept_keyword("in"):
+                raise FilterError(f"Expected 'in' after 'not' in {self.expression!r}")
+            node = self.parse_in(path)
+            predicate = node.predicate
+            return Node(lambda record: not predicate(record), None)
+
+        op = self.next("an operator")
+        if op.kind != "operator":
+            raise FilterError(f"Expected an operator, found {op.text!r}")
+
+        value = self.next("a value")
+        if value.kind not in ("word", "string"):
+            raise FilterError(f"Expected a value, found {value.text!r}")
+
+        if op.text in ("=~", "!~"):
+            return regex(path, value.text, negate=op.text == "!~")
+
+        return self.comparison(path, op.text, Literal.parse(value))
+
+    def parse_path(self, token: Token) -> jsonlog_cli.keypath.KeyPath:
+        if token.kind not in ("word", "string"):
+            raise FilterError(f"Expected a key, found {token.text!r}")
+        return jsonlog_cli.keypath.KeyPath.of(token.text)
+
+    def parse_in(self, path: jsonlog_cli.keypath.KeyPath) -> Node:
+        self.expect("(")
+        literals = []
+        while True:
+            token = self.next("a value")
+            if token.kind not in ("word", "string"):
+                raise FilterError(f"Expected a value, found {token.text!r}")
+            literals.append(Literal.parse(token))
+            if self.next("')' or ','").text == ")":
+                break
+
+        nodes = [self.comparison(path, "=", literal) for literal in literals]
+        return disjunction(nodes)
+
+    def comparison(
+        self, path: jsonlog_cli.keypath.KeyPath, op: str, literal: Literal
+    ) -> Node:
+        compare = COMPARISONS[op]
+
+        if path == self.level_key:
+            level = jsonlog_cli.levels.level_number(literal.value)
+            if level is not None:
+                return level_comparison(path, compare, level)
+
+        if compare is operator.eq:
+            # Comparing with null also matches records where the key is missing.
+            clauses = (
+                None
+                if literal.value is None
+                else single_clause(literal.substring(), path)
+            )
+            return Node(lambda record: literal.equals(record.extract(path)), clauses)
+
+        if compare is operator.ne:
+            return Node(lambda record: not literal.equals(record.extract(path)), None)
+
+        return ordering(path, compare, literal)
+
+
+def exists(path: jsonlog_cli.keypath.KeyPath) -> Node:
+    def predicate(record: jsonlog_cli.record.Record) -> bool:
+        return record.extract(path) is not None
+
+    return Node(predicate, single_clause(None, path))
+
+
+def regex(path: jsonlog_cli.keypath.KeyPath, pattern: str, negate: bool) -> Node:
+    try:
+        compiled = re.compile(pattern)
+    except re.error as error:
+        raise FilterError(f"Invalid regular expression {pattern!r}: {error}")
+
+    def predicate(record: jsonlog_cli.record.Record) -> bool:
+        value = record.extract(path)
+        if value is None:
+            return negate
+        text = value if isinstance(value, str) else json.dumps(value)
+        return (compiled.search(text) is None) is negate
+
+    return Node(predicate, None if negate else single_clause(None, path))
+
+
+def level_comparison(
+    path: jsonlog_cli.keypath.KeyPath,
+    compare: typing.Callable[[typing.Any, typing.Any], bool],
+    level: int,
+) -> Node:
+    def predicate(record: jsonlog_cli.record.Record) -> bool:
+        number = jsonlog_cli.levels.level_number(record.extract(path))
+        return number is not None and compare(number, level)
+
+    return Node(predicate, None)
+
+
+def time_range(
+    timestamps: jsonlog_cli.timestamp.TimestampParser,
+    since: typing.Optional[jsonlog_cli.timestamp.Timestamp],
+    until: typing.Optional[jsonlog_cli.timestamp.Timestamp],
+) -> Node:
+    lower = float("-inf") if since is None else since
+    upper = float("inf") if until is None else until
+
+    def predicate(record: jsonlog_cli.record.Record) -> bool:
+        timestamp = timestamps(record)
+        return timestamp is not None and lower <= timestamp < upper
+
+    return Node(predicate, None)
+
+
+def ordering(
+    path: jsonlog_cli.keypath.KeyPath,
+    compare: typing.Callable[[typing.Any, typing.Any], bool],
+    literal: Literal,
+) -> Node:
+    numeric = isinstance(literal.value, (int, float)) and not isinstance(
+        literal.value, bool
+    )
+
+    def predicate(record: jsonlog_cli.record.Record) -> bool:
+        value = record.extract(path)
+        if numeric:
+            if isinstance(value, str):
+                try:
+                    value = float(value)
+                except ValueError:
+                    return False
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                return False
+            return compare(value, literal.value)
+
+        return isinstance(value, str) and compare(value, literal.text)
+
+    return Node(predicate, single_clause(None, path))
+
+
+def conjunction(nodes: typing.Sequence[Node]) -> Node:
+    predicates = [n.predicate for n in nodes]
+
+    def predicate(record: jsonlog_cli.record.Record) -> bool:
+        return all(p(record) for p in predicates)
+
+    clauses = tuple(c for n in nodes if n.clauses for c in n.clauses)
+    return Node(predicates[0] if len(nodes) == 1 else predicate, clauses or None)
+
+
+def disjunction(nodes: typing.Sequence[Node]) -> Node:
+    predicates = [n.predicate for n in nodes]
+
+    def predicate(record: jsonlog_cli.record.Record) -> bool:
+        return any(p(record) for p in predicates)
+
+    # Only simple alternatives are kept - if any alternative is unconstrained, or
+    # needs more than one clause, the line could match for other reasons.
+    clauses: Clauses = None
+    alternatives = [n.clauses[0] for n in nodes if n.clauses and len(n.clauses) == 1]
+    if len(alternatives) == len(nodes):
+        clauses = (frozenset(s for a in alternatives for s in a),)
+    return Node(predicates[0] if len(nodes) == 1 else predicate, clauses)
+
+
+def single_clause(
+    substring: typing.Optional[str], path: jsonlog_cli.keypath.KeyPath
+) -> Clauses:
+    """
+    Create a clause requiring a value, or failing that the key, to be in the line.
+
+    The final segment of a key is always present in the line (followed by a quote)
+    if the key exists, even if the key was a literal key containing dots. Keys that
+    end by indexing a list have nothing to look for, as list items aren't quoted.
+    """
+    if substring is not None:
+        return (frozenset({substring}),)
+
+    if path.special:
+        return None
+
+    last = path.steps[-1]
+    segment = last.key
+    if last.position is not None or not segment or not SAFE_PATTERN.fullmatch(segment):
+        return None
+
+    return (frozenset({f'{segment}"'}),)
+
+
+def compile_prefilter(clauses: Clauses) -> typing.Optional[Prefilter]:
+    if not clauses:
+        return None
+
+    required = clauses
+    if all(len(c) == 1 for c in required):
+        substrings = tuple(s for c in required for s in c)
+        if len(substrings) == 1:
+            (substring,) = substrings
+            return lambda line: substring in line
+        return lambda line: all(s in line for s in substrings)
+
+    return lambda line: all(any(s in line for s in c) for c in required)
@@ -0,0 +1,288 @@
+"""
+Follow files as they grow, like `tail -F`.
+
+Files are read incrementally in large blocks. Each file is tracked by its device and
+inode so that rename-based rotation (the file is moved away and a new file created
+in its place) and truncation (the file shrinks) are noticed, reading any data left in
+the old file before switching to the new one.
+
+Waiting for new data uses inotify on Linux, watching the directories containing each
+file so that creation and renames are seen as well as writes. Elsewhere (or if
+inotify isn't available) files are polled, backing off while nothing is changing.
+"""
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import sys
+import time
+import typing
+
+import jsonlog_cli.inputs
+
+log = logging.getLogger(__name__)
+
+READ_SIZE = 1024 * 1024
+
+# How long to wait between checks when polling, or when inotify is available how
+# long to wait before checking anyway (in case an event was missed).
+POLL_MIN_INTERVAL = 0.05
+POLL_MAX_INTERVAL = 1.0
+INOTIFY_TIMEOUT = 5.0
+
+# Flags from <sys/inotify.h>.
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_CREATE | IN_DELETE
+IN_MASK |= IN_MOVED_FROM | IN_MOVED_TO
+
+
+class Source:
+    """Something we can read lines from without blocking."""
+
+    name: str
+
+    def read(self) -> typing.List[str]:
+        """Return complete lines that have arrived since the last read."""
+        raise NotImplementedError
+
+    def fileno(self) -> typing.Optional[int]:
+        """A file descriptor that can be passed to select(), if there is one."""
+        return None
+
+    def close(self) -> None:
+        pass
+
+
+class FollowedFile(Source):
+    path: str
+    file: typing.BinaryIO
+    identity: typing.Tuple[int, int]
+    position: int
+
+    def __init__(self, path: str, position: int = 0) -> None:
+        self.name = path
+        self.path = path
+        self.lines = jsonlog_cli.inputs.LineSplitter()
+        self.open(position)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.path!r})"
+
+    def open(self, position: int = 0) -> None:
+        self.file = open(self.path, "rb", buffering=0)
+        stat = os.fstat(self.file.fileno())
+        self.identity = (stat.st_dev, stat.st_ino)
+        self.position = self.file.seek(position)
+
+    def close(self) -> None:
+        self.file.close()
+
+    def read(self) -> typing.List[str]:
+        lines = self.read_available()
+
+        # The file was truncated, so start reading from the beginning again.
+        if os.fstat(self.file.fileno()).st_size < self.position:
+            log.info("File was truncated", extra={"path": self.path})
+            lines.extend(self.lines.reset())
+            self.position = self.file.seek(0)
+            lines.extend(self.read_available())
+
+        # The file was rotated, so switch to the new file if it exists yet. We've
+        # already read everything that was written to the old file.
+        if self.rotated():
+            log.info("File was rotated", extra={"path": self.path})
+            lines.extend(self.lines.reset())
+            self.close()
+            self.open()
+            lines.extend(self.read_available())
+
+        return lines
+
+    def read_available(self) -> typing.List[str]:
+        lines = []
+        while True:
+            chunk = self.file.read(READ_SIZE)
+            if not chunk:
+                break
+            self.position += len(chunk)
+            lines.extend(self.lines.split(chunk))
+            if len(chunk) < READ_SIZE:
+                break
+        return lines
+
+    def rotated(self) -> bool:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        return (stat.st_dev, stat.st_ino) != self.identity
+
+
+class PipeSource(Source):
+    """Reads from a pipe (e.g. STDIN) that select() can tell us is readable."""
+
+    fd: int
+    closed: bool
+
+    def __init__(self, name: str, fd: int) -> None:
+        self.name = name
+        self.fd = fd
+        self.closed = False
+        self.lines = jsonlog_cli.inputs.LineSplitter()
+
+    def fileno(self) -> typing.Optional[int]:
+        return None if self.closed else self.fd
+
+    def read(self) -> typing.List[str]:
+        lines: typing.List[str] = []
+        while not self.closed and select.select([self.fd], [], [], 0)[0]:
+            chunk = os.read(self.fd, READ_SIZE)
+            if not chunk:
+                self.closed = True
+                lines.extend(self.lines.reset())
+                break
+            lines.extend(self.lines.split(chunk))
+        return lines
+
+
+class Watcher:
+    """Waits until it's worth reading sources again."""
+
+    def wait(self, fds: typing.Sequence[int]) -> None:
+        raise NotImplementedError
+
+    def reset(self) -> None:
+        """Called when new data has been read."""
+
+    def close(self) -> None:
+        pass
+
+
+class PollingWatcher(Watcher):
+    """Polls at an interval that backs off while nothing is happening."""
+
+    interval: float
+
+    def __init__(self) -> None:
+        self.interval = POLL_MIN_INTERVAL
+
+    def wait(self, fds: typing.Sequence[int]) -> None:
+        if fds:
+            select.select(fds, [], [], self.interval)
+        else:
+            time.sleep(self.interval)
+        self.interval = min(self.interval * 2, POLL_MAX_INTERVAL)
+
+    def reset(self) -> None:
+        self.interval = POLL_MIN_INTERVAL
+
+
+class InotifyWatcher(Watcher):
+    """Waits for inotify events on the directories containing followed files."""
+
+    fd: int
+
+    def __init__(self, paths: typing.Iterable[str]) -> None:
+        self.libc = load_libc()
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        directories = {os.path.dirname(os.path.abspath(p)) for p in paths}
+        for directory in directories:
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), IN_MASK)
+            if wd < 0:
+                self.close()
+                raise OSError(ctypes.get_errno(), "inotify_add_watch failed")
+
+    def wait(self, fds: typing.Sequence[int]) -> None:
+        readable, _, _ = select.select([self.fd, *fds], [], [], INOTIFY_TIMEOUT)
+        if self.fd in readable:
+            self.drain()
+
+    def drain(self) -> None:
+        try:
+            while os.read(self.fd, 64 * 1024):
+                pass
+        except BlockingIOError:
+            pass
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def load_libc() -> typing.Any:
+    libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    libc.inotify_init1.argtypes = [ctypes.c_int]
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    return libc
+
+
+def create_watcher(paths: typing.Sequence[str]) -> Watcher:
+    """Use inotify where it's available, falling back to polling."""
+    if sys.platform.startswith("linux") and paths:
+        try:
+            return InotifyWatcher(paths)
+        except (OSError, AttributeError) as error:
+            log.info("Could not use inotify", extra={"error": str(error)})
+    return PollingWatcher()
+
+
+class Follower:
+    sources: typing.List[Source]
+    watcher: Watcher
+
+    def __init__(self, sources: typing.Sequence[Source], watcher: Watcher) -> None:
+        self.sources = list(sources)
+        self.watcher = watcher
+
+    @classmethod
+    def open(
+        cls,
+        paths: typing.Sequence[str],
+        positions: typing.Optional[typing.Mapping[str, int]] = None,
+    ) -> "Follower":
+        """Follow files from the given positions, or from the start of each file."""
+        positions = positions or {}
+        sources: typing.List[Source] = []
+        for path in paths:
+            if path == "-":
+                sources.append(PipeSource("<stdin>", sys.stdin.fileno()))
+            else:
+                sources.append(FollowedFile(path, positions.get(path, 0)))
+        watcher = create_watcher([p for p in paths if p != "-"])
+        return cls(sources, watcher)
+
+    def __enter__(self) -> "Follower":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def close(self) -> None:
+        for source in self.sources:
+            source.close()
+        self.watcher.close()
+
+    def lines(self) -> typing.Iterator[typing.Tuple[Source, str]]:
+        """Yield lines from every source as they arrive. Never returns."""
+        while True:
+            active = False
+            for source in self.sources:
+                for line in source.read():
+                    active = True
+                    yield source, line
+
+            if active:
+                self.watcher.reset()
+            else:
+                fds = [s.fileno() for s in self.sources]
+                self.watcher.wait([fd for fd in fds if fd is not None])
@@ -0,0 +1,108 @@
+"""
+A logging handler that formats records with jsonlog-cli patterns in-process.
+
+Logging with `jsonlog.basicConfig` and piping the output through `jsonlog kv` encodes
+each record as JSON, only to decode it again in another process. `PatternHandler`
+takes the attributes a `jsonlog` formatter would encode, and renders them directly
+with a key-value pattern or template, for readable logs while developing.
+
+    import logging
+    import jsonlog_cli.handler
+
+    handler = jsonlog_cli.handler.PatternHandler.from_config("default")
+    logging.basicConfig(level=logging.INFO, handlers=[handler])
+
+Values are rendered as the formatter produced them, without being encoded as JSON.
+"""
+
+import json
+import logging
+import typing
+
+import click
+import jsonlog.formatter
+
+import jsonlog_cli.config
+import jsonlog_cli.pattern
+import jsonlog_cli.record
+
+
+class PayloadRecord(jsonlog_cli.record.Record):
+    """A record built from a formatter's payload, only encoded if its line is used."""
+
+    __slots__ = ("_line",)
+
+    _line: typing.Optional[str]
+
+    def __init__(self, data: typing.Dict[str, typing.Any]) -> None:
+        # Payloads can contain any value, which is encoded with `repr` if needed.
+        self.data = data
+        self._line = None
+
+    @property  # type: ignore
+    def line(self) -> str:  # type: ignore
+        if self._line is None:
+            self._line = json.dumps(self.data, default=repr)
+        return self._line
+
+
+class PatternHandler(logging.StreamHandler):
+    """Formats log records with a pattern, writing them to a stream (STDERR)."""
+
+    pattern: jsonlog_cli.pattern.Pattern
+    payload_formatter: jsonlog.formatter.BaseJSONFormatter
+    color: typing.Optional[bool]
+
+    def __init__(
+        self,
+        pattern: jsonlog_cli.pattern.Pattern,
+        formatter: typing.Optional[jsonlog.formatter.BaseJSONFormatter] = None,
+        stream: typing.Optional[typing.TextIO] = None,
+        color: typing.Optional[bool] = None,
+    ) -> None:
+        super().__init__(stream)
+        self.pattern = pattern
+        self.payload_formatter = formatter or jsonlog.formatter.JSONFormatter()
+        self.color = color
+
+    @classmethod
+    def from_config(
+        cls,
+        name: str = "default",
+        template: bool = False,
+        config_path: typing.Optional[str] = None,
+        **kwargs: typing.Any,
+    ) -> "PatternHandler":
+        """
+        Create a handler using a named key-value pattern (or template) from the
+        same configuration file as `jsonlog`.
+        """
+        if config_path is None:
+            config_path = default_config_path()
+
+        config = jsonlog_cli.config.Config.load(config_path)
+        patterns: typing.Mapping[str, jsonlog_cli.pattern.Pattern]
+        if template:
+            patterns = config.templates
+        else:
+            patterns = config.keyvalues
+        if name not in patterns:
+            raise KeyError(f"No pattern named {name!r} in {config_path}")
+        return cls(patterns[name], **kwargs)
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = self.payload_formatter.payload(record)
+        return self.pattern.format_record(PayloadRecord(dict(payload)))
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            click.echo(self.format(record), file=self.stream, color=self.color)
+        except Exception:
+            self.handleError(record)
+
+
+def default_config_path() -> str:
+    """Return the path `jsonlog` reads its configuration from."""
+    import jsonlog_cli.cli
+
+    return jsonlog_cli.cli.DEFAULT_CONFIG_PATH.as_posix()
@@ -0,0 +1,376 @@
+"""
+Sidecar indexes for skipping through large files.
+
+`jsonlog index FILE` writes an index to `FILE.jsonlog-index`, splitting the file into
+blocks of about 1MiB that start and end at line boundaries. For each block it records
+the range of timestamps it contains, which levels appear in it, and which keys appear
+in it (at any depth). When a stream command filters records by time, by level or by
+`--where` expressions that need a key to exist, blocks that can't contain a matching
+record are skipped without being read.
+
+Indexes are updated incrementally when a file grows, re-indexing only the last block
+and anything after it. An index is ignored if the file has been replaced or
+truncated, and anything written after the index was last updated is always read.
+
+The sidecar file contains a header line followed by a fixed size entry for each
+block. Levels and keys are stored as bitmaps over tables of at most 63 values, with
+the last bit marking blocks that contain values missing from the table.
+"""
+
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import struct
+import typing
+
+import pydantic
+
+import jsonlog_cli.filter
+import jsonlog_cli.inputs
+import jsonlog_cli.keypath
+import jsonlog_cli.levels
+import jsonlog_cli.record
+import jsonlog_cli.timestamp
+
+log = logging.getLogger(__name__)
+
+MAGIC = b"jsonlog-index\n"
+SUFFIX = ".jsonlog-index"
+VERSION = 1
+
+BLOCK_SIZE = 1024 * 1024
+FINGERPRINT_SIZE = 4096
+
+TABLE_SIZE = 63
+OVERFLOW = 1 << TABLE_SIZE
+
+# Start and end offsets, the first and last timestamps, and level and key bitmaps.
+BLOCK = struct.Struct("<QQddQQ")
+
+# Matches object keys. Keys containing escapes are missed, but they can't be used in
+# the clauses of a filter so it doesn't matter that they can't be looked up.
+KEY_PATTERN = re.compile(r'"([^"\\]*)"\s*:')
+
+
+class Block(typing.NamedTuple):
+    start: int
+    end: int
+    first: float
+    last: float
+    levels: int
+    keys: int
+
+
+class Header(pydantic.BaseModel):
+    version: int = VERSION
+    size: int = 0
+    fingerprint: str = ""
+    level_key: str
+    timestamp_key: str
+    timestamp_format: typing.Optional[str] = None
+    levels: typing.List[int] = []
+    keys: typing.List[str] = []
+
+
+class Index:
+    path: str
+    header: Header
+    blocks: typing.List[Block]
+
+    def __init__(
+        self, path: str, header: Header, blocks: typing.Sequence[Block] = ()
+    ) -> None:
+        self.path = path
+        self.header = header
+        self.blocks = list(blocks)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.path!r}, blocks={len(self.blocks)})"
+
+    @property
+    def sidecar(self) -> str:
+        return self.path + SUFFIX
+
+    @classmethod
+    def load(cls, path: str) -> typing.Optional["Index"]:
+        """Load the index for a file, if there is one and it can be read."""
+        try:
+            with open(path + SUFFIX, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+
+        try:
+            start = len(MAGIC)
+            if not data.startswith(MAGIC):
+                raise ValueError("Not a jsonlog index")
+            end = data.index(b"\n", start) + 1
+            header = Header.parse_raw(data[start:end])
+            if header.version != VERSION:
+                raise ValueError(f"Unsupported index version {header.version}")
+            blocks = [Block(*entry) for entry in BLOCK.iter_unpack(data[end:])]
+        except (ValueError, struct.error, pydantic.ValidationError) as error:
+            log.warning(
+                "Could not read index", extra={"path": path, "error": str(error)}
+            )
+            return None
+
+        return cls(path, header, blocks)
+
+    def save(self) -> None:
+        """Write the index, replacing the sidecar file atomically."""
+        temporary = self.sidecar + ".tmp"
+        with open(temporary, "wb") as f:
+            f.write(MAGIC)
+            f.write(self.header.json().encode("utf-8") + b"\n")
+            for block in self.blocks:
+                f.write(BLOCK.pack(*block))
+        os.replace(temporary, self.sidecar)
+
+    @classmethod
+    def update(
+        cls,
+        path: str,
+        level_key: str = "level",
+        timestamp_key: str = "timestamp",
+        timestamp_format: typing.Optional[str] = None,
+    ) -> "Index":
+        """Create or update the index for a file."""
+        header = Header(
+            level_key=level_key,
+            timestamp_key=timestamp_key,
+            timestamp_format=timestamp_format,
+        )
+
+        with open(path, "rb") as file:
+            if jsonlog_cli.inputs.detect_compression(file) is not None:
+                raise ValueError("Compressed files can't be indexed")
+
+            index = cls.load(path)
+            if index is None or not index.valid(file) or not index.same_keys(header):
+                index = cls(path, header)
+            index.extend(file)
+
+        index.save()
+        return index
+
+    def valid(self, file: typing.BinaryIO) -> bool:
+        """Check the file is the one that was indexed, and hasn't been truncated."""
+        size = os.fstat(file.fileno()).st_size
+        if size < self.header.size:
+            return False
+        return fingerprint(file, self.header.size) == self.header.fingerprint
+
+    def same_keys(self, header: Header) -> bool:
+        return (header.level_key, header.timestamp_key, header.timestamp_format) == (
+            self.header.level_key,
+            self.header.timestamp_key,
+            self.header.timestamp_format,
+        )
+
+    def extend(self, file: typing.BinaryIO) -> None:
+        """Index anything added since the last update, re-indexing the last block."""
+        start = self.blocks.pop().start if self.blocks else 0
+        indexer = Indexer(self.header)
+        self.blocks.extend(indexer.blocks(file, start))
+        self.header.size = self.blocks[-1].end if self.blocks else 0
+        self.header.fingerprint = fingerprint(file, self.header.size)
+
+    def select(
+        self, where: jsonlog_cli.filter.Filter, size: int
+    ) -> typing.List[jsonlog_cli.inputs.Range]:
+        """Return the ranges of the file that could contain records matching a filter."""
+        skip = self.skipper(where)
+        ranges: typing.List[jsonlog_cli.inputs.Range] = []
+        blocks = [b for b in self.blocks if not skip(b)]
+        if size > self.header.size:
+            blocks.append(Block(self.header.size, size, math.nan, math.nan, 0, 0))
+
+        for block in blocks:
+            if ranges and ranges[-1][1] == block.start:
+                ranges[-1] = (ranges[-1][0], block.end)
+            else:
+                ranges.append((block.start, block.end))
+        return ranges
+
+    def skipper(
+        self, where: jsonlog_cli.filter.Filter
+    ) -> typing.Callable[[Block], bool]:
+        """Create a function that returns True for blocks that can't match a filter."""
+        lower = -math.inf if where.since is None else where.since
+        upper = math.inf if where.until is None else where.until
+        # Timestamps can only be compared if they were parsed in the same way.
+        timestamps = where.timestamps
+        by_time = where.since is not None or where.until is not None
+        if timestamps is None or (timestamps.key, timestamps.format) != (
+            self.header.timestamp_key,
+            self.header.timestamp_format,
+        ):
+            by_time = False
+
+        level_mask = None
+        if where.level is not None and where.level_key == self.header.level_key:
+            level_mask = OVERFLOW
+            for bit, number in enumerate(self.header.levels):
+                if number >= where.level:
+                    level_mask |= 1 << bit
+
+        key_masks = self.key_masks(where.clauses)
+
+        def skip(block: Block) -> bool:
+            # Blocks without timestamps have a NaN range, which is always skipped.
+            if by_time and not (block.last >= lower and block.first < upper):
+                return True
+            if level_mask is not None and not block.levels & level_mask:
+                return True
+            return any(not block.keys & mask for mask in key_masks)
+
+        return skip
+
+    def key_masks(self, clauses: jsonlog_cli.filter.Clauses) -> typing.List[int]:
+        """
+        Convert prefilter clauses that only require keys into key bitmaps.
+
+        Substrings ending in a quote that don't start with one are the final segment
+        of a key that must exist (see `jsonlog_cli.filter.single_clause`). Like the
+        substring itself, the segment matches any key that ends with it, including
+        literal keys containing dots. Keys missing from the table could end with it
+        too, so blocks that overflowed the table are never skipped.
+        """
+        masks = []
+        for clause in clauses or ():
+            if not all(s.endswith('"') and not s.startswith('"') for s in clause):
+                continue
+            mask = OVERFLOW
+            for substring in clause:
+                segment = substring[:-1]
+                for bit, key in enumerate(self.header.keys):
+                    if key.endswith(segment):
+                        mask |= 1 << bit
+            masks.append(mask)
+        return masks
+
+
+class Indexer:
+    """Reads blocks of a file, recording the timestamps, levels and keys in each."""
+
+    header: Header
+    level_key: jsonlog_cli.keypath.KeyPath
+    timestamps: jsonlog_cli.timestamp.TimestampParser
+    level_bits: typing.Dict[int, int]
+    key_bits: typing.Dict[str, int]
+
+    def __init__(self, header: Header) -> None:
+        self.header = header
+        self.level_key = jsonlog_cli.keypath.KeyPath.of(header.level_key)
+        self.timestamps = jsonlog_cli.timestamp.TimestampParser(
+            header.timestamp_key, format=header.timestamp_format
+        )
+        self.level_bits = {level: 1 << bit for bit, level in enumerate(header.levels)}
+        self.key_bits = {key: 1 << bit for bit, key in enumerate(header.keys)}
+
+    def blocks(self, file: typing.BinaryIO, start: int) -> typing.Iterator[Block]:
+        """Index blocks from an offset, stopping at the last complete line."""
+        file.seek(start)
+        offset = start
+        remainder = b""
+        while True:
+            chunk = file.read(BLOCK_SIZE)
+            if not chunk:
+                return
+            data = remainder + chunk
+            end = data.rfind(b"\n") + 1
+            if end == 0:
+                remainder = data
+                continue
+            data, remainder = data[:end], data[end:]
+            yield self.block(offset, data)
+            offset += len(data)
+
+    def block(self, offset: int, data: bytes) -> Block:
+        text = data.decode("utf-8", errors="replace")
+
+        keys = 0
+        for key in set(KEY_PATTERN.findall(text)):
+            keys |= self.bit(self.key_bits, self.header.keys, key)
+
+        levels = 0
+        first, last = math.inf, -math.inf
+        for line in text.split("\n"):
+            record = self.decode(line)
+            if record is None:
+                continue
+
+            timestamp = self.timestamps(record)
+            if timestamp is not None:
+                first = min(first, timestamp)
+                last = max(last, timestamp)
+
+            level = jsonlog_cli.levels.level_number(record.extract(self.level_key))
+            if level is not None:
+                levels |= self.bit(self.level_bits, self.header.levels, level)
+
+        if first > last:
+            first = last = math.nan
+        return Block(offset, offset + len(data), first, last, levels, keys)
+
+    def decode(self, line: str) -> typing.Optional[jsonlog_cli.record.Record]:
+        if not line.strip():
+            return None
+        try:
+            data = jsonlog_cli.record.loads(line)
+        except json.JSONDecodeError:
+            return None
+        if not isinstance(data, dict):
+            return None
+        return jsonlog_cli.record.Record(line=line, data=data)
+
+    @staticmethod
+    def bit(
+        bits: typing.Dict[typing.Any, int], table: typing.List, value: typing.Any
+    ) -> int:
+        """Return the bit for a value, adding it to the table if there's space."""
+        bit = bits.get(value)
+        if bit is None:
+            if len(table) >= TABLE_SIZE:
+                return OVERFLOW
+            bit = bits[value] = 1 << len(table)
+            table.append(value)
+        return bit
+
+
+def fingerprint(file: typing.BinaryIO, size: int) -> str:
+    """Hash the start of a file, so we can tell if it's been replaced."""
+    position = file.tell()
+    file.seek(0)
+    digest = hashlib.sha1(file.read(min(size, FINGERPRINT_SIZE))).hexdigest()
+    file.seek(position)
+    return digest
+
+
+def seek(
+    where: jsonlog_cli.filter.Filter, path: str, file: typing.BinaryIO
+) -> typing.Optional[typing.List[jsonlog_cli.inputs.Range]]:
+    """Use a file's index to choose the parts that could match a filter, if it has one."""
+    index = Index.load(path)
+    if index is None:
+        return None
+
+    if not index.valid(file):
+        log.warning("Ignoring outdated index", extra={"path": path})
+        return None
+
+    size = os.fstat(file.fileno()).st_size
+    ranges = index.select(where, size)
+    log.info(
+        "Using index",
+        extra={
+            "path": path,
+            "size": size,
+            "selected": sum(end - start for start, end in ranges),
+        },
+    )
+    return ranges
@@ -0,0 +1,249 @@
+"""
+Open inputs, transparently decompressing archives.
+
+Compressed inputs are detected by their magic bytes rather than their file names, so
+rotated logs (`app.log.1.gz`) and compressed data piped to STDIN both work. They're
+decompressed in a background thread, which overlaps with parsing and formatting as
+the compression modules release the GIL while they work. Decompressed data is passed
+over a bounded queue, so memory use doesn't depend on the size of the archive. The
+thread stops when the stream is closed, even if the rest was never read.
+"""
+
+import codecs
+import contextlib
+import importlib
+import io
+import logging
+import queue
+import threading
+import typing
+
+import click
+
+log = logging.getLogger(__name__)
+
+STDIN = "-"
+
+CHUNK_SIZE = 1024 * 1024
+QUEUE_SIZE = 8
+
+# How often a blocked decompression thread checks if it should stop.
+STOP_INTERVAL = 0.1
+
+Opener = typing.Callable[[typing.IO[bytes]], typing.IO[bytes]]
+Compression = typing.Tuple[str, Opener]
+
+# Byte ranges of a file to read, starting and ending at line boundaries.
+Range = typing.Tuple[int, int]
+
+# Chooses the ranges of a file worth reading, or returns None to read everything.
+Seek = typing.Callable[[str, typing.BinaryIO], typing.Optional[typing.Sequence[Range]]]
+
+# Magic bytes, format names and the modules that open them. The modules are only
+# imported when a compressed input is found.
+COMPRESSION: typing.Sequence[typing.Tuple[bytes, str, str]] = (
+    (b"\x1f\x8b", "gzip", "gzip"),
+    (b"BZh", "bz2", "bz2"),
+    (b"\xfd7zXZ\x00", "xz", "lzma"),
+)
+MAGIC_SIZE = max(len(magic) for magic, _, _ in COMPRESSION)
+
+
+class LineSplitter:
+    """Split chunks of bytes into lines, keeping partial lines for later."""
+
+    def __init__(self) -> None:
+        # Invalid UTF-8 is replaced so that one bad write can't stop us following.
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.partial = ""
+
+    def split(self, chunk: bytes) -> typing.List[str]:
+        *lines, self.partial = (self.partial + self.decoder.decode(chunk)).split("\n")
+        return [line + "\n" for line in lines]
+
+    def reset(self) -> typing.List[str]:
+        """Return the partial line (if there is one) and start again."""
+        partial = self.partial + self.decoder.decode(b"", final=True)
+        self.decoder.reset()
+        self.partial = ""
+        return [partial + "\n"] if partial else []
+
+
+class DecompressedStream:
+    """Decompresses a file in a background thread, yielding lines of text."""
+
+    name: str
+    chunks: "queue.Queue[typing.Union[bytes, BaseException, None]]"
+    stopped: threading.Event
+    thread: threading.Thread
+
+    def __init__(self, name: str, file: typing.IO[bytes], opener: Opener) -> None:
+        self.name = name
+        self.chunks = queue.Queue(maxsize=QUEUE_SIZE)
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(
+            target=self.decompress,
+            args=(file, opener),
+            name=f"decompress {name}",
+            daemon=True,
+        )
+        self.thread.start()
+
+    def decompress(self, file: typing.IO[bytes], opener: Opener) -> None:
+        try:
+            with opener(file) as decompressed:
+                for chunk in iter(lambda: decompressed.read(CHUNK_SIZE), b""):
+                    if not self.put(chunk):
+                        return
+        except BaseException as error:
+            self.put(error)
+        finally:
+            self.put(None)
+
+    def put(self, item: typing.Union[bytes, BaseException, None]) -> bool:
+        """Queue an item, returning False if the stream is closed before there's space."""
+        while not self.stopped.is_set():
+            try:
+                self.chunks.put(item, timeout=STOP_INTERVAL)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def close(self) -> None:
+        """Stop decompressing, and wait for the thread to finish."""
+        self.stopped.set()
+        self.thread.join()
+
+    def __iter__(self) -> typing.Iterator[str]:
+        splitter = LineSplitter()
+        try:
+            while True:
+                item = self.chunks.get()
+                if item is None:
+                    break
+                if isinstance(item, BaseException):
+                    raise click.FileError(self.name, hint=str(item))
+                yield from splitter.split(item)
+            yield from splitter.reset()
+        finally:
+            self.close()
+
+
+class RangeStream:
+    """Reads lines from byte ranges of a file, skipping everything else."""
+
+    file: typing.BinaryIO
+    ranges: typing.Sequence[Range]
+
+    def __init__(self, file: typing.BinaryIO, ranges: typing.Sequence[Range]) -> None:
+        self.file = file
+        self.ranges = ranges
+
+    def __iter__(self) -> typing.Iterator[str]:
+        splitter = LineSplitter()
+        for start, end in self.ranges:
+            self.file.seek(start)
+            remaining = end - start
+            while remaining > 0:
+                chunk = self.file.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield from splitter.split(chunk)
+            yield from splitter.reset()
+
+
+def detect_compression(file: typing.IO[bytes]) -> typing.Optional[Compression]:
+    """Detect a compression format from the first bytes of a file."""
+    if hasattr(file, "peek"):
+        header = file.peek(MAGIC_SIZE)[:MAGIC_SIZE]  # type: ignore
+    else:
+        header = file.read(MAGIC_SIZE)
+        file.seek(0)
+
+    for magic, name, module in COMPRESSION:
+        if header.startswith(magic):
+            return name, importlib.import_module(module).open  # type: ignore
+    return None
+
+
+def is_compressed(path: str) -> bool:
+    if path == STDIN:
+        return False
+    with open(path, "rb") as file:
+        return detect_compression(file) is not None
+
+
+def open_streams(
+    paths: typing.Sequence[str], seek: typing.Optional[Seek] = None
+) -> typing.Generator[typing.Iterable[str], None, None]:
+    """
+    Open each input in turn, reading from STDIN if there are no inputs.
+
+    Files are opened lazily and closed once the next file is requested. If given,
+    `seek` chooses which parts of each uncompressed file to read.
+    """
+    for path in paths or (STDIN,):
+        if path == STDIN:
+            yield open_stdin()
+        else:
+            with open(path, "rb") as file:
+                stream = open_binary(path, file, seek)
+                try:
+                    yield stream
+                finally:
+                    close(stream)
+
+
+@contextlib.contextmanager
+def open_all(
+    paths: typing.Sequence[str], seek: typing.Optional[Seek] = None
+) -> typing.Iterator[typing.List[typing.Iterable[str]]]:
+    """Open every input at once so they can be read side by side."""
+    with contextlib.ExitStack() as stack:
+        streams = []
+        for path in paths or (STDIN,):
+            if path == STDIN:
+                streams.append(open_stdin())
+            else:
+                file = stack.enter_context(open(path, "rb"))
+                streams.append(open_binary(path, file, seek))
+                # Streams are closed before their files.
+                stack.callback(close, streams[-1])
+        yield streams
+
+
+def close(stream: typing.Iterable[str]) -> None:
+    """Stop anything reading a stream in the background."""
+    if isinstance(stream, DecompressedStream):
+        stream.close()
+
+
+def open_stdin() -> typing.Iterable[str]:
+    stdin = click.get_binary_stream("stdin")
+    if hasattr(stdin, "peek"):
+        compression = detect_compression(stdin)
+        if compression is not None:
+            return decompress("<stdin>", stdin, compression)
+    return click.get_text_stream("stdin", encoding="utf-8")
+
+
+def open_binary(
+    name: str, file: typing.BinaryIO, seek: typing.Optional[Seek] = None
+) -> typing.Iterable[str]:
+    compression = detect_compression(file)
+    if compression is None:
+        ranges = None if seek is None else seek(name, file)
+        if ranges is not None:
+            return RangeStream(file, ranges)
+        return io.TextIOWrapper(file, encoding="utf-8")  # type: ignore
+    return decompress(name, file, compression)
+
+
+def decompress(
+    name: str, file: typing.IO[bytes], compression: Compression
+) -> DecompressedStream:
+    format_name, opener = compression
+    log.info("Decompressing input", extra={"input": name, "format": format_name})
+    return DecompressedStream(name, file, opener)
@@ -0,0 +1,119 @@
+import functools
+import re
+import typing
+
+import jsonlog_cli.types
+
+# Special keys that refer to the record itself rather than a value inside it.
+SPECIAL_KEYS = frozenset({"__json__", "__line__"})
+
+SEGMENT_PATTERN = re.compile(r"([^.\[\]]*)((?:\[-?\d+\])*)")
+INDEX_PATTERN = re.compile(r"\[(-?\d+)\]")
+
+
+class Step(typing.NamedTuple):
+    """A single step taken while walking into a record."""
+
+    # The key to look up in a mapping, or None if this step can only index a list.
+    key: typing.Optional[str]
+
+    # The position to use if the current value is a list.
+    position: typing.Optional[int]
+
+    # The rest of the original key (including this step), which is looked up as a
+    # literal key before the key is split. None if there's no remainder to check.
+    literal: typing.Optional[str]
+
+
+class KeyPath(str):
+    """
+    A key that has been parsed once into the steps needed to extract a value.
+
+    Keys are split on dots to access nested mappings. Segments that are integers
+    (`items.0`) or use brackets (`items[0]`) index into lists.
+
+    Keys that contain dots are common (e.g. `cluster.name` from Elasticsearch), so
+    literal keys take precedence: at each level, the remaining part of the key is
+    looked up as-is before it is split. For `a.b.c`, the value of `{"a.b.c": 1}` is
+    preferred over `{"a": {"b.c": 2}}`, which is preferred over `{"a": {"b": {"c": 3}}}`.
+
+    KeyPath is a subclass of `str` so that patterns can still be compared, hashed and
+    serialised as strings.
+    """
+
+    steps: typing.Tuple[Step, ...]
+    special: bool
+    simple: bool
+
+    def __init__(self, key: str) -> None:
+        # The string itself is created by `str.__new__`, which is passed the same key.
+        super().__init__()
+        self.steps = self.parse(key)
+        self.special = key in SPECIAL_KEYS
+        # Simple keys are a single top-level key that can be looked up directly.
+        self.simple = not self.special and self.steps == (Step(key, None, None),)
+
+    def __reduce__(self) -> typing.Tuple[typing.Any, ...]:
+        return self.__class__, (str(self),)
+
+    @classmethod
+    def __get_validators__(cls) -> typing.Iterator[typing.Callable]:
+        yield cls.validate
+
+    @classmethod
+    def validate(cls, value: typing.Any) -> "KeyPath":
+        if not isinstance(value, str):
+            raise TypeError("string required")
+        return cls.of(value)
+
+    @classmethod
+    def of(cls, key: str) -> "KeyPath":
+        """Return a compiled KeyPath, reusing a cached one if the key is a string."""
+        if isinstance(key, KeyPath):
+            return key
+        return compile_key(key)
+
+    @staticmethod
+    def parse(key: str) -> typing.Tuple[Step, ...]:
+        steps: typing.List[Step] = []
+        position = 0
+
+        for segment in key.split("."):
+            remainder = key[position:]
+            position += len(segment) + 1
+
+            match = SEGMENT_PATTERN.fullmatch(segment)
+            name, indexes = match.groups() if match else (segment, "")
+            index = int(name) if name.lstrip("-").isdigit() else None
+
+            # A literal lookup is only needed if it differs from the step's own key.
+            literal = remainder if remainder != name else None
+            steps.append(Step(name, index, literal))
+            for i in INDEX_PATTERN.findall(indexes):
+                steps.append(Step(None, int(i), None))
+
+        return tuple(steps)
+
+    def extract(self, data: jsonlog_cli.types.Value) -> jsonlog_cli.types.Value:
+        """Extract the value this key refers to, returning None if it's missing."""
+        value = data
+        for key, position, literal in self.steps:
+            if isinstance(value, dict):
+                if literal is not None and literal in value:
+                    return value[literal]
+                if key is None or key not in value:
+                    return None
+                value = value[key]
+            elif isinstance(value, list) and position is not None:
+                try:
+                    value = value[position]
+                except IndexError:
+                    return None
+            else:
+                return None
+        return value
+
+
+@functools.lru_cache(maxsize=4096)
+def compile_key(key: str) -> KeyPath:
+    return KeyPath(key)
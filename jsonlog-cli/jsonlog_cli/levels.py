@@ -0,0 +1,29 @@
+import typing
+
+import jsonlog_cli.types
+
+# Numeric values for the level names commonly used by logging libraries, matching
+# the values used by Python's `logging` module where they overlap.
+LEVELS: typing.Mapping[str, int] = {
+    "trace": 5,
+    "debug": 10,
+    "info": 20,
+    "notice": 25,
+    "warn": 30,
+    "warning": 30,
+    "error": 40,
+    "critical": 50,
+    "fatal": 50,
+    "panic": 50,
+}
+
+
+def level_number(value: jsonlog_cli.types.Value) -> typing.Optional[int]:
+    """Convert a level name or number from a record into a number."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        return LEVELS.get(value.casefold())
+    return None
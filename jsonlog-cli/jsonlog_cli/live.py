@@ -0,0 +1,342 @@
+"""
+Read from many live inputs at once, interleaving records as they arrive.
+
+Inputs are read concurrently using asyncio. Pipes (including named pipes, and STDIN
+when it's a pipe) and connections accepted from TCP or Unix socket listeners are
+read directly by the event loop. Regular files are read in a
+background thread, or polled for new data with `--follow`.
+
+Lines are passed to a single writer in batches over a bounded queue. When output is
+slower than input (e.g. a slow terminal or a paused pager), the writer blocks, the
+queue fills up, and readers stop reading until there's space. Pipes and sockets then
+fill up and their writers block, rather than jsonlog buffering an unbounded amount of
+data in memory. If the writer fails (e.g. output is a closed pipe), every reader is
+stopped and the writer's error is raised.
+"""
+
+import asyncio
+import concurrent.futures
+import logging
+import os
+import stat
+import threading
+import typing
+
+import jsonlog_cli.follow
+import jsonlog_cli.inputs
+
+if typing.TYPE_CHECKING:
+    import jsonlog_cli.stream
+
+log = logging.getLogger(__name__)
+
+READ_SIZE = 64 * 1024
+BATCH_SIZE = 1024
+QUEUE_SIZE = 64
+
+# How often threads blocked on a full queue check if we've stopped, in seconds.
+STOP_INTERVAL = 0.1
+
+# A batch of lines from a named source, and whether the source has closed.
+Batch = typing.Tuple[str, typing.List[str], bool]
+
+T = typing.TypeVar("T")
+
+
+class Address(typing.NamedTuple):
+    """A TCP host and port, or the path to a Unix socket."""
+
+    host: typing.Optional[str] = None
+    port: typing.Optional[int] = None
+    path: typing.Optional[str] = None
+
+    def __str__(self) -> str:
+        return f"unix:{self.path}" if self.path else f"tcp:{self.host}:{self.port}"
+
+    @classmethod
+    def parse(cls, address: str) -> "Address":
+        """
+        Parse `unix:PATH`, a path containing a `/`, `HOST:PORT` or `PORT`.
+
+        TCP listeners only accept local connections unless a host is given.
+        """
+        if address.startswith("unix:"):
+            return cls(path=address.split(":", 1)[1])
+        if "/" in address:
+            return cls(path=address)
+
+        host, _, port = address.rpartition(":")
+        if not port.isdigit() or not 0 < int(port) < 65536:
+            raise ValueError(
+                f"Invalid address {address!r}, expected [HOST:]PORT or a path"
+            )
+        return cls(host=host.strip("[]") or "127.0.0.1", port=int(port))
+
+
+class LiveInputs:
+    handler: "jsonlog_cli.stream.StreamHandler"
+    follow: bool
+    queue: "asyncio.Queue[typing.Optional[Batch]]"
+    connections: int
+    named: bool
+    stopped: threading.Event
+
+    def __init__(
+        self, handler: "jsonlog_cli.stream.StreamHandler", follow: bool = False
+    ) -> None:
+        self.handler = handler
+        self.follow = follow
+        self.connections = 0
+        self.named = False
+        self.stopped = threading.Event()
+
+    def run(
+        self, paths: typing.Sequence[str], addresses: typing.Sequence[Address] = ()
+    ) -> None:
+        """Read every input until they've all closed, or forever if listening."""
+        loop = asyncio.new_event_loop()
+        task = loop.create_task(self.main(paths, addresses))
+        try:
+            loop.run_until_complete(task)
+        finally:
+            task.cancel()
+            loop.run_until_complete(asyncio.gather(task, return_exceptions=True))
+            loop.close()
+
+    async def main(
+        self, paths: typing.Sequence[str], addresses: typing.Sequence[Address]
+    ) -> None:
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.named = len(paths) > 1 or bool(addresses)
+        writer = asyncio.ensure_future(self.write())
+        readers: typing.List["asyncio.Future[typing.Any]"] = [
+            asyncio.ensure_future(self.read_path(path)) for path in paths
+        ]
+        servers = [await self.listen(address) for address in addresses]
+
+        async def read() -> None:
+            await asyncio.gather(*readers)
+            await self.queue.put(None)
+
+        # Listeners keep running until we're interrupted, even once every other
+        # input has closed.
+        if servers:
+            readers.append(asyncio.ensure_future(asyncio.Event().wait()))
+        reading = asyncio.ensure_future(read())
+        try:
+            # The writer only finishes early if it fails, and then nothing is left
+            # to empty the queue for the readers.
+            done, _ = await asyncio.wait(
+                [reading, writer], return_when=asyncio.FIRST_EXCEPTION
+            )
+            for future in done:
+                future.result()
+        finally:
+            self.stopped.set()
+            futures = (writer, reading, *readers)
+            for future in futures:
+                future.cancel()
+            await asyncio.gather(*futures, return_exceptions=True)
+            for server, address in zip(servers, addresses):
+                server.close()
+                await server.wait_closed()
+                if address.path is not None:
+                    # Don't hide why we stopped if the socket was already removed.
+                    try:
+                        os.unlink(address.path)
+                    except FileNotFoundError:
+                        pass
+
+    async def write(self) -> None:
+        """Parse and output lines, keeping a separate JSON stream for each source."""
+        streams: typing.Dict[str, "jsonlog_cli.stream.JSONStream"] = {}
+        while True:
+            batch = await self.queue.get()
+            if batch is None:
+                return
+
+            source, lines, closed = batch
+            stream = streams.get(source)
+            if stream is None:
+                stream = streams[source] = self.handler.create_json_stream(())
+
+            # Like `tail`, sources are only named if there's more than one.
+            name = source if self.named else None
+            for line in lines:
+                for line, record in stream.feed(line):
+                    self.handler.echo(line, record, source=name)
+
+            if closed:
+                for line, record in streams.pop(source).flush():
+                    self.handler.echo(line, record, source=name)
+
+    async def read_path(self, path: str) -> None:
+        stdin = path == jsonlog_cli.inputs.STDIN
+        mode = os.fstat(0).st_mode if stdin else os.stat(path).st_mode
+        if stat.S_ISFIFO(mode) or stat.S_ISSOCK(mode):
+            await self.read_pipe(path)
+        elif self.follow and not stdin:
+            await self.follow_file(path)
+        else:
+            # This includes STDIN when it's a terminal, which we don't want to make
+            # non-blocking as that would also affect the shell that started us.
+            await self.read_file(path)
+
+    async def read_pipe(self, path: str) -> None:
+        """
+        Read from a pipe until it closes.
+
+        Named pipes are reopened when following, waiting for a new writer.
+        """
+        loop = asyncio.get_event_loop()
+        stdin = path == jsonlog_cli.inputs.STDIN
+        name = source_name(path)
+        while True:
+            if stdin:
+                file = os.fdopen(os.dup(0), "rb", buffering=0)
+            else:
+                # Opening a named pipe blocks until something opens it for writing.
+                file = await in_thread(open, path, "rb", buffering=0)
+
+            reader = asyncio.StreamReader(limit=READ_SIZE)
+            protocol = asyncio.StreamReaderProtocol(reader)
+            transport, _ = await loop.connect_read_pipe(lambda: protocol, file)
+            try:
+                await self.read_stream(name, reader)
+            finally:
+                transport.close()
+
+            if stdin or not self.follow:
+                return
+
+    async def read_stream(self, name: str, reader: asyncio.StreamReader) -> None:
+        splitter = jsonlog_cli.inputs.LineSplitter()
+        while True:
+            chunk = await reader.read(READ_SIZE)
+            if not chunk:
+                break
+            lines = splitter.split(chunk)
+            if lines:
+                await self.queue.put((name, lines, False))
+        await self.queue.put((name, splitter.reset(), True))
+
+    async def read_file(self, path: str) -> None:
+        """Read a regular file (decompressing it if needed) in a background thread."""
+        loop = asyncio.get_event_loop()
+        name = source_name(path)
+
+        def put(lines: typing.List[str], closed: bool = False) -> bool:
+            """Queue a batch, returning False if we stop before there's space."""
+            coroutine = self.queue.put((name, lines, closed))
+            try:
+                future = asyncio.run_coroutine_threadsafe(coroutine, loop)
+            except RuntimeError:
+                # The loop has already closed.
+                coroutine.close()
+                return False
+            while not self.stopped.is_set():
+                try:
+                    future.result(timeout=STOP_INTERVAL)
+                    return True
+                except concurrent.futures.TimeoutError:
+                    pass
+            if future.cancel():
+                # The loop never started putting the batch in the queue.
+                coroutine.close()
+            return False
+
+        def read() -> None:
+            for stream in jsonlog_cli.inputs.open_streams([path]):
+                lines = []
+                for line in stream:
+                    lines.append(line)
+                    if len(lines) >= BATCH_SIZE:
+                        if not put(lines):
+                            return
+                        lines = []
+                if not put(lines, closed=True):
+                    return
+
+        await in_thread(read)
+
+    async def follow_file(self, path: str) -> None:
+        """Poll a regular file for new lines, backing off while nothing changes."""
+        followed = jsonlog_cli.follow.FollowedFile(path)
+        interval = jsonlog_cli.follow.POLL_MIN_INTERVAL
+        try:
+            while True:
+                lines = followed.read()
+                if lines:
+                    await self.queue.put((path, lines, False))
+                    interval = jsonlog_cli.follow.POLL_MIN_INTERVAL
+                else:
+                    await asyncio.sleep(interval)
+                    interval = min(interval * 2, jsonlog_cli.follow.POLL_MAX_INTERVAL)
+        finally:
+            followed.close()
+
+    async def listen(self, address: Address) -> asyncio.AbstractServer:
+        log.info("Listening for connections", extra={"address": str(address)})
+        if address.path is not None:
+            return await asyncio.start_unix_server(self.accept, path=address.path)
+        return await asyncio.start_server(self.accept, address.host, address.port)
+
+    async def accept(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Read from a connection until it closes, naming it after its peer."""
+        self.connections += 1
+        peer = writer.get_extra_info("peername")
+        if isinstance(peer, tuple):
+            name = f"{peer[0]}:{peer[1]}"
+        else:
+            name = f"connection {self.connections}"
+        try:
+            await self.read_stream(name, reader)
+        finally:
+            writer.close()
+
+
+def source_name(path: str) -> str:
+    return "<stdin>" if path == jsonlog_cli.inputs.STDIN else path
+
+
+def in_thread(
+    function: typing.Callable[..., T], *args: typing.Any, **kwargs: typing.Any
+) -> "asyncio.Future[T]":
+    """
+    Run a blocking function in a daemon thread.
+
+    Unlike `loop.run_in_executor`, this won't stop us exiting while the function is
+    still blocked (e.g. opening a named pipe that nothing ever writes to).
+    """
+    loop = asyncio.get_event_loop()
+    future = loop.create_future()
+
+    def resolve(result: typing.Any, error: typing.Optional[BaseException]) -> None:
+        if future.cancelled():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def settle(result: typing.Any, error: typing.Optional[BaseException]) -> None:
+        try:
+            loop.call_soon_threadsafe(resolve, result, error)
+        except RuntimeError:
+            # The loop has closed, so nothing is waiting for the result.
+            pass
+
+    def run() -> None:
+        try:
+            result = function(*args, **kwargs)
+        except BaseException as error:
+            settle(None, error)
+        else:
+            settle(result, None)
+
+    threading.Thread(
+        target=run, name=f"jsonlog {function.__name__}", daemon=True
+    ).start()
+    return future
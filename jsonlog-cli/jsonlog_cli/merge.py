@@ -0,0 +1,82 @@
+"""
+Merge several streams of records into a single stream ordered by timestamp.
+
+Each stream is read lazily, and only the next record from each stream is held while
+merging, so memory use depends on the number of streams rather than their length.
+Streams are expected to be sorted already. Streams that are only roughly sorted can
+be reordered within a "slop" window first: records are held until a record more
+than `slop` seconds newer has been read from the same stream.
+
+Lines without a timestamp (including lines that aren't JSON) are kept with the
+record before them in their stream, so continuation lines stay in place.
+"""
+
+import heapq
+import operator
+import typing
+
+import jsonlog_cli.record
+import jsonlog_cli.timestamp
+
+RecordPair = typing.Tuple[str, typing.Optional[jsonlog_cli.record.Record]]
+TimestampedPair = typing.Tuple[
+    jsonlog_cli.timestamp.Timestamp,
+    int,
+    str,
+    typing.Optional[jsonlog_cli.record.Record],
+]
+Parser = typing.Callable[
+    [jsonlog_cli.record.Record], typing.Optional[jsonlog_cli.timestamp.Timestamp]
+]
+
+# Upper bound on the number of records held for each stream while reordering, so
+# that a stream that's badly out of order can't use an unbounded amount of memory.
+SLOP_LIMIT = 10000
+
+
+def merge(
+    streams: typing.Sequence[typing.Iterable[RecordPair]],
+    parsers: typing.Sequence[Parser],
+    slop: float = 0.0,
+) -> typing.Iterator[RecordPair]:
+    """
+    Merge streams of (line, record) pairs in timestamp order.
+
+    Each stream has its own timestamp parser. Records with the same timestamp are
+    output in the order their streams were given.
+    """
+    timestamped = [timestamps(s, p) for s, p in zip(streams, parsers)]
+    if slop > 0:
+        timestamped = [reorder(s, slop) for s in timestamped]
+
+    for _, _, line, record in heapq.merge(*timestamped, key=operator.itemgetter(0)):
+        yield line, record
+
+
+def timestamps(
+    stream: typing.Iterable[RecordPair], parser: Parser
+) -> typing.Iterator[TimestampedPair]:
+    """Add a timestamp to each pair, reusing the last timestamp if there isn't one."""
+    timestamp = float("-inf")
+    for sequence, (line, record) in enumerate(stream):
+        if record is not None:
+            parsed = parser(record)
+            if parsed is not None:
+                timestamp = parsed
+        yield timestamp, sequence, line, record
+
+
+def reorder(
+    stream: typing.Iterable[TimestampedPair], slop: float
+) -> typing.Iterator[TimestampedPair]:
+    """Sort a stream that's out of order by at most `slop` seconds."""
+    pending: typing.List[TimestampedPair] = []
+    newest = float("-inf")
+    for pair in stream:
+        heapq.heappush(pending, pair)
+        newest = max(newest, pair[0])
+        while pending and (pending[0][0] < newest - slop or len(pending) > SLOP_LIMIT):
+            yield heapq.heappop(pending)
+
+    while pending:
+        yield heapq.heappop(pending)
@@ -1,18 +1,35 @@
+import functools
 import itertools
 import json
 import typing
 
+import click
 import pydantic
 
 from .colours import Colour
-from .record import Record
-from .text import wrap_and_style_lines
+from .keypath import KeyPath
+from .record import Record, RecordDict
+from .template import Template
+from .text import CACHE_SIZE, wrap_and_style_lines
 from .types import Value
 
 Level = typing.Optional[str]
+
+# Keys can be given as strings, but are always validated into KeyPaths (which are
+# tried first).
+Key = typing.Union[KeyPath, str]
+
+# Templates can also be given as strings, but are always compiled into Templates
+# (strings that aren't valid templates are rejected rather than kept as strings).
+Format = typing.Union[Template, str]
 P = typing.TypeVar("P", bound="Pattern")
 
 
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def indent_json(compact: str) -> str:
+    return json.dumps(json.loads(compact), indent=2)
+
+
 class Pattern(pydantic.BaseModel):
     colours: typing.Mapping[Value, Colour] = {
         "info": Colour(fg="cyan"),
@@ -22,13 +39,21 @@ class Pattern(pydantic.BaseModel):
         "critical": Colour(fg="red", bold=True),
         "fatal": Colour(fg="red", bold=True),
     }
-    level_key: str = "level"
+    level_key: Key = KeyPath("level")
     multiline_json: bool = False
-    multiline_keys: typing.Sequence[str] = ()
+    multiline_keys: typing.Sequence[Key] = ()
+    timestamp_key: Key = KeyPath("timestamp")
+    timestamp_format: typing.Optional[str] = None
 
     def replace(self: P, **changes: typing.Optional[typing.Any]) -> P:
-        """Return a copy of the pattern with fields replaced."""
-        return self.copy(update={k: v for k, v in changes.items() if v})
+        """
+        Return a copy of the pattern with fields replaced.
+
+        The copy is validated so that keys are compiled into KeyPaths.
+        """
+        return self.__class__(
+            **{**self.dict(), **{k: v for k, v in changes.items() if v}}
+        )
 
     def format_record(self, record: Record) -> str:
         message = self.format_message(record)
@@ -44,6 +69,17 @@ class Pattern(pydantic.BaseModel):
     def format_message(self, record: Record) -> str:
         raise NotImplementedError
 
+    def format_repeated(
+        self, record: Record, count: int, first: Value, last: Value
+    ) -> str:
+        """Format the first of a run of repeated records, noting how often it ran."""
+        output = self.format_record(record)
+        summary = f"repeated {count} times"
+        if first is not None and last is not None:
+            summary += f", {first} to {last}"
+        message, newline, rest = output.partition("\n")
+        return message + click.style(f" ({summary})", dim=True) + newline + rest
+
     def format_multiline(self, record: Record) -> typing.Iterator[str]:
         for key in self.multiline_keys:
             value = record.extract(key)
@@ -65,7 +101,9 @@ class Pattern(pydantic.BaseModel):
         if isinstance(value, list):
             return "\n".join(value)
 
-        return json.dumps(value, indent=2)
+        # Indenting uses json's pure-Python encoder, so values are only indented
+        # once for each distinct compact encoding (which uses the C encoder).
+        return indent_json(json.dumps(value))
 
     def highlight_color(self, record: Record) -> Colour:
         return self.colour(record.extract(self.level_key))
@@ -76,6 +114,10 @@ class Pattern(pydantic.BaseModel):
     def is_multiline_json(self) -> bool:
         return self.multiline_json
 
+    def is_passthrough(self) -> bool:
+        """Check if lines that are whole records are output exactly as they are."""
+        return False
+
     def colour(self, value: Value) -> Colour:
         if value in self.colours:
             return self.colours[value]
@@ -89,27 +131,51 @@ class Pattern(pydantic.BaseModel):
 
 
 class RawPattern(Pattern):
+    # Single-line records are output as they are, unless they need re-encoding.
+    compact: bool = False
+    sort_keys: bool = False
+
     def format_record(self, record: Record) -> str:
         return self.format_message(record)
 
     def format_message(self, record: Record) -> str:
-        return json.dumps(record.data, indent=None)
+        if self.is_passthrough() and "\n" not in record.line:
+            return record.line
+        separators = (",", ":") if self.compact else None
+        return json.dumps(record.data, separators=separators, sort_keys=self.sort_keys)
+
+    def format_repeated(
+        self, record: Record, count: int, first: Value, last: Value
+    ) -> str:
+        """Add the number of repeats as a key, so that the output is still JSON."""
+        repeated = {"count": count, "first": first, "last": last}
+        data: RecordDict = {**record.data, "repeated": repeated}
+        separators = (",", ":") if self.compact else None
+        return json.dumps(data, separators=separators, sort_keys=self.sort_keys)
+
+    def is_passthrough(self) -> bool:
+        return not (self.compact or self.sort_keys)
 
 
 class TemplatePattern(Pattern):
-    format: str = "{{__message__}}"
+    format: Format = Template("{{__message__}}")
+
+    @pydantic.validator("format", pre=True)
+    def compile_format(cls, value: typing.Any) -> Template:
+        return Template.validate(value)
 
     def format_message(self, record: Record) -> str:
-        return self.highlight_color(record).style(self.format.format_map(record))
+        template = typing.cast(Template, self.format)
+        return template.render(record, self.highlight_color(record))
 
 
 class KeyValuePattern(Pattern):
     # Priority keys are rendered first, and always rendered.
-    priority_keys: typing.Sequence[str] = ()
+    priority_keys: typing.Sequence[Key] = ()
 
     # Removed keys have been removed from 'priority_keys' and 'multiline_keys',
     # but also need to be removed from the unknown keys in each line.
-    removed_keys: typing.Sequence[str] = ()
+    removed_keys: typing.Sequence[Key] = ()
 
     def format_message(self, record: Record) -> str:
         colour = self.highlight_color(record)
@@ -121,11 +187,12 @@ class KeyValuePattern(Pattern):
             self.level_key,
         }
 
-        unknown_keys: typing.Sequence[str]  # Retain the record's existing order.
-        unknown_keys = [k for k in record.ordered_keys() if k not in known_keys]
-        format_keys = itertools.chain(self.priority_keys, unknown_keys)
-
-        pairs = self._record_pairs(record, format_keys)
+        # Unknown keys are taken directly from the record, retaining its order.
+        unknown_pairs = ((k, v) for k, v in record.data.items() if k not in known_keys)
+        pairs = itertools.chain(
+            self._record_pairs(record, self.priority_keys),
+            self._value_pairs(unknown_pairs),
+        )
         formatted_pairs = (self._format_pair(k, v, colour) for k, v in pairs)
         return " ".join(formatted_pairs)
 
@@ -148,8 +215,13 @@ class KeyValuePattern(Pattern):
 
         A single key might return multiple pairs if it's value is a mapping.
         """
-        for key in keys:
-            value = record.extract(key)
+        return self._value_pairs((key, record.extract(key)) for key in keys)
+
+    def _value_pairs(
+        self, items: typing.Iterable[typing.Tuple[str, Value]]
+    ) -> typing.Iterable[typing.Tuple[str, Value]]:
+        """Iterate over key=value pairs, flattening values that are mappings."""
+        for key, value in items:
             if isinstance(value, dict):
                 yield from self._nested_pairs(parent=key, data=value)
             elif value is not None:
@@ -0,0 +1,188 @@
+"""
+Time each stage of reading and formatting records, for `jsonlog --profile`.
+
+Stages are timed by wrapping the functions that implement them, and the wrappers are
+only installed when profiling is enabled, so nothing is slowed down otherwise. Times
+are inclusive: buffering multiline JSON includes decoding it.
+
+`--profile-output` also records the whole run with `cProfile`, writing data that can
+be read with `pstats` or tools like snakeviz.
+"""
+
+import functools
+import logging
+import time
+import typing
+
+import click
+
+import jsonlog_cli.filter
+import jsonlog_cli.inputs
+import jsonlog_cli.pattern
+import jsonlog_cli.stream
+
+log = logging.getLogger(__name__)
+
+T = typing.TypeVar("T")
+
+
+class Stage:
+    __slots__ = ("name", "calls", "seconds")
+
+    name: str
+    calls: int
+    seconds: float
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.calls = 0
+        self.seconds = 0.0
+
+
+class TimedStream:
+    """Times each line read from a stream."""
+
+    def __init__(self, stream: typing.Iterable[str], stage: Stage) -> None:
+        self.stream = iter(stream)
+        self.stage = stage
+
+    def __iter__(self) -> "TimedStream":
+        return self
+
+    def __next__(self) -> str:
+        start = time.perf_counter()
+        try:
+            return next(self.stream)
+        finally:
+            self.stage.calls += 1
+            self.stage.seconds += time.perf_counter() - start
+
+
+class Profiler:
+    stages: typing.Dict[str, Stage]
+    originals: typing.List[typing.Tuple[typing.Any, str, typing.Any]]
+    started: float
+    output: typing.Optional[str]
+    cprofile: typing.Any
+
+    def __init__(self, output: typing.Optional[str] = None) -> None:
+        self.stages = {}
+        self.originals = []
+        self.started = time.perf_counter()
+        self.output = output
+        self.cprofile = None
+
+    def start(self) -> None:
+        """Install the wrappers that time each stage."""
+        inputs = jsonlog_cli.inputs
+        stream = jsonlog_cli.stream
+        self.wrap_stream(inputs, "open_binary", "read")
+        self.wrap_stream(inputs, "open_stdin", "read")
+        self.wrap(stream.BufferedJSONStream, "is_valid_json", "buffer")
+        self.wrap(stream.JSONStream, "loads", "decode")
+        self.wrap(jsonlog_cli.filter.Filter, "match", "filter")
+        for cls in (
+            jsonlog_cli.pattern.Pattern,
+            *subclasses(jsonlog_cli.pattern.Pattern),
+        ):
+            if "format_record" in cls.__dict__:
+                self.wrap(cls, "format_record", "format")
+        self.wrap(stream.StreamHandler, "write", "write")
+        self.wrap(stream.StreamHandler, "copy_stream", "copy")
+
+        if self.output is not None:
+            import cProfile
+
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+
+    def stop(self) -> None:
+        """Remove the wrappers, and report how long each stage took."""
+        if self.cprofile is not None:
+            self.cprofile.disable()
+            self.cprofile.dump_stats(self.output)
+
+        for owner, name, original in reversed(self.originals):
+            setattr(owner, name, original)
+        self.originals = []
+
+        elapsed = time.perf_counter() - self.started
+        log.info(
+            "Profiled stages",
+            extra={
+                "elapsed": elapsed,
+                "stages": {s.name: [s.calls, s.seconds] for s in self.stages.values()},
+            },
+        )
+        click.echo(self.summary(elapsed), err=True)
+
+    def stage(self, name: str) -> Stage:
+        if name not in self.stages:
+            self.stages[name] = Stage(name)
+        return self.stages[name]
+
+    def wrap(self, owner: typing.Any, name: str, stage_name: str) -> None:
+        """Replace a function (or method) with one that times each call."""
+        original = owner.__dict__[name]
+        static = isinstance(original, staticmethod)
+        function = original.__func__ if static else original
+        stage = self.stage(stage_name)
+
+        @functools.wraps(function)
+        def timed(*args: typing.Any, **kwargs: typing.Any) -> typing.Any:
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                stage.calls += 1
+                stage.seconds += time.perf_counter() - start
+
+        self.originals.append((owner, name, original))
+        setattr(owner, name, staticmethod(timed) if static else timed)
+
+    def wrap_stream(self, owner: typing.Any, name: str, stage_name: str) -> None:
+        """Replace a function that opens a stream with one that times reading it."""
+        function = owner.__dict__[name]
+        stage = self.stage(stage_name)
+
+        @functools.wraps(function)
+        def timed(*args: typing.Any, **kwargs: typing.Any) -> typing.Any:
+            stream = function(*args, **kwargs)
+            # STDIN is opened with open_binary when it's compressed.
+            if isinstance(stream, TimedStream):
+                return stream
+            return TimedStream(stream, stage)
+
+        self.originals.append((owner, name, function))
+        setattr(owner, name, timed)
+
+    def summary(self, elapsed: float) -> str:
+        rows = [("stage", "calls", "seconds", "µs/call")]
+        for stage in self.stages.values():
+            if stage.calls:
+                per_call = stage.seconds / stage.calls * 1e6
+                rows.append(
+                    (
+                        stage.name,
+                        str(stage.calls),
+                        f"{stage.seconds:.3f}",
+                        f"{per_call:.1f}",
+                    )
+                )
+        rows.append(("total", "", f"{elapsed:.3f}", ""))
+
+        widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+        lines = []
+        for name, *values in rows:
+            cells = [name.ljust(widths[0])]
+            cells.extend(value.rjust(width) for value, width in zip(values, widths[1:]))
+            lines.append("  ".join(cells))
+        return "\n".join(lines)
+
+
+def subclasses(cls: typing.Type[T]) -> typing.List[typing.Type[T]]:
+    found = []
+    for subclass in cls.__subclasses__():
+        found.append(subclass)
+        found.extend(subclasses(subclass))
+    return found
@@ -1,19 +1,26 @@
+import collections.abc
+import json
 import typing
 
 import jsonlog
+import jsonlog_cli.keypath
 import jsonlog_cli.types
 
 log = jsonlog.getLogger(__name__)
 
 
-class RecordDict(dict, typing.Mapping[str, jsonlog_cli.types.Value]):
-    """A mapping that allows access to values as if they were attributes."""
+RecordDict = typing.Dict[str, jsonlog_cli.types.Value]
 
-    def __getattr__(self, item) -> typing.Any:
-        return self[item]
 
+def loads(string: str) -> RecordDict:
+    return json.loads(string)
+
+
+# Subclassing `typing.Mapping[str, Any]` adds the cost of `typing.Generic.__new__` to
+# creating every record, which is a noticeable part of reading a line.
+class Record(collections.abc.Mapping):
+    __slots__ = ("line", "data")
 
-class Record(typing.Mapping[str, typing.Any]):
     line: str
     data: RecordDict
 
@@ -28,19 +35,13 @@ class Record(typing.Mapping[str, typing.Any]):
         if key is None:
             return None
 
-        if key in self.data:
-            return self.data[key]
-        return self._extract(key)
-
-    def _extract(self, key: str) -> jsonlog_cli.types.Value:
-        result = self.data
-
-        for k in key.split("."):
-            try:
-                result = result[k]
-            except KeyError:
-                return None
-        return result
+        path = jsonlog_cli.keypath.KeyPath.of(key)
+        if path.simple:
+            data = self.data
+            return data.get(path) if isinstance(data, dict) else None
+        if path.special:
+            return self[path]
+        return path.extract(self.data)
 
     def __len__(self) -> int:
         return len(self.data)
@@ -0,0 +1,181 @@
+"""
+Sample records, for a quick look at logs too large to read in full.
+
+`Bernoulli` keeps each line with a fixed probability. It's used as a prefilter, so
+lines that aren't sampled are never decoded, and it draws how many lines to skip
+before the next sample instead of a random number for every line.
+
+`Reservoir` keeps a uniform sample of a fixed number of records from the whole input
+(using Algorithm L, which also draws how many records to skip), optionally keeping
+that many records for each value of a key. Records are only output once the input
+ends, in the order they were read.
+"""
+
+import json
+import math
+import random
+import typing
+
+import jsonlog_cli.keypath
+import jsonlog_cli.record
+import jsonlog_cli.types
+
+if typing.TYPE_CHECKING:
+    import jsonlog_cli.filter
+
+T = typing.TypeVar("T")
+
+Stratum = typing.Union[None, str, int, float, bool]
+
+
+def uniform(rng: random.Random) -> float:
+    """Return a random number in the open interval (0, 1), so it can be logged."""
+    while True:
+        value = rng.random()
+        if value > 0.0:
+            return value
+
+
+class Bernoulli:
+    rate: float
+    rng: random.Random
+    skip: int
+
+    def __init__(self, rate: float, rng: typing.Optional[random.Random] = None) -> None:
+        self.rate = rate
+        self.rng = rng or random.Random()
+        self.skip = self.next_skip()
+
+    def next_skip(self) -> int:
+        """Draw how many lines to skip before the next line that's kept."""
+        if self.rate >= 1.0:
+            return 0
+        if self.rate <= 0.0:
+            return -1
+        return math.floor(math.log(uniform(self.rng)) / math.log(1.0 - self.rate))
+
+    def keep(self, line: str) -> bool:
+        if self.skip > 0:
+            self.skip -= 1
+            return False
+        if self.skip < 0:
+            return False
+        self.skip = self.next_skip()
+        return True
+
+    def prefilter(
+        self, prefilter: "typing.Optional[jsonlog_cli.filter.Prefilter]" = None
+    ) -> "jsonlog_cli.filter.Prefilter":
+        """Sample lines before another prefilter, as sampling doesn't read them."""
+        if prefilter is None:
+            return self.keep
+        keep = self.keep
+        return lambda line: keep(line) and prefilter(line)  # type: ignore
+
+
+class Sample(typing.Generic[T]):
+    """A reservoir sample of items from a single stratum."""
+
+    __slots__ = ("size", "items", "count", "weight", "next")
+
+    size: int
+    items: typing.List[typing.Tuple[int, T]]
+    count: int
+    weight: float
+    next: int
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self.items = []
+        self.count = 0
+        self.weight = 1.0
+        self.next = 0
+
+    def wants(self) -> bool:
+        """Count the next item, returning whether it would be kept."""
+        self.count += 1
+        return len(self.items) < self.size or self.count == self.next
+
+    def keep(self, index: int, item: T, rng: random.Random) -> None:
+        """Keep the item that `wants` was last called for."""
+        if len(self.items) < self.size:
+            self.items.append((index, item))
+            if len(self.items) == self.size:
+                self.weight = math.exp(math.log(uniform(rng)) / self.size)
+                self.next = self.count + self.skip(rng)
+        else:
+            self.items[rng.randrange(self.size)] = (index, item)
+            self.weight *= math.exp(math.log(uniform(rng)) / self.size)
+            self.next += self.skip(rng)
+
+    def skip(self, rng: random.Random) -> int:
+        return math.floor(math.log(uniform(rng)) / math.log(1.0 - self.weight)) + 1
+
+
+class Reservoir(typing.Generic[T]):
+    size: int
+    key: typing.Optional[jsonlog_cli.keypath.KeyPath]
+    rng: random.Random
+    samples: typing.Dict[Stratum, Sample[T]]
+    index: int
+    prefiltered: bool
+
+    def __init__(
+        self,
+        size: int,
+        key: typing.Optional[str] = None,
+        rng: typing.Optional[random.Random] = None,
+    ) -> None:
+        self.size = size
+        self.key = None if key is None else jsonlog_cli.keypath.KeyPath(key)
+        self.rng = rng or random.Random()
+        self.samples = {}
+        self.index = 0
+        self.prefiltered = False
+
+    def stratum(self, record: typing.Optional[jsonlog_cli.record.Record]) -> Stratum:
+        """Return the value of the key records are stratified by."""
+        if self.key is None or record is None:
+            return None
+        return hashable(record.extract(self.key))
+
+    def sample(self, stratum: Stratum) -> Sample[T]:
+        sample = self.samples.get(stratum)
+        if sample is None:
+            sample = self.samples[stratum] = Sample(self.size)
+        return sample
+
+    def add(self, item: T, stratum: Stratum = None) -> None:
+        sample = self.sample(stratum)
+        if self.prefiltered or sample.wants():
+            sample.keep(self.index, item, self.rng)
+        self.index += 1
+
+    def prefilter(
+        self, prefilter: "typing.Optional[jsonlog_cli.filter.Prefilter]" = None
+    ) -> "jsonlog_cli.filter.Prefilter":
+        """
+        Choose lines before they're decoded, as Algorithm L knows which it will keep.
+
+        Only possible when every line that passes the prefilter is added to the
+        reservoir (there's no key, and no filter after decoding). Lines that pass
+        the returned prefilter must then be added.
+        """
+        self.prefiltered = True
+        wants = self.sample(None).wants
+        if prefilter is None:
+            return lambda line: wants()
+        return lambda line: prefilter(line) and wants()  # type: ignore
+
+    def items(self) -> typing.List[T]:
+        """Return every sampled item, in the order they were added."""
+        indexed = [pair for sample in self.samples.values() for pair in sample.items]
+        indexed.sort(key=lambda pair: pair[0])
+        return [item for _, item in indexed]
+
+
+def hashable(value: jsonlog_cli.types.Value) -> Stratum:
+    """Encode objects and arrays as JSON, so that any value can be a stratum."""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, sort_keys=True)
+    return value
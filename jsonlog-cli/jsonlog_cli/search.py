@@ -0,0 +1,162 @@
+"""
+Find the part of a file in a time range without reading the whole file.
+
+Most log files are written in time order, so the first record at or after a time can
+be found with a binary search over the file's byte offsets. Each probe moves forward
+to the start of the next line and only decodes that line's timestamp, so finding a
+range costs a few dozen probes however large the file is. Once the search has
+narrowed to a small region the rest is scanned line by line.
+
+Files are assumed to be sorted if their first timestamp isn't after their last one.
+Records are still filtered by time as they're read, but records that are out of
+order near the start or end of the range may be missed.
+"""
+
+import json
+import logging
+import mmap
+import os
+import stat
+import typing
+
+import jsonlog_cli.filter
+import jsonlog_cli.index
+import jsonlog_cli.inputs
+import jsonlog_cli.keypath
+import jsonlog_cli.record
+import jsonlog_cli.timestamp
+
+log = logging.getLogger(__name__)
+
+# Stop searching and scan line by line once the range is smaller than this.
+SCAN_SIZE = 64 * 1024
+
+# How many lines a probe reads looking for one with a timestamp.
+PROBE_LINES = 16
+
+Probe = typing.Tuple[jsonlog_cli.timestamp.Timestamp, int]
+
+
+class TimeSearch:
+    """Binary searches a memory-mapped file for timestamps."""
+
+    data: mmap.mmap
+    timestamps: jsonlog_cli.timestamp.TimestampParser
+
+    def __init__(
+        self, data: mmap.mmap, timestamps: jsonlog_cli.timestamp.TimestampParser
+    ) -> None:
+        self.data = data
+        self.timestamps = timestamps
+
+    def sorted(self) -> bool:
+        """Check the first timestamp in the file isn't after the last one."""
+        first = self.probe(0, len(self.data))
+        last = self.last()
+        return first is None or last is None or first[0] <= last
+
+    def last(self) -> typing.Optional[jsonlog_cli.timestamp.Timestamp]:
+        """Find the timestamp of the last line that has one."""
+        end = len(self.data)
+        for _ in range(PROBE_LINES):
+            start = self.data.rfind(b"\n", 0, max(end - 1, 0)) + 1
+            timestamp = self.timestamp(start, end)
+            if timestamp is not None:
+                return timestamp
+            if start == 0:
+                return None
+            end = start
+        return None
+
+    def find(self, target: jsonlog_cli.timestamp.Timestamp) -> int:
+        """Return the offset of the first line with a timestamp at or after a time."""
+        lo, hi = 0, len(self.data)
+        while hi - lo > SCAN_SIZE:
+            mid = (lo + hi) // 2
+            probe = self.probe(mid, hi)
+            if probe is None or probe[0] >= target:
+                hi = mid
+            else:
+                # Every line up to the end of the probed line is before the target.
+                lo = probe[1]
+        return self.scan(lo, target)
+
+    def scan(self, start: int, target: jsonlog_cli.timestamp.Timestamp) -> int:
+        size = len(self.data)
+        while start < size:
+            end = self.line_end(start)
+            timestamp = self.timestamp(start, end)
+            if timestamp is not None and timestamp >= target:
+                return start
+            start = end
+        return size
+
+    def probe(self, position: int, limit: int) -> typing.Optional[Probe]:
+        """Find the first timestamp on a line starting after a position."""
+        start = 0 if position == 0 else self.data.find(b"\n", position - 1) + 1
+        for _ in range(PROBE_LINES):
+            if (start == 0 and position != 0) or start >= limit:
+                return None
+            end = self.line_end(start)
+            timestamp = self.timestamp(start, end)
+            if timestamp is not None:
+                return timestamp, end
+            start = end
+        return None
+
+    def line_end(self, start: int) -> int:
+        """Return the offset after the end of a line (or the end of the file)."""
+        end = self.data.find(b"\n", start)
+        return len(self.data) if end < 0 else end + 1
+
+    def timestamp(self, start: int, end: int) -> typing.Optional[float]:
+        line = self.data[start:end].decode("utf-8", errors="replace")
+        record = self.decode(line)
+        return None if record is None else self.timestamps(record)
+
+    def decode(self, line: str) -> typing.Optional[jsonlog_cli.record.Record]:
+        try:
+            data = jsonlog_cli.record.loads(line)
+        except json.JSONDecodeError:
+            return None
+        if not isinstance(data, dict):
+            return None
+        return jsonlog_cli.record.Record(line=line, data=data)
+
+
+def search(
+    where: jsonlog_cli.filter.Filter, path: str, file: typing.BinaryIO
+) -> typing.Optional[typing.List[jsonlog_cli.inputs.Range]]:
+    """Binary search a sorted regular file for the range of a time filter."""
+    if where.timestamps is None or (where.since is None and where.until is None):
+        return None
+
+    status = os.fstat(file.fileno())
+    if not stat.S_ISREG(status.st_mode) or status.st_size == 0:
+        return None
+
+    with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        finder = TimeSearch(data, where.timestamps)
+        if not finder.sorted():
+            log.info("File isn't sorted by time", extra={"path": path})
+            return None
+        start = 0 if where.since is None else finder.find(where.since)
+        end = len(data) if where.until is None else finder.find(where.until)
+
+    log.info("Searched file", extra={"path": path, "start": start, "end": end})
+    return [(start, end)] if start < end else []
+
+
+def seek(
+    where: jsonlog_cli.filter.Filter, path: str, file: typing.BinaryIO
+) -> typing.Optional[typing.List[jsonlog_cli.inputs.Range]]:
+    """
+    Choose the parts of a file that could match a filter.
+
+    Uses the file's index if it has one, or a binary search if the filter has a time
+    range. Returns None if the whole file needs to be read.
+    """
+    ranges = jsonlog_cli.index.seek(where, path, file)
+    if ranges is None:
+        ranges = search(where, path, file)
+    return ranges
@@ -0,0 +1,165 @@
+"""
+Count values in bounded memory.
+
+`SpaceSaving` finds the most frequent values in a stream while tracking a fixed
+number of them, and `HyperLogLog` estimates the number of distinct values using a
+few kilobytes. Both have exact counterparts with the same interface, for when memory
+isn't a concern.
+
+`SpaceSaving` prunes in batches rather than evicting the smallest count each time a
+new value arrives: once it's tracking twice its capacity it keeps the largest half.
+Untracked values are assumed to have occurred as often as the largest count pruned
+so far, so a count is never underestimated and is overestimated by at most its
+`error`. Any value that occurs more than `total / capacity` times is always found.
+"""
+
+import collections
+import heapq
+import math
+import operator
+import typing
+
+# The number of values a frequency sketch tracks.
+CAPACITY = 1024
+
+# HyperLogLog uses 2 ** PRECISION registers, for a standard error of about 0.8%.
+PRECISION = 14
+
+MASK = (1 << 64) - 1
+
+# Values are counted even when they're missing (None).
+Hashable = typing.Optional[typing.Hashable]
+
+# A value, how many times it was seen, and how much that might be overestimated by.
+Frequency = typing.Tuple[Hashable, int, int]
+
+
+class Frequencies:
+    def add(self, value: Hashable) -> None:
+        raise NotImplementedError
+
+    def top(self, n: typing.Optional[int] = None) -> typing.List[Frequency]:
+        """Return the `n` most frequent values, most frequent first."""
+        raise NotImplementedError
+
+
+class ExactFrequencies(Frequencies):
+    counts: typing.Counter[Hashable]
+
+    def __init__(self) -> None:
+        self.counts = collections.Counter()
+
+    def add(self, value: Hashable) -> None:
+        self.counts[value] += 1
+
+    def top(self, n: typing.Optional[int] = None) -> typing.List[Frequency]:
+        return [(value, count, 0) for value, count in self.counts.most_common(n)]
+
+
+class SpaceSaving(Frequencies):
+    capacity: int
+    counts: typing.Dict[Hashable, int]
+    errors: typing.Dict[Hashable, int]
+    floor: int
+
+    def __init__(self, capacity: int = CAPACITY) -> None:
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        self.floor = 0
+
+    def add(self, value: Hashable) -> None:
+        count = self.counts.get(value)
+        if count is not None:
+            self.counts[value] = count + 1
+            return
+
+        if len(self.counts) >= 2 * self.capacity:
+            self.prune()
+        self.counts[value] = self.floor + 1
+        if self.floor:
+            self.errors[value] = self.floor
+
+    def prune(self) -> None:
+        """Keep the values with the largest counts, raising the floor to match."""
+        capacity = self.capacity
+        ranked = sorted(self.counts.items(), key=operator.itemgetter(1), reverse=True)
+        kept, pruned = ranked[:capacity], ranked[capacity:]
+        for value, count in pruned:
+            self.floor = max(self.floor, count)
+            self.errors.pop(value, None)
+        self.counts = dict(kept)
+
+    def top(self, n: typing.Optional[int] = None) -> typing.List[Frequency]:
+        items = self.counts.items()
+        if n is None:
+            ranked = sorted(items, key=operator.itemgetter(1), reverse=True)
+        else:
+            ranked = heapq.nlargest(n, items, key=operator.itemgetter(1))
+        return [(value, count, self.errors.get(value, 0)) for value, count in ranked]
+
+
+class Cardinality:
+    exact: bool = True
+
+    def add(self, value: Hashable) -> None:
+        raise NotImplementedError
+
+    def count(self) -> int:
+        """Return the number of distinct values seen."""
+        raise NotImplementedError
+
+
+class ExactCardinality(Cardinality):
+    values: typing.Set[Hashable]
+
+    def __init__(self) -> None:
+        self.values = set()
+
+    def add(self, value: Hashable) -> None:
+        self.values.add(value)
+
+    def count(self) -> int:
+        return len(self.values)
+
+
+class HyperLogLog(Cardinality):
+    exact = False
+
+    precision: int
+    registers: bytearray
+
+    def __init__(self, precision: int = PRECISION) -> None:
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, value: Hashable) -> None:
+        h = mix(hash(value))
+        index = h & (len(self.registers) - 1)
+        # The position of the first set bit in the rest of the hash.
+        rank = 64 - self.precision - (h >> self.precision).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+
+        # Small cardinalities are estimated more accurately from the empty registers.
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return round(estimate)
+
+
+def mix(h: int) -> int:
+    """
+    Spread the bits of a hash over 64 bits (the splitmix64 finalizer).
+
+    Python hashes small integers to themselves, which HyperLogLog can't use directly.
+    """
+    h &= MASK
+    h = ((h ^ (h >> 30)) * 0xBF58476D1CE4E5B9) & MASK
+    h = ((h ^ (h >> 27)) * 0x94D049BB133111EB) & MASK
+    return h ^ (h >> 31)
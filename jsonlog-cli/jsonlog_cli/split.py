@@ -0,0 +1,196 @@
+"""
+Split records into a file for each value of a key, in a single pass.
+
+Output for each file is buffered, and buffers are written together once they grow
+large, through a small pool of open files. The least recently used file is closed
+when the pool is full, so there can be far more files than the process can have
+open at once. Each file is truncated the first time it's written to, and appended
+to after that.
+
+Compressed files are written by appending a new stream to the file for each batch of
+writes, which gzip, bzip2 and xz readers all handle as a single file.
+"""
+
+import collections
+import importlib
+import os
+import re
+import typing
+
+import jsonlog_cli.export
+import jsonlog_cli.inputs
+import jsonlog_cli.keypath
+import jsonlog_cli.record
+import jsonlog_cli.stream
+import jsonlog_cli.types
+
+if typing.TYPE_CHECKING:
+    import jsonlog_cli.filter
+
+PLACEHOLDER = "{value}"
+
+# The name used for records where the key is missing or null.
+MISSING = "none"
+
+# How many files are kept open at once.
+MAX_OPEN = 64
+
+# How many characters are buffered before they're written.
+BUFFER_SIZE = 1024 * 1024
+
+UNSAFE = re.compile(r"[^\w.@+=-]")
+
+COMPRESSION = {name: module for _, name, module in jsonlog_cli.inputs.COMPRESSION}
+
+Render = typing.Callable[[jsonlog_cli.record.Record], str]
+
+
+def filename(value: jsonlog_cli.types.Value) -> str:
+    """Turn a value into something that can safely be used in a file name."""
+    name = UNSAFE.sub("_", jsonlog_cli.export.text(value)) or MISSING
+    return "_" if name in (".", "..") else name
+
+
+class FilePool:
+    """Keeps the most recently used files open, closing the rest."""
+
+    compression: typing.Optional[str]
+    max_open: int
+    files: "collections.OrderedDict[str, typing.IO[str]]"
+    opened: typing.Set[str]
+
+    def __init__(
+        self, compression: typing.Optional[str] = None, max_open: int = MAX_OPEN
+    ) -> None:
+        if compression is not None and compression not in COMPRESSION:
+            raise ValueError(f"Unknown compression {compression!r}")
+        self.compression = compression
+        self.max_open = max_open
+        self.files = collections.OrderedDict()
+        self.opened = set()
+
+    def get(self, path: str) -> typing.IO[str]:
+        file = self.files.get(path)
+        if file is not None:
+            self.files.move_to_end(path)
+            return file
+
+        if len(self.files) >= self.max_open:
+            _, oldest = self.files.popitem(last=False)
+            oldest.close()
+
+        file = self.files[path] = self.open(path)
+        return file
+
+    def open(self, path: str) -> typing.IO[str]:
+        mode = "at" if path in self.opened else "wt"
+        if path not in self.opened:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.opened.add(path)
+
+        if self.compression is None:
+            return open(path, mode, encoding="utf-8")
+        module = importlib.import_module(COMPRESSION[self.compression])
+        return module.open(path, mode, encoding="utf-8")  # type: ignore
+
+    def close(self) -> None:
+        while self.files:
+            _, file = self.files.popitem(last=False)
+            file.close()
+
+
+class Splitter:
+    key: jsonlog_cli.keypath.KeyPath
+    output: str
+    pool: FilePool
+    buffer_size: int
+    paths: typing.Dict[str, str]
+    pending: typing.Dict[str, typing.List[str]]
+    pending_size: int
+
+    def __init__(
+        self,
+        key: str,
+        output: str,
+        compression: typing.Optional[str] = None,
+        max_open: int = MAX_OPEN,
+        buffer_size: int = BUFFER_SIZE,
+    ) -> None:
+        if PLACEHOLDER not in output:
+            raise ValueError(f"The output path must contain {PLACEHOLDER}")
+        self.key = jsonlog_cli.keypath.KeyPath.of(key)
+        self.output = output
+        self.pool = FilePool(compression, max_open=max_open)
+        self.buffer_size = buffer_size
+        self.paths = {}
+        self.pending = {}
+        self.pending_size = 0
+
+    def __enter__(self) -> "Splitter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def path(self, value: jsonlog_cli.types.Value) -> str:
+        # Only strings are cached, as `True` and `1` would share a dictionary key.
+        if not isinstance(value, str):
+            return self.output.replace(PLACEHOLDER, filename(value))
+        path = self.paths.get(value)
+        if path is None:
+            path = self.paths[value] = self.output.replace(PLACEHOLDER, filename(value))
+        return path
+
+    def write(self, value: jsonlog_cli.types.Value, output: str) -> None:
+        """Buffer output for the file a value belongs in."""
+        path = self.path(value)
+        pending = self.pending.get(path)
+        if pending is None:
+            pending = self.pending[path] = []
+        pending.append(output)
+        self.pending_size += len(output)
+        if self.pending_size >= self.buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write every buffer to its file."""
+        for path, pending in self.pending.items():
+            self.pool.get(path).write("".join(pending))
+        self.pending = {}
+        self.pending_size = 0
+
+    def close(self) -> None:
+        try:
+            self.flush()
+        finally:
+            self.pool.close()
+
+    def split(
+        self,
+        stream: jsonlog_cli.stream.JSONStream,
+        render: typing.Optional[Render] = None,
+        where: "typing.Optional[jsonlog_cli.filter.Filter]" = None,
+    ) -> int:
+        """
+        Write each record in a stream to its file, returning how many were written.
+
+        Records are written unchanged unless `render` is given. Lines that aren't
+        JSON are skipped.
+        """
+        get = jsonlog_cli.export.accessor(self.key)
+        write = self.write
+        count = 0
+        for _, record in stream.consume():
+            if record is None or (where is not None and not where.match(record)):
+                continue
+            if render is None:
+                output = record.line
+                if not output.endswith("\n"):
+                    output += "\n"
+            else:
+                output = render(record) + "\n"
+            write(get(record), output)
+            count += 1
+        return count
@@ -0,0 +1,218 @@
+"""
+Aggregate records instead of formatting them.
+
+`jsonlog stats` counts records grouped by the values of some keys, finds the most
+frequent values of keys, estimates how many distinct values keys have, and counts
+records in time buckets.
+
+Memory use is bounded however many distinct values there are: groups and top
+values are counted with `SpaceSaving` sketches and distinct values with
+`HyperLogLog`, unless exact counts are asked for.
+"""
+
+import collections
+import datetime
+import json
+import typing
+
+import jsonlog_cli.filter
+import jsonlog_cli.keypath
+import jsonlog_cli.record
+import jsonlog_cli.sketch
+import jsonlog_cli.stream
+import jsonlog_cli.timestamp
+import jsonlog_cli.types
+
+Summary = typing.Dict[str, typing.Any]
+
+
+class Stats:
+    group_by: typing.Sequence[jsonlog_cli.keypath.KeyPath]
+    groups: typing.Optional[jsonlog_cli.sketch.Frequencies]
+    top: typing.Dict[jsonlog_cli.keypath.KeyPath, jsonlog_cli.sketch.Frequencies]
+    unique: typing.Dict[jsonlog_cli.keypath.KeyPath, jsonlog_cli.sketch.Cardinality]
+    timestamps: typing.Optional[jsonlog_cli.timestamp.TimestampParser]
+    interval: typing.Optional[float]
+    histogram: typing.Counter[float]
+    records: int
+    invalid: int
+
+    def __init__(
+        self,
+        group_by: typing.Sequence[str] = (),
+        top: typing.Sequence[str] = (),
+        unique: typing.Sequence[str] = (),
+        timestamps: typing.Optional[jsonlog_cli.timestamp.TimestampParser] = None,
+        interval: typing.Optional[float] = None,
+        exact: bool = False,
+        capacity: int = jsonlog_cli.sketch.CAPACITY,
+    ) -> None:
+        def frequencies() -> jsonlog_cli.sketch.Frequencies:
+            if exact:
+                return jsonlog_cli.sketch.ExactFrequencies()
+            return jsonlog_cli.sketch.SpaceSaving(capacity)
+
+        def cardinality() -> jsonlog_cli.sketch.Cardinality:
+            if exact:
+                return jsonlog_cli.sketch.ExactCardinality()
+            return jsonlog_cli.sketch.HyperLogLog()
+
+        self.group_by = [jsonlog_cli.keypath.KeyPath.of(key) for key in group_by]
+        self.groups = frequencies() if group_by else None
+        self.top = {jsonlog_cli.keypath.KeyPath.of(key): frequencies() for key in top}
+        self.unique = {
+            jsonlog_cli.keypath.KeyPath.of(key): cardinality() for key in unique
+        }
+        self.timestamps = timestamps if interval is not None else None
+        self.interval = interval
+        self.histogram = collections.Counter()
+        self.records = 0
+        self.invalid = 0
+
+    def consume(
+        self,
+        stream: jsonlog_cli.stream.JSONStream,
+        where: typing.Optional[jsonlog_cli.filter.Filter] = None,
+    ) -> None:
+        for _, record in stream.consume():
+            if record is None:
+                # Lines that aren't JSON can never match a filter.
+                if where is None:
+                    self.invalid += 1
+            elif where is None or where.match(record):
+                self.add(record)
+
+    def add(self, record: jsonlog_cli.record.Record) -> None:
+        self.records += 1
+
+        if self.groups is not None:
+            self.groups.add(tuple(hashable(record.extract(k)) for k in self.group_by))
+
+        for key, frequencies in self.top.items():
+            value = record.extract(key)
+            if value is not None:
+                frequencies.add(hashable(value))
+
+        for key, cardinality in self.unique.items():
+            value = record.extract(key)
+            if value is not None:
+                cardinality.add(hashable(value))
+
+        if self.timestamps is not None and self.interval is not None:
+            timestamp = self.timestamps(record)
+            if timestamp is not None:
+                self.histogram[timestamp - timestamp % self.interval] += 1
+
+    def summary(self, limit: typing.Optional[int] = None) -> Summary:
+        """Return the results as something that can be serialised as JSON."""
+        summary: Summary = {"records": self.records, "invalid": self.invalid}
+
+        if self.groups is not None:
+            summary["groups"] = {
+                "keys": list(self.group_by),
+                "counts": [
+                    # Groups are counted as tuples of the values of each key.
+                    {
+                        "values": list(typing.cast(tuple, values)),
+                        "count": count,
+                        "error": error,
+                    }
+                    for values, count, error in self.groups.top(limit)
+                ],
+            }
+
+        if self.top:
+            summary["top"] = {
+                key: [
+                    {"value": value, "count": count, "error": error}
+                    for value, count, error in frequencies.top(limit)
+                ]
+                for key, frequencies in self.top.items()
+            }
+
+        if self.unique:
+            summary["unique"] = {
+                key: {"count": cardinality.count(), "exact": cardinality.exact}
+                for key, cardinality in self.unique.items()
+            }
+
+        if self.timestamps is not None:
+            summary["histogram"] = {
+                "key": self.timestamps.key,
+                "interval": self.interval,
+                "counts": [
+                    {"time": format_time(bucket), "count": count}
+                    for bucket, count in sorted(self.histogram.items())
+                ],
+            }
+
+        return summary
+
+
+def hashable(value: jsonlog_cli.types.Value) -> jsonlog_cli.sketch.Hashable:
+    """Objects and arrays are counted by their JSON representation."""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, sort_keys=True)
+    return value
+
+
+def format_time(timestamp: jsonlog_cli.timestamp.Timestamp) -> str:
+    time = datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc)
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def format_summary(summary: Summary) -> str:
+    """Format a summary as plain text tables."""
+    sections = [f"{summary['records']} records"]
+    if summary["invalid"]:
+        sections[0] += f" ({summary['invalid']} lines weren't JSON)"
+
+    if "groups" in summary:
+        groups = summary["groups"]
+        rows = [
+            [*map(format_value, c["values"]), format_count(c)] for c in groups["counts"]
+        ]
+        sections.append(format_table([*groups["keys"], "count"], rows))
+
+    for key, frequencies in summary.get("top", {}).items():
+        rows = [[format_value(f["value"]), format_count(f)] for f in frequencies]
+        sections.append(format_table([key, "count"], rows))
+
+    if "unique" in summary:
+        rows = [
+            [key, str(c["count"]) if c["exact"] else f"~{c['count']}"]
+            for key, c in summary["unique"].items()
+        ]
+        sections.append(format_table(["key", "unique values"], rows))
+
+    if "histogram" in summary:
+        histogram = summary["histogram"]
+        rows = [[c["time"], str(c["count"])] for c in histogram["counts"]]
+        sections.append(format_table([histogram["key"], "count"], rows))
+
+    return "\n\n".join(sections)
+
+
+def format_value(value: jsonlog_cli.types.Value) -> str:
+    return value if isinstance(value, str) else json.dumps(value)
+
+
+def format_count(frequency: typing.Mapping[str, int]) -> str:
+    """Approximate counts are shown with the most they could be overestimated by."""
+    if frequency["error"]:
+        return f"{frequency['count']} ±{frequency['error']}"
+    return str(frequency["count"])
+
+
+def format_table(
+    headers: typing.Sequence[str], rows: typing.Sequence[typing.Sequence[str]]
+) -> str:
+    """Align columns, right-aligning the last column (which is always a count)."""
+    table = [list(headers), *rows]
+    widths = [max(len(row[i]) for row in table) for i in range(len(headers))]
+    lines = []
+    for row in table:
+        cells = [cell.ljust(width) for cell, width in zip(row[:-1], widths)]
+        cells.append(row[-1].rjust(widths[-1]))
+        lines.append("  ".join(cells))
+    return "\n".join(lines)
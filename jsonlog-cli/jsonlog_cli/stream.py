@@ -1,24 +1,41 @@
 import json
 import logging
 import sys
-import textwrap
 import typing
 
 import click
 
+import jsonlog_cli.badlines
+import jsonlog_cli.merge
 import jsonlog_cli.pattern
 import jsonlog_cli.record
 import jsonlog_cli.text
+import jsonlog_cli.timestamp
 
 try:
     from typing import Protocol  # Only available since python 3.8.
 except ImportError:
     from typing_extensions import Protocol  # type: ignore
 
+# Filters are only needed with --where, and following or reading live inputs needs
+# modules that are slow to import (asyncio in particular), so they're imported when
+# they're used rather than every time the CLI starts.
+if typing.TYPE_CHECKING:
+    import jsonlog_cli.collapse
+    import jsonlog_cli.filter
+    import jsonlog_cli.live
+    import jsonlog_cli.sample
+
 log = logging.getLogger(__name__)
 
 RecordData = typing.Optional[jsonlog_cli.record.RecordDict]
-RecordPair = typing.Tuple[str, RecordData]
+RecordPair = typing.Tuple[str, typing.Optional[jsonlog_cli.record.Record]]
+SourcedPair = typing.Tuple[
+    str, typing.Optional[jsonlog_cli.record.Record], typing.Optional[str]
+]
+
+# Colours for source name prefixes, assigned in the order sources first appear.
+SOURCE_COLOURS = ("cyan", "green", "yellow", "blue", "magenta", "bright_cyan")
 
 
 class TextStream(Protocol):
@@ -28,26 +45,62 @@ class TextStream(Protocol):
 
 class JSONStream:
     stream: TextStream
+    prefilter: "typing.Optional[jsonlog_cli.filter.Prefilter]"
+    bad_lines: jsonlog_cli.badlines.BadLines
 
-    def __init__(self, stream: TextStream):
+    def __init__(
+        self,
+        stream: TextStream,
+        prefilter: "typing.Optional[jsonlog_cli.filter.Prefilter]" = None,
+        bad_lines: typing.Optional[jsonlog_cli.badlines.BadLines] = None,
+    ):
         self.stream = stream
+        self.prefilter = prefilter
+        self.bad_lines = bad_lines or jsonlog_cli.badlines.BadLines()
 
     def consume(self) -> typing.Iterator[RecordPair]:
+        # Each line is a record by itself, so this is `parse` inlined for each line.
+        prefilter, decode = self.prefilter, self.decode
         for line in self.stream:
-            yield self.loads(line)
+            if prefilter is None or prefilter(line):
+                yield line, decode(line)
+
+    def feed(self, line: str) -> typing.Iterator[RecordPair]:
+        """Process a single line, yielding any records it completes."""
+        return self.parse(line)
+
+    def flush(self) -> typing.Iterator[RecordPair]:
+        """Yield anything left over once the stream has ended."""
+        return iter(())
+
+    def parse(self, string: str) -> typing.Iterator[RecordPair]:
+        """Parse a string, skipping it if the prefilter shows it can't match."""
+        if self.prefilter is None or self.prefilter(string):
+            yield string, self.decode(string)
+
+    def decode(self, string: str) -> typing.Optional[jsonlog_cli.record.Record]:
+        # Most lines that aren't records can be skipped without trying to decode them.
+        reason = jsonlog_cli.badlines.classify(string)
+        if reason is not None:
+            self.bad_lines.add(reason, string)
+            return None
+
+        line, data = self.loads(string)
+        if data is None:
+            self.bad_lines.add(jsonlog_cli.badlines.INVALID, string)
+            return None
+        return jsonlog_cli.record.Record(line=line.strip(), data=data)
 
     @staticmethod
-    def loads(string: str) -> RecordPair:
+    def loads(string: str) -> typing.Tuple[str, RecordData]:
         try:
-            data = json.loads(string, object_hook=jsonlog_cli.record.RecordDict)
+            data = jsonlog_cli.record.loads(string)
         except json.JSONDecodeError:
-            log.exception(
-                "Could not parse JSON",
-                extra={"excerpt": textwrap.shorten(string, 100)},
-            )
             return string, None
-        else:
-            return string, data
+        if not isinstance(data, dict):
+            # Only objects are records, other values are shown like any other text.
+            return string, None
+        return string, data
 
 
 class BufferedJSONStream(JSONStream):
@@ -55,50 +108,66 @@ class BufferedJSONStream(JSONStream):
 
     buffer: str = ""
 
-    def __init__(self, stream: TextStream) -> None:
-        super().__init__(stream=stream)
+    def __init__(
+        self,
+        stream: TextStream,
+        prefilter: "typing.Optional[jsonlog_cli.filter.Prefilter]" = None,
+        bad_lines: typing.Optional[jsonlog_cli.badlines.BadLines] = None,
+    ) -> None:
+        super().__init__(stream=stream, prefilter=prefilter, bad_lines=bad_lines)
         self.buffer = ""
 
     def consume(self) -> typing.Iterator[RecordPair]:
-        self.reset_buffer()
         for line in self.stream:
-            # Yield any remaining lines in the buffer if the current
-            # line parses as JSON or starts with a '{' character.
-            if self.is_valid_json(line):
-                yield from self.reset_buffer()
-
-                # This is a small optimisation to avoid checking if the line
-                # contains JSON a second time when we add it to the empty buffer.
-                yield self.loads(line)
-                continue
-
-            # This stops us from buffering forever if we start in the middle
-            # of a JSON message, since we'd just keep adding new lines.
-            if line.startswith("{"):
-                yield from self.reset_buffer()
-
-            # Add the line to the buffer, then yield lines if the buffer
-            # now contains JSON. This should yield in most cases.
-            self.buffer += line
-            if self.is_valid_json(self.buffer):
-                yield from self.reset_buffer()
-
+            yield from self.feed(line)
+        yield from self.flush()
+
+    def feed(self, line: str) -> typing.Iterator[RecordPair]:
+        # Yield any remaining lines in the buffer if the current
+        # line parses as JSON or starts with a '{' character.
+        if self.is_valid_json(line):
+            yield from self.reset_buffer()
+
+            # This is a small optimisation to avoid checking if the line
+            # contains JSON a second time when we add it to the empty buffer.
+            yield from self.parse(line)
+            return
+
+        # This stops us from buffering forever if we start in the middle
+        # of a JSON message, since we'd just keep adding new lines.
+        if line.startswith("{"):
+            yield from self.reset_buffer()
+
+        # Add the line to the buffer, then yield lines if the buffer
+        # now contains JSON. This should yield in most cases.
+        self.buffer += line
+        if self.is_valid_json(self.buffer):
+            yield from self.reset_buffer()
+
+    def flush(self) -> typing.Iterator[RecordPair]:
         # Yield any remaining lines in the buffer.
-        yield from self.reset_buffer()
+        return self.reset_buffer()
 
     def reset_buffer(self) -> typing.Iterator[RecordPair]:
         if self.buffer:
-            yield self.loads(self.buffer)
+            yield from self.parse(self.buffer)
         self.buffer = ""
 
     @staticmethod
     def is_valid_json(text: str) -> bool:
+        """
+        Check if text is a JSON object.
+
+        Lines inside a multiline record can be JSON values by themselves (like the
+        last string in an array), but only objects are complete records. Most
+        partial buffers don't end with `}`, so they can be skipped without decoding.
+        """
+        if jsonlog_cli.badlines.classify(text) is not None:
+            return False
         try:
-            json.loads(text)
+            return isinstance(json.loads(text), dict)
         except json.JSONDecodeError:
             return False
-        else:
-            return True
 
 
 class StreamHandler:
@@ -109,36 +178,174 @@ class StreamHandler:
     """
 
     pattern: jsonlog_cli.pattern.Pattern
+    where: "typing.Optional[jsonlog_cli.filter.Filter]"
+    collapser: "typing.Optional[jsonlog_cli.collapse.Collapser]"
+    sampler: "typing.Optional[jsonlog_cli.sample.Bernoulli]"
+    reservoir: "typing.Optional[jsonlog_cli.sample.Reservoir[SourcedPair]]"
     color: bool
+    prefix: bool
     error: bool
+    source: typing.Optional[str]
+    prefixes: typing.Dict[str, str]
+    bad_lines: jsonlog_cli.badlines.BadLines
 
     def __init__(
-        self, pattern: jsonlog_cli.pattern.Pattern, color: bool = True
+        self,
+        pattern: jsonlog_cli.pattern.Pattern,
+        where: "typing.Optional[jsonlog_cli.filter.Filter]" = None,
+        color: bool = True,
+        prefix: bool = False,
+        collapser: "typing.Optional[jsonlog_cli.collapse.Collapser]" = None,
+        sampler: "typing.Optional[jsonlog_cli.sample.Bernoulli]" = None,
+        reservoir: "typing.Optional[jsonlog_cli.sample.Reservoir[SourcedPair]]" = None,
     ) -> None:
         self.pattern = pattern
+        self.where = where
+        self.collapser = collapser
+        self.sampler = sampler
+        self.reservoir = reservoir
         self.color = color
+        self.prefix = prefix
         self.error = False
+        self.source = None
+        self.prefixes = {}
+        self.bad_lines = jsonlog_cli.badlines.BadLines()
 
     def __enter__(self) -> "StreamHandler":
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.reservoir is not None:
+            self.flush_reservoir(self.reservoir)
+        if self.collapser is not None:
+            for group in self.collapser.flush():
+                self.display(group.line, group.record, group.source, group)
         self.toggle_normal_state()
+        self.bad_lines.report()
 
     @property
     def json_stream_class(self) -> typing.Type[JSONStream]:
         return BufferedJSONStream if self.pattern.is_multiline_json() else JSONStream
 
-    def consume(self, streams: typing.Sequence[TextStream] = ()) -> None:
-        text_streams = streams or (sys.stdin,)
-        json_streams = [self.json_stream_class(stream=s) for s in text_streams]
+    def create_json_stream(self, stream: TextStream) -> JSONStream:
+        prefilter = self.where.prefilter if self.where else None
+        if self.sampler is not None:
+            prefilter = self.sampler.prefilter(prefilter)
+        reservoir = self.reservoir
+        if reservoir is not None and reservoir.key is None and self.where is None:
+            prefilter = reservoir.prefilter(prefilter)
+        return self.json_stream_class(
+            stream=stream, prefilter=prefilter, bad_lines=self.bad_lines,
+        )
+
+    def consume(
+        self, streams: typing.Iterable[TextStream] = (), follow: bool = False
+    ) -> None:
+        for stream in streams or (sys.stdin,):
+            if self.is_passthrough():
+                self.copy_stream(stream, follow=follow)
+            else:
+                self.consume_stream(self.create_json_stream(stream))
 
-        for stream in json_streams:
-            self.consume_stream(stream)
+    def is_passthrough(self) -> bool:
+        """Check if records can be copied to the output without decoding them."""
+        options = (self.where, self.collapser, self.sampler, self.reservoir)
+        return self.pattern.is_passthrough() and all(o is None for o in options)
 
     def consume_stream(self, stream: JSONStream) -> None:
-        for line, data in stream.consume():
-            self.echo(line, data)
+        for line, record in stream.consume():
+            self.echo(line, record)
+
+    def copy_stream(self, stream: TextStream, follow: bool = False) -> None:
+        """
+        Copy lines that are whole JSON objects straight to STDOUT.
+
+        Patterns that output records as they are don't need them re-encoded, so
+        lines are only checked to be JSON objects. Anything else is passed to a JSON
+        stream, which joins multiline records and reports lines that aren't JSON.
+        Output is only flushed after each line when following a stream or writing to
+        a terminal, where something is waiting to see each record as it arrives.
+        """
+        output = click.get_text_stream("stdout")
+        write = output.write
+        flush = follow or output.isatty()
+
+        is_valid_json = BufferedJSONStream.is_valid_json
+
+        json_stream = self.create_json_stream(())
+        pending = False
+        for line in stream:
+            if not is_valid_json(line):
+                for line, record in json_stream.feed(line):
+                    self.echo(line, record)
+                pending = True
+                continue
+
+            if pending:
+                for buffered, record in json_stream.flush():
+                    self.echo(buffered, record)
+                self.toggle_normal_state()
+                pending = False
+            write(line if line.endswith("\n") else line + "\n")
+            if flush:
+                output.flush()
+
+        for line, record in json_stream.flush():
+            self.echo(line, record)
+        output.flush()
+
+    def merge(self, streams: typing.Sequence[TextStream], slop: float = 0.0) -> None:
+        """
+        Interleave records from several streams in timestamp order.
+
+        Each stream gets its own timestamp parser, as they keep a cache of recently
+        parsed timestamps that works best when timestamps are close together.
+        """
+        pairs = [self.create_json_stream(stream).consume() for stream in streams]
+        parsers = [self.create_timestamp_parser() for _ in streams]
+        for line, record in jsonlog_cli.merge.merge(pairs, parsers, slop=slop):
+            self.echo(line, record)
+
+    def create_timestamp_parser(self) -> jsonlog_cli.timestamp.TimestampParser:
+        return jsonlog_cli.timestamp.TimestampParser(
+            key=self.pattern.timestamp_key, format=self.pattern.timestamp_format
+        )
+
+    def follow(
+        self,
+        paths: typing.Sequence[str],
+        positions: typing.Optional[typing.Mapping[str, int]] = None,
+    ) -> None:
+        """
+        Follow files as they grow, until interrupted.
+
+        Lines from each file are parsed separately, so that multiline JSON
+        messages written to different files at the same time aren't mixed up.
+        """
+        import jsonlog_cli.follow
+
+        with jsonlog_cli.follow.Follower.open(paths, positions) as follower:
+            streams = {s: self.create_json_stream(()) for s in follower.sources}
+            for source, line in follower.lines():
+                name = source.name if len(streams) > 1 else None
+                for line, record in streams[source].feed(line):
+                    self.echo(line, record, source=name)
+
+    def live(
+        self,
+        paths: typing.Sequence[str],
+        addresses: typing.Sequence["jsonlog_cli.live.Address"] = (),
+        follow: bool = False,
+    ) -> None:
+        """
+        Read every stream at the same time, interleaving records as they arrive.
+
+        Also accepts connections on each address, reading each connection as a
+        separate stream.
+        """
+        import jsonlog_cli.live
+
+        jsonlog_cli.live.LiveInputs(self, follow=follow).run(paths, addresses)
 
     def toggle_normal_state(self) -> None:
         if self.error:
@@ -150,21 +357,111 @@ class StreamHandler:
             self.error = True
             click.echo()
 
+    def toggle_source(self, source: typing.Optional[str]) -> None:
+        """Print a header like `tail` does when output switches between sources."""
+        if source is not None and source != self.source and not self.prefix:
+            self.toggle_normal_state()
+            if self.source is not None:
+                click.echo()
+            self.source = source
+            header = click.style(f"==> {source} <==", bold=True)
+            click.echo(header, color=self.color, err=False)
+
     def echo(
-        self, line: str, data: typing.Optional[jsonlog_cli.record.RecordDict]
+        self,
+        line: str,
+        record: typing.Optional[jsonlog_cli.record.Record],
+        source: typing.Optional[str] = None,
     ) -> None:
-        if data is None:
+        if not self.shown(record):
+            return
+
+        if self.reservoir is not None:
+            self.reservoir.add((line, record, source), self.reservoir.stratum(record))
+            return
+
+        self.collapse(line, record, source)
+
+    def collapse(
+        self,
+        line: str,
+        record: typing.Optional[jsonlog_cli.record.Record],
+        source: typing.Optional[str] = None,
+    ) -> None:
+        """Display a record, unless it's part of a run of repeated records."""
+        if self.collapser is None:
+            self.display(line, record, source)
+            return
+
+        for group in self.collapser.add(line, record, source):
+            self.display(group.line, group.record, group.source, group)
+
+    def flush_reservoir(
+        self, reservoir: "jsonlog_cli.sample.Reservoir[SourcedPair]"
+    ) -> None:
+        """Display the records kept in a reservoir, in the order they were read."""
+        for line, record, source in reservoir.items():
+            if record is not None:
+                # Records are only checked as far as the sample needed to read them.
+                try:
+                    record.data
+                except json.JSONDecodeError:
+                    record = None
+            self.collapse(line, record, source)
+
+    def display(
+        self,
+        line: str,
+        record: typing.Optional[jsonlog_cli.record.Record],
+        source: typing.Optional[str] = None,
+        group: "typing.Optional[jsonlog_cli.collapse.Group]" = None,
+    ) -> None:
+        self.toggle_source(source)
+        if record is None:
             self.toggle_error_state()
-            self.echo_err(line)
+            self.echo_err(line, source=source)
         else:
             self.toggle_normal_state()
-            self.echo_out(line, data)
+            self.echo_out(record, source=source, group=group)
+
+    def shown(self, record: typing.Optional[jsonlog_cli.record.Record]) -> bool:
+        """Check if a record (or a line that isn't JSON) should be shown."""
+        if record is None:
+            # Lines that aren't JSON can never match a filter.
+            return self.where is None
+        return self.where is None or self.where.match(record)
 
-    def echo_err(self, line: str) -> None:
+    def echo_err(self, line: str, source: typing.Optional[str] = None) -> None:
         output = jsonlog_cli.text.wrap_and_style_lines(line, fg="red", dim=True)
-        click.echo(output, color=self.color, err=True)
+        self.write(self.add_prefix(output, source), err=True)
+
+    def echo_out(
+        self,
+        record: jsonlog_cli.record.Record,
+        source: typing.Optional[str] = None,
+        group: "typing.Optional[jsonlog_cli.collapse.Group]" = None,
+    ) -> None:
+        if group is not None and group.count > 1:
+            output = self.pattern.format_repeated(
+                record, group.count, group.first, group.last
+            )
+        else:
+            output = self.pattern.format_record(record)
+        self.write(self.add_prefix(output, source), err=False)
+
+    def write(self, output: str, err: bool = False) -> None:
+        click.echo(output, color=self.color, err=err)
+
+    def add_prefix(self, output: str, source: typing.Optional[str]) -> str:
+        """Prefix each line of output with the name of its source, if enabled."""
+        if not self.prefix or source is None:
+            return output
+
+        prefix = self.prefixes.get(source)
+        if prefix is None:
+            colour = SOURCE_COLOURS[len(self.prefixes) % len(SOURCE_COLOURS)]
+            prefix = self.prefixes[source] = click.style(f"{source} | ", fg=colour)
 
-    def echo_out(self, line: str, data: jsonlog_cli.record.RecordDict) -> None:
-        record = jsonlog_cli.record.Record(line=line.strip(), data=data)
-        output = self.pattern.format_record(record)
-        click.echo(output, color=self.color, err=False)
+        if "\n" not in output:
+            return prefix + output
+        return "\n".join(prefix + line for line in output.split("\n"))
@@ -0,0 +1,159 @@
+"""
+Show the last records of each input, like `tail -n`.
+
+Regular files are read backwards from the end in large blocks until enough records
+have been found, and then read forwards from the first of those records as usual, so
+only the records that are shown get parsed and formatted however large the file is.
+
+Without a filter each line is a record and the lines just need counting. With a
+filter the lines found are parsed to count only the records that would be shown.
+Multiline JSON records can span several lines, so lines are grouped into records
+the same way `BufferedJSONStream` groups them: a record starts on a line starting
+with `{`, and any lines after it that don't are part of it.
+
+Inputs that can't be read backwards (STDIN, pipes and compressed files) are read in
+full, keeping only the last records.
+"""
+
+import collections
+import logging
+import os
+import stat
+import typing
+
+import jsonlog_cli.inputs
+
+if typing.TYPE_CHECKING:
+    import jsonlog_cli.stream
+
+log = logging.getLogger(__name__)
+
+BLOCK_SIZE = 1024 * 1024
+
+
+class Tail:
+    """Shows the last `count` records that a handler would show from each input."""
+
+    handler: "jsonlog_cli.stream.StreamHandler"
+    count: int
+
+    def __init__(self, handler: "jsonlog_cli.stream.StreamHandler", count: int) -> None:
+        self.handler = handler
+        self.count = count
+
+    def consume(self, paths: typing.Sequence[str]) -> None:
+        for path in paths or (jsonlog_cli.inputs.STDIN,):
+            if path == jsonlog_cli.inputs.STDIN:
+                self.consume_last(jsonlog_cli.inputs.open_stdin())
+                continue
+            with open(path, "rb") as file:
+                self.consume_last(jsonlog_cli.inputs.open_binary(path, file, self.seek))
+
+    def consume_last(self, stream: "jsonlog_cli.stream.TextStream") -> None:
+        """
+        Show the last records from a stream.
+
+        Streams starting near the end of a file contain few records, but still need
+        trimming when a multiline JSON record is followed by lines that aren't JSON.
+        """
+        pairs: typing.Deque[jsonlog_cli.stream.RecordPair] = collections.deque(
+            maxlen=self.count
+        )
+        for line, record in self.handler.create_json_stream(stream).consume():
+            if self.handler.shown(record):
+                pairs.append((line, record))
+        for line, record in pairs:
+            self.handler.echo(line, record)
+
+    def seek(
+        self, path: str, file: typing.BinaryIO
+    ) -> typing.Optional[typing.List[jsonlog_cli.inputs.Range]]:
+        """Choose the end of a regular file, or return None to read everything."""
+        size = regular_size(file)
+        if size is None:
+            return None
+        start = self.start(file, size)
+        log.info("Reading end of file", extra={"path": path, "start": start})
+        return [(start, size)]
+
+    def positions(self, paths: typing.Sequence[str]) -> typing.Dict[str, int]:
+        """Find where to start following each regular file."""
+        positions = {}
+        for path in paths:
+            if path == jsonlog_cli.inputs.STDIN:
+                continue
+            with open(path, "rb") as file:
+                size = regular_size(file)
+                if size is not None:
+                    positions[path] = self.start(file, size)
+        return positions
+
+    def start(self, file: typing.BinaryIO, size: int) -> int:
+        """Return the offset of the first of the last `count` records in a file."""
+        if self.count == 0:
+            return size
+
+        # Without a filter every line or multiline record is shown, so there's no need
+        # to parse anything.
+        parse = self.handler.where is not None
+        multiline = self.handler.pattern.is_multiline_json()
+        stream = self.handler.create_json_stream(())
+
+        # Nothing before the earliest record that would be shown needs reading again.
+        found, start = 0, size
+        lines: typing.List[str] = []
+        for offset, line in reversed_lines(file, size):
+            lines.append(line)
+            if multiline and offset > 0 and not line.startswith("{"):
+                continue
+
+            shown = self.shown(stream, reversed(lines)) if parse else 1
+            lines = []
+            if shown:
+                found, start = found + shown, offset
+            if found >= self.count:
+                break
+        return start
+
+    def shown(
+        self, stream: "jsonlog_cli.stream.JSONStream", lines: typing.Iterable[str]
+    ) -> int:
+        """Count the records that would be shown from some lines."""
+        pairs = [pair for line in lines for pair in stream.feed(line)]
+        pairs.extend(stream.flush())
+        return sum(1 for _, record in pairs if self.handler.shown(record))
+
+
+def regular_size(file: typing.BinaryIO) -> typing.Optional[int]:
+    """Return the size of an uncompressed regular file, or None for anything else."""
+    status = os.fstat(file.fileno())
+    if not stat.S_ISREG(status.st_mode):
+        return None
+    if jsonlog_cli.inputs.detect_compression(file) is not None:
+        return None
+    return status.st_size
+
+
+def reversed_lines(
+    file: typing.BinaryIO, size: int
+) -> typing.Iterator[typing.Tuple[int, str]]:
+    """Yield the offset and text of each line in a file, from the last to the first."""
+    start = end = size
+    partial = b""
+    while start > 0:
+        block_end, start = start, max(start - BLOCK_SIZE, 0)
+        file.seek(start)
+        # The first piece might be the end of a line that started in an earlier block.
+        partial, *pieces = (file.read(block_end - start) + partial).split(b"\n")
+        for piece in reversed(pieces):
+            # A newline at the end of the file ends the last line, not starts another.
+            if piece or end != size:
+                yield end - len(piece), decode(piece)
+            end -= len(piece) + 1
+
+    if partial or end != size:
+        yield 0, decode(partial)
+
+
+def decode(line: bytes) -> str:
+    return line.decode("utf-8", errors="replace") + "\n"
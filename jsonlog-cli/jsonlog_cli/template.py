@@ -0,0 +1,230 @@
+"""
+Format strings compiled once into templates for rendering records.
+
+Templates use the same syntax as `str.format`, with a few differences:
+
+- Fields are key paths, so `{http.status}` and `{items[0].name}` use nested values.
+- Missing keys (and null values) are shown as `-`, or as a default given after a
+  `|` (e.g. `{user|anonymous}`), rather than stopping with a `KeyError`.
+- A format spec can end with `@` and a colour to colour a field, as in
+  `{level:<8@bold+red}`. Other fields are coloured by the record's level.
+
+Each format string is parsed into literal text and the fields that follow it when
+the template is created, so rendering a record only has to look up and format the
+fields the template uses.
+"""
+
+import functools
+import operator
+import string
+import typing
+
+import click
+
+import jsonlog_cli.colours
+import jsonlog_cli.keypath
+import jsonlog_cli.record
+import jsonlog_cli.types
+
+MISSING = "-"
+
+CONVERSIONS: typing.Mapping[str, typing.Callable[[typing.Any], str]] = {
+    "r": repr,
+    "s": str,
+    "a": ascii,
+}
+
+
+class TemplateError(ValueError):
+    pass
+
+
+class Field(typing.NamedTuple):
+    path: jsonlog_cli.keypath.KeyPath
+    default: str = MISSING
+    conversion: typing.Optional[str] = None
+    spec: str = ""
+    colour: typing.Optional[jsonlog_cli.colours.Colour] = None
+
+    @classmethod
+    def parse(cls, name: str, conversion: typing.Optional[str], spec: str) -> "Field":
+        """Parse a field's name, conversion and spec (including any colour)."""
+        if "{" in spec:
+            raise TemplateError(f"Nested fields aren't supported in {name!r}")
+        key, separator, default = name.partition("|")
+        if not key:
+            raise TemplateError("Template fields need a key")
+        if conversion is not None and conversion not in CONVERSIONS:
+            raise TemplateError(f"Unknown conversion {conversion!r} in {name!r}")
+
+        spec, _, colour = spec.partition("@")
+        return cls(
+            path=jsonlog_cli.keypath.KeyPath.of(key),
+            default=default if separator else MISSING,
+            conversion=conversion,
+            spec=spec,
+            colour=parse_colour(colour) if colour else None,
+        )
+
+    def render(self, record: jsonlog_cli.record.Record) -> str:
+        value = record.extract(self.path)
+        if value is None:
+            # Defaults are still aligned, but aren't converted.
+            value = self.default
+        elif self.conversion is not None:
+            value = CONVERSIONS[self.conversion](value)
+        try:
+            return format(value, self.spec)
+        except (TypeError, ValueError):
+            # The spec doesn't suit this value (e.g. a number format for a string).
+            return str(value)
+
+
+class Template(str):
+    """
+    A format string that has been compiled into literal text and fields.
+
+    Template is a subclass of `str` so that patterns can still be compared, hashed
+    and serialised as strings.
+    """
+
+    pieces: typing.Tuple[typing.Tuple[str, typing.Optional[Field]], ...]
+    fields: typing.Tuple[Field, ...]
+    coloured: bool
+    getter: typing.Optional[
+        typing.Callable[[jsonlog_cli.record.RecordDict], typing.Any]
+    ]
+    compiled: str
+
+    def __init__(self, format_string: str) -> None:
+        # The string itself is created by `str.__new__`, which is passed the same format.
+        super().__init__()
+        self.pieces = self.parse(format_string)
+        self.fields = tuple(f for _, f in self.pieces if f is not None)
+        self.coloured = any(f.colour is not None for f in self.fields)
+        self.getter, self.compiled = None, ""
+        if self.fields and not self.coloured:
+            if all(field.path.simple for field in self.fields):
+                self.getter = operator.itemgetter(*self.keys())
+                self.compiled = self.compile(self.pieces)
+
+    def __reduce__(self) -> typing.Tuple[typing.Any, ...]:
+        return self.__class__, (str(self),)
+
+    @classmethod
+    def __get_validators__(cls) -> typing.Iterator[typing.Callable]:
+        yield cls.validate
+
+    @classmethod
+    def validate(cls, value: typing.Any) -> "Template":
+        if not isinstance(value, str):
+            raise TypeError("string required")
+        return cls.of(value)
+
+    @classmethod
+    def of(cls, format_string: str) -> "Template":
+        """Return a compiled Template, reusing a cached one if given a string."""
+        if isinstance(format_string, Template):
+            return format_string
+        return compile_template(format_string)
+
+    @staticmethod
+    def parse(
+        format_string: str,
+    ) -> typing.Tuple[typing.Tuple[str, typing.Optional[Field]], ...]:
+        try:
+            parsed = list(string.Formatter().parse(format_string))
+        except ValueError as error:
+            raise TemplateError(f"Invalid template {format_string!r}: {error}")
+
+        return tuple(
+            (
+                literal,
+                None if name is None else Field.parse(name, conversion, spec or ""),
+            )
+            for literal, name, spec, conversion in parsed
+        )
+
+    @staticmethod
+    def compile(
+        pieces: typing.Sequence[typing.Tuple[str, typing.Optional[Field]]]
+    ) -> str:
+        """Create a format string that takes each field's value as an argument."""
+        parts = []
+        index = 0
+        for literal, field in pieces:
+            parts.append(literal.replace("{", "{{").replace("}", "}}"))
+            if field is not None:
+                conversion = "" if field.conversion is None else f"!{field.conversion}"
+                parts.append(f"{{{index}{conversion}:{field.spec}}}")
+                index += 1
+        return "".join(parts)
+
+    def keys(self) -> typing.List[jsonlog_cli.keypath.KeyPath]:
+        return [field.path for field in self.fields]
+
+    def render(
+        self,
+        record: jsonlog_cli.record.Record,
+        colour: jsonlog_cli.colours.Colour = jsonlog_cli.colours.Colour(),
+    ) -> str:
+        """Render a record, colouring anything without its own colour with `colour`."""
+        if self.getter is not None:
+            # Templates that only use top-level keys look them all up at once, and
+            # are formatted by `str.format`. Rendering each field separately handles
+            # missing keys, null values and specs that don't suit a value.
+            try:
+                values = self.getter(record.data)
+                if len(self.fields) == 1:
+                    values = (values,)
+                if None not in values:
+                    return colour.style(self.compiled.format(*values))
+            except (KeyError, TypeError, ValueError):
+                pass
+
+        if not self.coloured:
+            parts = []
+            for literal, field in self.pieces:
+                parts.append(literal)
+                if field is not None:
+                    parts.append(field.render(record))
+            return colour.style("".join(parts))
+
+        # Styles can't be nested, so text between coloured fields is styled separately.
+        output: typing.List[str] = []
+        pending: typing.List[str] = []
+        for literal, field in self.pieces:
+            pending.append(literal)
+            if field is None:
+                continue
+            if field.colour is None:
+                pending.append(field.render(record))
+                continue
+            output.append(style("".join(pending), colour))
+            output.append(style(field.render(record), field.colour))
+            pending = []
+        output.append(style("".join(pending), colour))
+        return "".join(output)
+
+
+def style(text: str, colour: jsonlog_cli.colours.Colour) -> str:
+    return colour.style(text) if text else text
+
+
+def parse_colour(colour: str) -> jsonlog_cli.colours.Colour:
+    """Parse a colour name, optionally combined with `bold` (e.g. `bold+red`)."""
+    words = colour.split("+")
+    names = [word for word in words if word != "bold"]
+    if len(names) > 1:
+        raise TemplateError(f"Only one colour can be used in {colour!r}")
+    fg = names[0] if names else None
+    try:
+        click.style("", fg=fg)
+    except TypeError:
+        raise TemplateError(f"Unknown colour {colour!r}")
+    return jsonlog_cli.colours.Colour(fg=fg, bold=True if "bold" in words else None)
+
+
+@functools.lru_cache(maxsize=None)
+def compile_template(format_string: str) -> Template:
+    return Template(format_string)
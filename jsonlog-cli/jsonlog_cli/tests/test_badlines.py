@@ -0,0 +1,74 @@
+import logging
+
+import pytest
+
+from jsonlog_cli.badlines import (
+    BLANK,
+    INCOMPLETE,
+    INVALID,
+    NOT_OBJECT,
+    BadLines,
+    classify,
+)
+from jsonlog_cli.stream import BufferedJSONStream, JSONStream
+
+
+@pytest.mark.parametrize(
+    "string, reason",
+    [
+        ("\n", BLANK),
+        ("plain text\n", NOT_OBJECT),
+        ('["a", 1]\n', NOT_OBJECT),
+        ('{"message": "trunc\n', INCOMPLETE),
+        ('{"message": "ok"}\n', None),
+        ('  {"message": "ok"}  \n', None),
+        ('{"message": }\n', None),
+    ],
+)
+def test_classify(string: str, reason: str) -> None:
+    assert classify(string) == reason
+
+
+def test_bad_lines_counted() -> None:
+    lines = ["text\n", "\n", '{"a": \n', '{"a": }\n', '{"a": 1}\n', "[1]\n"]
+    stream = JSONStream(iter(lines))
+    records = [record for _, record in stream.consume()]
+    assert [r for r in records if r is not None][0].data == {"a": 1}
+    assert stream.bad_lines.counts == {
+        NOT_OBJECT: 2,
+        BLANK: 1,
+        INCOMPLETE: 1,
+        INVALID: 1,
+    }
+
+
+def test_bad_lines_shared() -> None:
+    bad_lines = BadLines()
+    for _ in range(2):
+        stream = BufferedJSONStream(iter(["text\n", "{\n", "}\n"]), bad_lines=bad_lines)
+        list(stream.consume())
+    assert bad_lines.counts == {NOT_OBJECT: 2}
+
+
+def test_bad_lines_logging_limited(caplog) -> None:
+    caplog.set_level(logging.WARNING, logger="jsonlog_cli.badlines")
+    bad_lines = BadLines(limit=3)
+    for n in range(100):
+        bad_lines.add(INVALID if n % 2 else NOT_OBJECT, f"line {n}")
+    bad_lines.report()
+
+    messages = [record.getMessage() for record in caplog.records]
+    assert messages == [
+        "Could not parse JSON",
+        "Could not parse JSON",
+        "Could not parse JSON",
+        "Only counting further lines that could not be parsed",
+        "Lines that could not be parsed",
+    ]
+    assert caplog.records[1].error.startswith("Expecting value")
+    assert caplog.records[-1].counts == {NOT_OBJECT: 50, INVALID: 50}
+
+
+def test_bad_lines_report_nothing(caplog) -> None:
+    BadLines().report()
+    assert not caplog.records
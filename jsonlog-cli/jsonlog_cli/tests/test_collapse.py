@@ -0,0 +1,110 @@
+import json
+import pathlib
+import typing
+
+import click
+import click.testing
+import pytest
+
+import jsonlog_cli.cli
+import jsonlog_cli.config
+
+from jsonlog_cli.collapse import Collapser, Group
+from jsonlog_cli.pattern import RawPattern, TemplatePattern
+from jsonlog_cli.record import Record
+from jsonlog_cli.stream import StreamHandler
+from jsonlog_cli.template import Template
+
+
+def record(timestamp: int, message: str, **data: typing.Any) -> Record:
+    data = {"timestamp": timestamp, "message": message, **data}
+    return Record(line=json.dumps(data), data=data)
+
+
+def collapse(collapser: Collapser, records: typing.Iterable[Record]) -> typing.List:
+    groups: typing.List[Group] = []
+    for r in records:
+        groups.extend(collapser.add(r.line, r))
+    groups.extend(collapser.flush())
+    return [
+        (g.record and g.record["message"], g.count, g.first, g.last) for g in groups
+    ]
+
+
+def test_collapse_consecutive() -> None:
+    records = [record(i, m) for i, m in enumerate("aaabaab")]
+    assert collapse(Collapser(), records) == [
+        ("a", 3, 0, 2),
+        ("b", 1, 3, 3),
+        ("a", 2, 4, 5),
+        ("b", 1, 6, 6),
+    ]
+
+
+def test_collapse_window() -> None:
+    records = [record(i, m) for i, m in enumerate("abababc")]
+    assert collapse(Collapser(window=2), records) == [
+        ("a", 3, 0, 4),
+        ("b", 3, 1, 5),
+        ("c", 1, 6, 6),
+    ]
+
+
+def test_collapse_keys() -> None:
+    records = [record(0, "a", level="error"), record(1, "b", level="error")]
+    assert collapse(Collapser(), records) == [("a", 1, 0, 0), ("b", 1, 1, 1)]
+    assert collapse(Collapser(keys=["level"]), records) == [("a", 2, 0, 1)]
+
+
+def test_collapse_text_ends_runs() -> None:
+    collapser = Collapser(window=3)
+    assert list(collapser.add("a", record(0, "a"))) == []
+    groups = list(collapser.add("not json", None))
+    assert [(g.line, g.count) for g in groups] == [("a", 1), ("not json", 1)]
+
+
+def test_collapse_handler(capsys) -> None:
+    pattern = TemplatePattern(
+        format=Template.of("{message}"), multiline_keys=["traceback"]
+    )
+    lines = [record(i, "boom", traceback="Traceback").line + "\n" for i in range(3)]
+    with StreamHandler(pattern, color=False, collapser=Collapser()) as handler:
+        handler.consume([iter(lines)])
+
+    output = click.unstyle(capsys.readouterr().out)
+    assert output.count("Traceback") == 1
+    assert output.splitlines()[0] == "boom (repeated 3 times, 0 to 2)"
+
+
+def test_collapse_raw(capsys) -> None:
+    lines = [record(i, "boom").line + "\n" for i in range(2)]
+    pattern = RawPattern(multiline_json=True)
+    with StreamHandler(pattern, color=False, collapser=Collapser()) as handler:
+        handler.consume([iter(lines)])
+
+    output = json.loads(capsys.readouterr().out)
+    assert output["repeated"] == {"count": 2, "first": 0, "last": 1}
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        ["--collapse", "--follow"],
+        ["--collapse", "--live"],
+        ["--collapse-key", "level", "--follow"],
+    ],
+)
+def test_collapse_cli_rejects_following(
+    tmp_path: pathlib.Path, monkeypatch, args: typing.List[str]
+) -> None:
+    monkeypatch.setattr(jsonlog_cli.config, "configure_logging", lambda *args: None)
+    cache_path = tmp_path / "config.pickle"
+    monkeypatch.setattr(jsonlog_cli.cli, "DEFAULT_CONFIG_CACHE_PATH", cache_path)
+    path = tmp_path / "app.log"
+    path.write_text(record(0, "a").line + "\n")
+
+    result = click.testing.CliRunner(mix_stderr=False).invoke(
+        jsonlog_cli.cli.main, ["key-value", *args, str(path)],
+    )
+    assert result.exit_code == 2
+    assert "--collapse can't be used with --follow" in result.stderr
@@ -0,0 +1,73 @@
+import json
+import os
+import pathlib
+import pickle
+
+import jsonlog_cli.config
+from jsonlog_cli.config import Config, LogFile
+from jsonlog_cli.template import Template
+
+
+def write_config(path: pathlib.Path, format_string: str) -> None:
+    path.write_text(json.dumps({"templates": {"short": {"format": format_string}}}))
+
+
+def test_load_defaults(tmp_path: pathlib.Path) -> None:
+    config = Config.load(str(tmp_path / "missing.json"))
+    assert "default" in config.keyvalues
+    assert "default" in config.templates
+
+
+def test_load_cached(tmp_path: pathlib.Path, monkeypatch) -> None:
+    path, cache = tmp_path / "config.json", tmp_path / "cache" / "config.pickle"
+    write_config(path, "{message}")
+
+    config = Config.load(str(path), cache_path=str(cache))
+    assert config.templates["short"].format == "{message}"
+    assert cache.exists()
+
+    def parse(path: pathlib.Path) -> Config:
+        raise AssertionError("The cached configuration wasn't used")
+
+    with monkeypatch.context() as m:
+        m.setattr(Config, "parse", parse)
+        cached = Config.load(str(path), cache_path=str(cache))
+    assert cached == config
+    template = cached.templates["short"].format
+    assert isinstance(template, Template) and template.keys() == ["message"]
+
+
+def test_load_cache_invalidated(tmp_path: pathlib.Path) -> None:
+    path, cache = tmp_path / "config.json", tmp_path / "config.pickle"
+    write_config(path, "{message}")
+    Config.load(str(path), cache_path=str(cache))
+
+    write_config(path, "{message}!")
+    os.utime(path, ns=(0, 0))
+    config = Config.load(str(path), cache_path=str(cache))
+    assert config.templates["short"].format == "{message}!"
+
+    path.unlink()
+    assert "short" not in Config.load(str(path), cache_path=str(cache)).templates
+
+
+def test_load_cache_unreadable(tmp_path: pathlib.Path) -> None:
+    path, cache = tmp_path / "config.json", tmp_path / "config.pickle"
+    write_config(path, "{message}")
+    cache.write_bytes(b"not a pickle")
+
+    config = Config.load(str(path), cache_path=str(cache))
+    assert config.templates["short"].format == "{message}"
+    cached_key, _ = pickle.loads(cache.read_bytes())
+    assert cached_key == jsonlog_cli.config.cache_key(path)
+
+
+def test_log_file(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "logs" / "internal.log"
+    log_file = LogFile(str(path))
+    log_file.flush()
+    assert not path.parent.exists()
+
+    log_file.write("line\n")
+    log_file.flush()
+    assert path.read_text() == "line\n"
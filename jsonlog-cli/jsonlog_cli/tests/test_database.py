@@ -0,0 +1,111 @@
+import json
+import os
+import pathlib
+import typing
+
+import pytest
+
+from jsonlog_cli.database import Columns, Database, DatabaseError, text
+from jsonlog_cli.stream import JSONStream
+
+RECORDS = [
+    {
+        "timestamp": "2020-01-01T12:00:00Z",
+        "level": "info",
+        "name": "app",
+        "message": "started",
+    },
+    {
+        "timestamp": "2020-01-01T12:00:02Z",
+        "level": "error",
+        "name": "app.db",
+        "message": "failed",
+        "error": {"code": 7},
+    },
+    {
+        "timestamp": "2020-01-01T12:00:01Z",
+        "level": "warning",
+        "name": "application",
+        "message": ["not", "a", "string"],
+    },
+]
+LINES = [json.dumps(record) + "\n" for record in RECORDS] + ["not json\n"]
+
+
+@pytest.fixture()
+def log_path(tmp_path: pathlib.Path) -> pathlib.Path:
+    path = tmp_path / "app.log"
+    path.write_text("".join(LINES))
+    return path
+
+
+@pytest.fixture()
+def database(tmp_path: pathlib.Path) -> typing.Iterator[Database]:
+    with Database.open(str(tmp_path / "records.sqlite")) as database:
+        yield database
+
+
+def load(database: Database, path: pathlib.Path, columns: Columns) -> int:
+    with open(path) as file:
+        return database.load(str(path), JSONStream(file), columns)
+
+
+def query(database: Database, **kwargs: typing.Any) -> typing.List[str]:
+    return [json.loads(line)["message"] for line in database.query(**kwargs)]
+
+
+def test_load(database: Database, log_path: pathlib.Path) -> None:
+    assert load(database, log_path, Columns()) == 3
+    assert database.loaded(str(log_path), Columns())
+    assert [json.loads(line) for line in database.query()] == RECORDS
+
+    row = database.connection.execute(
+        "SELECT timestamp, level, level_number, name, message"
+        " FROM records WHERE name = 'application'"
+    ).fetchone()
+    assert row == (1577880001.0, "warning", 30, "application", '["not", "a", "string"]')
+
+
+def test_query(database: Database, log_path: pathlib.Path) -> None:
+    load(database, log_path, Columns())
+    assert query(database, level=30) == ["failed", ["not", "a", "string"]]
+    assert query(database, since=1577880001.0, until=1577880002.0) == [
+        ["not", "a", "string"]
+    ]
+    assert query(database, name="app") == ["started", "failed"]
+    assert query(database, by_time=True)[1:] == [["not", "a", "string"], "failed"]
+
+
+def test_query_uses_indexes(database: Database, log_path: pathlib.Path) -> None:
+    load(database, log_path, Columns())
+    plan = database.connection.execute(
+        "EXPLAIN QUERY PLAN SELECT json FROM records WHERE timestamp >= 0"
+    ).fetchall()
+    assert "records_timestamp" in str(plan)
+
+
+def test_reload(database: Database, log_path: pathlib.Path) -> None:
+    load(database, log_path, Columns())
+    assert not database.loaded(str(log_path), Columns(name_key="logger"))
+
+    with open(log_path, "a") as file:
+        file.write(LINES[0])
+    assert not database.loaded(str(log_path), Columns())
+    assert load(database, log_path, Columns()) == 4
+    assert len(query(database)) == 4
+
+
+def test_version(tmp_path: pathlib.Path) -> None:
+    path = str(tmp_path / "records.sqlite")
+    with Database.open(path) as database:
+        database.connection.execute("PRAGMA user_version = 99")
+    with pytest.raises(DatabaseError):
+        Database.open(path)
+    assert os.path.exists(path)
+
+
+@pytest.mark.parametrize(
+    "value, expected", [(None, None), ("a", "a"), (1, "1"), ({"a": 1}, '{"a": 1}')]
+)
+def test_text(value: typing.Any, expected: typing.Optional[str]) -> None:
+    assert text(value) == expected
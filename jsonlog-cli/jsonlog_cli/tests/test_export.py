@@ -0,0 +1,94 @@
+import csv
+import io
+import json
+import typing
+
+import pytest
+
+from jsonlog_cli.export import Exporter, escape_tsv, text
+from jsonlog_cli.filter import Filter
+from jsonlog_cli.stream import BufferedJSONStream, JSONStream
+
+RECORDS = [
+    {"level": "info", "message": "tab\there", "http": {"status": 200}},
+    {"level": "error", "message": 'quote " and, comma', "tags": ["a", "b"]},
+    {"level": "info", "message": "new\nline\\", "http": None},
+]
+LINES = [json.dumps(record) + "\n" for record in RECORDS] + ["not json\n"]
+
+
+def export(
+    fields: typing.Sequence[str],
+    format: str = "tsv",
+    where: typing.Optional[Filter] = None,
+    lines: typing.Sequence[str] = LINES,
+) -> str:
+    exporter = Exporter(fields, format=format)
+    output = io.StringIO()
+    output.write(exporter.header())
+    exporter.export(JSONStream(iter(lines)), output, where)
+    return output.getvalue()
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [("a", "a"), (None, ""), (True, "true"), (1.5, "1.5"), ({"a": [1]}, '{"a":[1]}')],
+)
+def test_text(value, expected: str) -> None:
+    assert text(value) == expected
+
+
+def test_escape_tsv() -> None:
+    assert escape_tsv("plain") == "plain"
+    assert escape_tsv("a\tb\nc\\d\r") == "a\\tb\\nc\\\\d\\r"
+
+
+def test_export_tsv() -> None:
+    assert export(["level", "message", "http.status", "tags[1]"]).splitlines() == [
+        "level\tmessage\thttp.status\ttags[1]",
+        "info\ttab\\there\t200\t",
+        'error\tquote " and, comma\t\tb',
+        "info\tnew\\nline\\\\\t\t",
+    ]
+
+
+def test_export_csv() -> None:
+    rows = list(csv.reader(io.StringIO(export(["message", "http"], format="csv"))))
+    assert rows == [
+        ["message", "http"],
+        ["tab\there", '{"status":200}'],
+        ['quote " and, comma', ""],
+        ["new\nline\\", ""],
+    ]
+
+
+def test_export_ndjson() -> None:
+    lines = export(["level", "http.status"], format="ndjson").splitlines()
+    assert [json.loads(line) for line in lines] == [
+        {"level": "info", "http.status": 200},
+        {"level": "error", "http.status": None},
+        {"level": "info", "http.status": None},
+    ]
+
+
+def test_export_where() -> None:
+    where = Filter.parse(["level==error"])
+    assert export(["message"], where=where) == 'message\nquote " and, comma\n'
+
+
+def test_export_special_keys() -> None:
+    output = export(["__line__"], format="ndjson", lines=LINES[:1])
+    assert json.loads(json.loads(output)["__line__"]) == RECORDS[0]
+
+
+def test_export_multiline() -> None:
+    lines = json.dumps(RECORDS[0], indent=2).splitlines(keepends=True)
+    exporter = Exporter(["level", "http.status"])
+    output = io.StringIO()
+    assert exporter.export(BufferedJSONStream(iter(lines)), output) == 1
+    assert output.getvalue() == "info\t200\n"
+
+
+def test_export_unknown_format() -> None:
+    with pytest.raises(ValueError):
+        Exporter(["level"], format="xml")
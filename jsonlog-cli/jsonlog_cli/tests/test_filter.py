@@ -0,0 +1,102 @@
+import json
+import typing
+
+import pytest
+
+from jsonlog_cli.filter import Filter, FilterError
+from jsonlog_cli.pattern import RawPattern
+from jsonlog_cli.record import Record
+from jsonlog_cli.stream import StreamHandler
+
+
+def record(**data) -> Record:
+    return Record(line=json.dumps(data), data=data)
+
+
+@pytest.mark.parametrize(
+    "expression,data,expected",
+    [
+        ("level>=warning", {"level": "ERROR"}, True),
+        ("level>=warning", {"level": "info"}, False),
+        ("level>=warning", {"level": 30}, True),
+        ("level=error", {"level": "ERROR"}, True),
+        ("name=~^app\\.", {"name": "app.views"}, True),
+        ("name=~^app\\.", {"name": "application"}, False),
+        ("name!~'^(a|b)'", {"name": "c"}, True),
+        ("status in (500,503)", {"status": 503}, True),
+        ("status in (500, 503)", {"status": "500"}, True),
+        ("status not in (500, 503)", {"status": 200}, True),
+        ("status>=500", {"status": "502"}, True),
+        ("exists(traceback)", {"traceback": "..."}, True),
+        ("exists(traceback)", {"message": "..."}, False),
+        ("http.status=404 and not user=admin", {"http": {"status": 404}}, True),
+        ("a=1 or b=2", {"b": 2}, True),
+        ("(a=1 or b=2) and c=3", {"b": 2}, False),
+        ("flag=true", {"flag": True}, True),
+        ("flag=true", {"flag": 1}, False),
+        ("missing=null", {}, True),
+        ("exists(items.0)", {"items": [1]}, True),
+        ("items.1>1", {"items": [1, 5]}, True),
+        ("items[0]=1", {"items": [1]}, True),
+        ("items[0].name=a", {"items": [{"name": "a"}]}, True),
+    ],
+)
+def test_match(expression: str, data: dict, expected: bool) -> None:
+    where = Filter.parse([expression])
+    assert where is not None
+    assert where.match(record(**data)) is expected
+
+    # The prefilter must never reject a line that matches.
+    if expected:
+        assert where.match_line(json.dumps(data))
+
+
+@pytest.mark.parametrize(
+    "expression,line,expected",
+    [
+        ("message=hello", '{"message": "goodbye"}', False),
+        ("message=hello", '{"message": "hello"}', True),
+        ("exists(traceback)", '{"message": "hello"}', False),
+        ("name in (app, db)", '{"name": "web"}', False),
+        ("level>=warning", '{"level": "info"}', True),
+        ("a=1 or not b=2", '{"c": 3}', True),
+        ("n == 10", '{"n": 1e1}', True),
+        ("n == 10", '{"n": 100E-1}', True),
+        ("flag=true", '{"flag": false}', False),
+    ],
+)
+def test_prefilter(expression: str, line: str, expected: bool) -> None:
+    where = Filter.parse([expression])
+    assert where is not None
+    assert where.match_line(line) is expected
+
+
+@pytest.mark.parametrize(
+    "expression", ["level>=", "(a=1", "a=1 b=2", "exists(a", "a ~ b", "a=~'('"]
+)
+def test_invalid(expression: str) -> None:
+    with pytest.raises(FilterError):
+        Filter.parse([expression])
+
+
+def test_level_key() -> None:
+    where = Filter.parse(["@level>=warning"], level_key="@level")
+    assert where is not None
+    assert where.match(Record(line="", data={"@level": "warn"}))
+
+
+@pytest.mark.parametrize(
+    "expression, expected",
+    [
+        ("exists(items.0)", ['{"items": [1, 5]}']),
+        ("items.1 > 1", ['{"items": [1, 5]}']),
+        ("items[1] > 1", ['{"items": [1, 5]}']),
+        ("exists(items.2)", []),
+    ],
+)
+def test_index_paths(capsys, expression: str, expected: typing.List[str]) -> None:
+    where = Filter.parse([expression])
+    lines = ['{"items": [1, 5]}\n', '{"items": []}\n']
+    with StreamHandler(RawPattern(), where=where, color=False) as handler:
+        handler.consume([iter(lines)])
+    assert capsys.readouterr().out.splitlines() == expected
@@ -0,0 +1,48 @@
+import pathlib
+
+from jsonlog_cli.follow import FollowedFile
+
+
+def test_follow_appends(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "app.log"
+    path.write_text("one\n")
+    followed = FollowedFile(str(path))
+    assert followed.read() == ["one\n"]
+    assert followed.read() == []
+
+    with path.open("a") as f:
+        f.write("two\nthr")
+    assert followed.read() == ["two\n"]
+
+    with path.open("a") as f:
+        f.write("ee\n")
+    assert followed.read() == ["three\n"]
+    followed.close()
+
+
+def test_follow_truncation(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "app.log"
+    path.write_text("one\ntwo\n")
+    followed = FollowedFile(str(path))
+    assert followed.read() == ["one\n", "two\n"]
+
+    path.write_text("new\n")
+    assert followed.read() == ["new\n"]
+    followed.close()
+
+
+def test_follow_rotation(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "app.log"
+    path.write_text("one\n")
+    followed = FollowedFile(str(path))
+    assert followed.read() == ["one\n"]
+
+    rotated = tmp_path / "app.log.1"
+    path.rename(rotated)
+    with rotated.open("a") as f:
+        f.write("two\n")
+    assert followed.read() == ["two\n"]
+
+    path.write_text("three\n")
+    assert followed.read() == ["three\n"]
+    followed.close()
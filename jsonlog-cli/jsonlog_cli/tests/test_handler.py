@@ -0,0 +1,67 @@
+import io
+import json
+import logging
+import pathlib
+import typing
+
+import pytest
+
+from jsonlog_cli.config import default_keyvalues, default_templates
+from jsonlog_cli.handler import PatternHandler, PayloadRecord
+from jsonlog_cli.pattern import Pattern
+from jsonlog_cli.template import Template
+
+
+def emit(pattern: Pattern, **kwargs: typing.Any) -> str:
+    stream = io.StringIO()
+    handler = PatternHandler(pattern, stream=stream, color=False)
+    logger = logging.getLogger("jsonlog_cli.tests.handler")
+    record = logger.makeRecord(
+        logger.name,
+        logging.WARNING,
+        __file__,
+        0,
+        "Hello %s",
+        ("world",),
+        None,
+        **kwargs
+    )
+    handler.handle(record)
+    return stream.getvalue()
+
+
+def test_key_value() -> None:
+    output = emit(default_keyvalues()["jsonlog"], extra={"user": "alice"})
+    assert output.startswith("timestamp='")
+    assert "level='WARNING' name='jsonlog_cli.tests.handler'" in output
+    assert "message='Hello world' user='alice'\n" in output
+
+
+def test_template() -> None:
+    pattern = default_templates()["default"].replace(
+        format=Template.of("{level} {message}")
+    )
+    assert emit(pattern) == "WARNING Hello world\n"
+
+
+def test_line() -> None:
+    line = emit(default_templates()["default"], extra={"count": 2})
+    assert json.loads(line)["count"] == 2
+
+
+def test_line_encodes_lazily() -> None:
+    record = PayloadRecord({"a": object()})
+    assert record.extract("a") is record.data["a"]
+    assert json.loads(record.line)["a"].startswith("<object")
+
+
+def test_from_config(tmp_path: pathlib.Path) -> None:
+    config_path = str(tmp_path / "config.json")
+    handler = PatternHandler.from_config("jsonlog", config_path=config_path)
+    assert handler.pattern == default_keyvalues()["jsonlog"]
+
+    handler = PatternHandler.from_config("default", True, config_path=config_path)
+    assert handler.pattern == default_templates()["default"]
+
+    with pytest.raises(KeyError):
+        PatternHandler.from_config("missing", config_path=config_path)
@@ -0,0 +1,107 @@
+import json
+import pathlib
+import typing
+
+import pytest
+
+import jsonlog_cli.index
+from jsonlog_cli.filter import Filter
+from jsonlog_cli.index import Index, seek
+from jsonlog_cli.inputs import open_streams
+from jsonlog_cli.timestamp import TimestampParser
+
+
+def write_records(path: pathlib.Path, start: int, stop: int, mode: str = "w") -> None:
+    with path.open(mode) as f:
+        for i in range(start, stop):
+            record = {"timestamp": 1577836800 + i, "level": "info", "n": i}
+            if i % 10 == 5:
+                record.update(level="error", traceback="...")
+            f.write(json.dumps(record) + "\n")
+
+
+def where(expressions: typing.Sequence[str] = (), **kwargs: typing.Any) -> Filter:
+    where = Filter.parse(expressions, timestamps=TimestampParser("timestamp"), **kwargs)
+    assert where is not None
+    return where
+
+
+def read(path: pathlib.Path, where: Filter) -> typing.List[int]:
+    numbers = []
+    for stream in open_streams([str(path)], seek=lambda p, f: seek(where, p, f)):
+        for line in stream:
+            numbers.append(json.loads(line)["n"])
+    return numbers
+
+
+@pytest.fixture(autouse=True)
+def small_blocks(monkeypatch) -> None:
+    monkeypatch.setattr(jsonlog_cli.index, "BLOCK_SIZE", 500)
+
+
+def test_index_skips_blocks(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "app.log"
+    write_records(path, 0, 100)
+    index = Index.update(str(path))
+    assert len(index.blocks) > 10
+    assert Index.load(str(path)).blocks == index.blocks  # type: ignore
+
+    numbers = read(path, where(since=1577836800 + 50, until=1577836800 + 60))
+    assert set(range(50, 60)) <= set(numbers)
+    assert len(numbers) < 30
+
+    assert set(read(path, where(level=40))) >= {5, 15, 95}
+    assert read(path, where(["exists(missing)"])) == []
+    assert set(read(path, where(["exists(traceback)"]))) >= set(range(5, 100, 10))
+
+
+def test_index_is_updated_incrementally(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "app.log"
+    write_records(path, 0, 50)
+    blocks = Index.update(str(path)).blocks
+
+    # Data written after the index was updated is always read.
+    write_records(path, 50, 100, mode="a")
+    assert set(read(path, where(since=1577836800 + 90))) >= set(range(90, 100))
+
+    updated = Index.update(str(path)).blocks
+    assert updated[: len(blocks) - 1] == blocks[:-1]
+    assert updated[-1].end == path.stat().st_size
+
+
+def test_index_is_ignored_if_file_is_replaced(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "app.log"
+    write_records(path, 0, 100)
+    Index.update(str(path))
+
+    write_records(path, 1000, 1100)
+    assert read(path, where(since=1577836800 + 1050)) == list(range(1000, 1100))
+
+
+@pytest.mark.parametrize(
+    "expression", ["exists(cluster.name)", "exists(name)", "exists(hostname)"]
+)
+def test_index_matches_full_scan(tmp_path: pathlib.Path, expression: str) -> None:
+    path = tmp_path / "app.log"
+    with path.open("w") as f:
+        for i in range(100):
+            record: typing.Dict[str, typing.Any] = {"timestamp": 1577836800 + i, "n": i}
+            if i % 20 == 3:
+                record["cluster.name"] = "a"
+            if i % 20 == 7:
+                record["cluster"] = {"name": "b"}
+            if i % 20 == 11:
+                record["hostname"] = "c"
+            f.write(json.dumps(record) + "\n")
+
+    def matching() -> typing.List[int]:
+        selected = where([expression])
+        lines: typing.List[str] = []
+        for stream in open_streams([str(path)], seek=lambda p, f: seek(selected, p, f)):
+            lines.extend(line for line in stream if selected.match_line(line))
+        return [json.loads(line)["n"] for line in lines]
+
+    unindexed = matching()
+    assert unindexed
+    Index.update(str(path))
+    assert matching() == unindexed
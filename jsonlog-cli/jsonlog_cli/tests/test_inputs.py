@@ -0,0 +1,66 @@
+import bz2
+import gzip
+import lzma
+import pathlib
+import typing
+
+import pytest
+
+import jsonlog_cli.inputs
+from jsonlog_cli.inputs import DecompressedStream, LineSplitter, open_all, open_streams
+
+LINES = ['{"message": "Hello World %d"}\n' % i for i in range(1000)]
+
+
+def test_line_splitter() -> None:
+    splitter = LineSplitter()
+    assert splitter.split(b'{"a": 1}\n{"b"') == ['{"a": 1}\n']
+    assert splitter.split(b": 2}\n\xc3") == ['{"b": 2}\n']
+    assert splitter.split(b"\xa9\n") == ["é\n"]
+    assert splitter.split(b"partial") == []
+    assert splitter.reset() == ["partial\n"]
+
+
+@pytest.mark.parametrize(
+    "compress",
+    [lambda data: data, gzip.compress, bz2.compress, lzma.compress],
+    ids=["plain", "gzip", "bz2", "xz"],
+)
+def test_open_streams(
+    tmp_path: pathlib.Path, compress: typing.Callable[[bytes], bytes]
+) -> None:
+    # The file name doesn't matter, as compression is detected from the content.
+    path = tmp_path / "app.log"
+    path.write_bytes(compress("".join(LINES).encode("utf-8")))
+
+    for stream in open_streams([str(path)]):
+        assert list(stream) == LINES
+
+
+def test_open_all_seek(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "app.log"
+    path.write_bytes("".join(LINES).encode("utf-8"))
+    start = len("".join(LINES[:10]))
+    end = len("".join(LINES[:20]))
+
+    with open_all([str(path), str(path)], seek=lambda p, f: [(start, end)]) as streams:
+        assert [list(stream) for stream in streams] == [LINES[10:20], LINES[10:20]]
+
+
+def test_decompression_stops_when_closed(tmp_path: pathlib.Path, monkeypatch) -> None:
+    monkeypatch.setattr(jsonlog_cli.inputs, "CHUNK_SIZE", 64)
+    monkeypatch.setattr(jsonlog_cli.inputs, "QUEUE_SIZE", 1)
+    monkeypatch.setattr(jsonlog_cli.inputs, "STOP_INTERVAL", 0.01)
+    path = tmp_path / "app.log.gz"
+    path.write_bytes(gzip.compress("".join(LINES).encode("utf-8")))
+
+    streams = open_streams([str(path)])
+    stream = next(streams)
+    assert isinstance(stream, DecompressedStream)
+    lines = iter(stream)
+    assert next(lines) == LINES[0]
+    assert stream.thread.is_alive()
+
+    # The thread is blocked on a full queue until the file is closed.
+    streams.close()
+    assert not stream.thread.is_alive()
@@ -0,0 +1,33 @@
+import pytest
+
+from jsonlog_cli.keypath import KeyPath
+from jsonlog_cli.pattern import KeyValuePattern
+
+
+@pytest.mark.parametrize(
+    "key,data,expected",
+    [
+        ("message", {"message": "Hello"}, "Hello"),
+        ("missing", {"message": "Hello"}, None),
+        ("a.b.c", {"a": {"b": {"c": 3}}}, 3),
+        ("a.b.c", {"a": {"b.c": 2}, "a.b.c": 1}, 1),
+        ("a.b.c", {"a": {"b.c": 2, "b": {"c": 3}}}, 2),
+        ("cluster.name", {"cluster.name": "es", "cluster": {"name": "x"}}, "es"),
+        ("items.1", {"items": ["a", "b"]}, "b"),
+        ("items[-1].name", {"items": [{}, {"name": "z"}]}, "z"),
+        ("items[2]", {"items": ["a", "b"]}, None),
+        ("a.b", {"a": "not a mapping"}, None),
+    ],
+)
+def test_extract(key: str, data: dict, expected: object) -> None:
+    assert KeyPath(key).extract(data) == expected
+
+
+def test_keypath_is_cached() -> None:
+    assert KeyPath.of("a.b") is KeyPath.of("a.b")
+
+
+def test_patterns_compile_keys() -> None:
+    pattern = KeyValuePattern().replace(priority_keys=["a.b"], level_key="c.d")
+    assert isinstance(pattern.priority_keys[0], KeyPath)
+    assert isinstance(pattern.level_key, KeyPath)
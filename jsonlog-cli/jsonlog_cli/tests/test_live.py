@@ -0,0 +1,88 @@
+import asyncio
+import os
+import pathlib
+import threading
+
+import pytest
+
+from jsonlog_cli.live import BATCH_SIZE, QUEUE_SIZE, Address, LiveInputs
+from jsonlog_cli.pattern import TemplatePattern
+from jsonlog_cli.stream import StreamHandler
+from jsonlog_cli.template import Template
+
+
+@pytest.mark.parametrize(
+    "string,address",
+    [
+        ("5170", Address(host="127.0.0.1", port=5170)),
+        ("0.0.0.0:5170", Address(host="0.0.0.0", port=5170)),
+        ("[::1]:5170", Address(host="::1", port=5170)),
+        ("unix:jsonlog.sock", Address(path="jsonlog.sock")),
+        ("/run/jsonlog.sock", Address(path="/run/jsonlog.sock")),
+    ],
+)
+def test_address_parse(string: str, address: Address) -> None:
+    assert Address.parse(string) == address
+
+
+@pytest.mark.parametrize("string", ["", "localhost", "localhost:http", "70000"])
+def test_address_parse_invalid(string: str) -> None:
+    with pytest.raises(ValueError):
+        Address.parse(string)
+
+
+def test_live_reads_pipes_and_files(tmp_path: pathlib.Path, capsys) -> None:
+    pipe = tmp_path / "pipe"
+    os.mkfifo(pipe)
+    path = tmp_path / "app.log"
+    path.write_text('{"message": "file"}\n')
+
+    def write() -> None:
+        with pipe.open("w") as f:
+            f.write('{"message": "pipe"}\n{"message": ')
+            f.flush()
+            f.write('"partial"}')
+
+    thread = threading.Thread(target=write)
+    thread.start()
+    pattern = TemplatePattern(format=Template.of("{message}"))
+    handler = StreamHandler(pattern, color=False, prefix=True)
+    handler.live([str(pipe), str(path)])
+    thread.join()
+
+    assert sorted(capsys.readouterr().out.splitlines()) == [
+        f"{path} | file",
+        f"{pipe} | partial",
+        f"{pipe} | pipe",
+    ]
+
+
+def test_live_stops_when_output_fails(tmp_path: pathlib.Path, monkeypatch) -> None:
+    # Enough lines to fill the queue, so the reader blocks waiting for the writer.
+    path = tmp_path / "app.log"
+    path.write_text('{"message": "line"}\n' * (QUEUE_SIZE + 2) * BATCH_SIZE)
+
+    def write(self: StreamHandler, output: str, err: bool = False) -> None:
+        raise BrokenPipeError()
+
+    monkeypatch.setattr(StreamHandler, "write", write)
+    handler = StreamHandler(TemplatePattern(format=Template.of("{message}")))
+    with pytest.raises(BrokenPipeError):
+        handler.live([str(path), str(path)])
+
+
+def test_live_removes_socket(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "jsonlog.sock"
+    inputs = LiveInputs(StreamHandler(TemplatePattern()))
+
+    async def main() -> None:
+        task = asyncio.ensure_future(inputs.main([], [Address(path=str(path))]))
+        while not path.exists():
+            await asyncio.sleep(0.01)
+        # The socket being removed by something else shouldn't hide why we stopped.
+        path.unlink()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.new_event_loop().run_until_complete(main())
@@ -0,0 +1,44 @@
+import typing
+
+from jsonlog_cli.merge import merge
+from jsonlog_cli.record import Record
+from jsonlog_cli.timestamp import TimestampParser
+
+
+def pairs(
+    *timestamps: typing.Optional[int],
+) -> typing.List[typing.Tuple[str, typing.Optional[Record]]]:
+    """Create (line, record) pairs, using None for a line that isn't JSON."""
+    return [
+        (str(t), None if t is None else Record(line=str(t), data={"timestamp": t}))
+        for t in timestamps
+    ]
+
+
+def merged(*streams, slop: float = 0.0) -> typing.List[str]:
+    parsers = [TimestampParser("timestamp") for _ in streams]
+    return [line for line, _ in merge(streams, parsers, slop=slop)]
+
+
+def test_merge() -> None:
+    assert merged(pairs(1, 4, 5), pairs(2, 3, 6)) == ["1", "2", "3", "4", "5", "6"]
+
+
+def test_merge_is_lazy() -> None:
+    def endless() -> typing.Iterator[typing.Tuple[str, typing.Optional[Record]]]:
+        t = 0
+        while True:
+            yield from pairs(t)
+            t += 2
+
+    stream = merge([endless(), iter(pairs(1, 3))], [TimestampParser("timestamp")] * 2)
+    assert [next(stream)[0] for _ in range(4)] == ["0", "1", "2", "3"]
+
+
+def test_lines_without_timestamps_stay_with_the_previous_record() -> None:
+    assert merged(pairs(1, None, 3), pairs(2)) == ["1", "None", "2", "3"]
+
+
+def test_slop() -> None:
+    assert merged(pairs(1, 5, 3, 7), pairs(4)) == ["1", "4", "5", "3", "7"]
+    assert merged(pairs(1, 5, 3, 7), pairs(4), slop=2) == ["1", "3", "4", "5", "7"]
@@ -0,0 +1,83 @@
+import io
+import pathlib
+import pstats
+import typing
+
+import click.testing
+import pytest
+
+import jsonlog_cli.cli
+import jsonlog_cli.config
+import jsonlog_cli.stream
+from jsonlog_cli.pattern import KeyValuePattern
+from jsonlog_cli.profile import Profiler
+from jsonlog_cli.stream import JSONStream, StreamHandler
+
+LINES = ['{"message": "one"}\n', '{"message": "two"}\n', "not json\n"]
+
+
+def consume() -> None:
+    with StreamHandler(KeyValuePattern(), color=False) as handler:
+        handler.consume([iter(LINES)])
+
+
+def test_profile_stages(capsys) -> None:
+    profiler = Profiler()
+    profiler.start()
+    consume()
+    profiler.stop()
+
+    stages = profiler.stages
+    # Lines that can't be objects aren't decoded.
+    assert stages["decode"].calls == 2
+    assert stages["format"].calls == 2
+    assert stages["write"].calls == 3
+    assert all(stage.seconds >= 0 for stage in stages.values())
+
+    summary = capsys.readouterr().err
+    assert "decode      2" in summary
+    assert summary.splitlines()[-1].startswith("total")
+
+
+def test_profile_restores_originals() -> None:
+    loads, write = JSONStream.__dict__["loads"], StreamHandler.write
+    profiler = Profiler()
+    profiler.start()
+    assert StreamHandler.write is not write
+    profiler.stop()
+
+    assert JSONStream.__dict__["loads"] is loads
+    assert isinstance(JSONStream.__dict__["loads"], staticmethod)
+    assert StreamHandler.write is write
+    assert jsonlog_cli.stream.StreamHandler.copy_stream.__name__ == "copy_stream"
+
+
+def test_profile_output(tmp_path: pathlib.Path, capsys) -> None:
+    path = tmp_path / "jsonlog.prof"
+    profiler = Profiler(output=str(path))
+    profiler.start()
+    consume()
+    profiler.stop()
+
+    output = io.StringIO()
+    pstats.Stats(str(path), stream=output).print_stats()
+    assert "(consume)" in output.getvalue()
+
+
+@pytest.mark.parametrize("args", [[], ["--profile"]])
+def test_profile_cli(
+    tmp_path: pathlib.Path, monkeypatch, args: typing.List[str]
+) -> None:
+    # Don't add handlers to the root logger, or write to the user's cache.
+    monkeypatch.setattr(jsonlog_cli.config, "configure_logging", lambda *args: None)
+    cache_path = tmp_path / "config.pickle"
+    monkeypatch.setattr(jsonlog_cli.cli, "DEFAULT_CONFIG_CACHE_PATH", cache_path)
+    path = tmp_path / "example.log"
+    path.write_text("".join(LINES))
+    result = click.testing.CliRunner(mix_stderr=False).invoke(
+        jsonlog_cli.cli.main, [*args, "raw", str(path)],
+    )
+    assert result.exit_code == 0, result.output
+    output = [line for line in result.stdout.splitlines() if line]
+    assert output == [LINES[0].strip(), LINES[1].strip()]
+    assert ("stage" in result.stderr) == bool(args)
@@ -45,6 +45,12 @@ class Example(pydantic.BaseModel):
                 multiline_keys=["nested.multiline"],
             ),
         ),
+        # Test attribute and index access into nested values.
+        Example(
+            line='{"items": [{"name": "first"}], "nested": {"a": {"b": 1}}}',
+            expected="first {'b': 1}",
+            pattern=TemplatePattern(format="{items[0].name} {nested.a}"),
+        ),
         # Test nested data renders nicely.
         Example(
             line='{"nested": {"a": 1, "b": "Z", "c": []}}',
@@ -0,0 +1,81 @@
+import collections
+import json
+import random
+import typing
+
+import pytest
+
+from jsonlog_cli.pattern import TemplatePattern
+from jsonlog_cli.record import Record
+from jsonlog_cli.sample import Bernoulli, Reservoir
+from jsonlog_cli.stream import SourcedPair, StreamHandler
+from jsonlog_cli.template import Template
+
+
+@pytest.mark.parametrize("rate", [0.0, 0.01, 0.5, 1.0])
+def test_bernoulli(rate: float) -> None:
+    sampler = Bernoulli(rate, rng=random.Random(1))
+    kept = sum(sampler.keep("line") for _ in range(100_000))
+    assert kept == pytest.approx(100_000 * rate, rel=0.1)
+
+
+def test_bernoulli_prefilter() -> None:
+    sampler = Bernoulli(1.0)
+    prefilter = sampler.prefilter(lambda line: "error" in line)
+    assert [prefilter(line) for line in ("info", "error")] == [False, True]
+
+
+def test_reservoir_small() -> None:
+    reservoir: Reservoir[int] = Reservoir(5)
+    for n in range(3):
+        reservoir.add(n)
+    assert reservoir.items() == [0, 1, 2]
+
+
+def test_reservoir_uniform() -> None:
+    rng = random.Random(2)
+    counts: typing.Counter[int] = collections.Counter()
+    for _ in range(2000):
+        reservoir: Reservoir[int] = Reservoir(5, rng=rng)
+        for n in range(50):
+            reservoir.add(n)
+        items = reservoir.items()
+        assert items == sorted(set(items)) and len(items) == 5
+        counts.update(items)
+
+    # Each item is kept in 1 in 10 reservoirs, so about 200 times.
+    assert min(counts.values()) > 140
+    assert max(counts.values()) < 260
+
+
+def test_reservoir_prefilter() -> None:
+    rng = random.Random(3)
+    reservoir: Reservoir[int] = Reservoir(3, rng=rng)
+    prefilter = reservoir.prefilter()
+    for n in range(1000):
+        if prefilter(str(n)):
+            reservoir.add(n)
+    assert len(reservoir.items()) == 3
+
+
+def test_reservoir_stratified() -> None:
+    reservoir: Reservoir[str] = Reservoir(2, key="level", rng=random.Random(4))
+    for n in range(100):
+        level = "error" if n % 10 == 0 else "info"
+        record = Record(line="", data={"level": level})
+        reservoir.add(f"{level}-{n}", reservoir.stratum(record))
+
+    levels = [item.split("-")[0] for item in reservoir.items()]
+    assert sorted(levels) == ["error", "error", "info", "info"]
+
+
+def test_reservoir_handler(capsys) -> None:
+    lines = [json.dumps({"message": f"m{n}"}) + "\n" for n in range(100)]
+    lines.append('{"message": broken}\n')
+    pattern = TemplatePattern(format=Template.of("{message}"))
+    reservoir: Reservoir[SourcedPair] = Reservoir(200, rng=random.Random(5))
+    with StreamHandler(pattern, color=False, reservoir=reservoir) as handler:
+        handler.consume([iter(lines)])
+
+    output = [line for line in capsys.readouterr().out.splitlines() if line]
+    assert output == [f"m{n}" for n in range(100)]
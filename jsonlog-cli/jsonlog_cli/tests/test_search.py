@@ -0,0 +1,57 @@
+import json
+import pathlib
+import typing
+
+import pytest
+
+import jsonlog_cli.search
+from jsonlog_cli.filter import Filter
+from jsonlog_cli.search import search
+from jsonlog_cli.timestamp import TimestampParser
+
+
+@pytest.fixture(autouse=True)
+def small_scans(monkeypatch) -> None:
+    monkeypatch.setattr(jsonlog_cli.search, "SCAN_SIZE", 100)
+
+
+def lines_in_range(
+    path: pathlib.Path, since: typing.Optional[int], until: typing.Optional[int]
+) -> typing.Optional[typing.List[str]]:
+    where = Filter.parse(
+        [], since=since, until=until, timestamps=TimestampParser("timestamp")
+    )
+    assert where is not None
+    with path.open("rb") as file:
+        ranges = search(where, str(path), file)
+    if ranges is None:
+        return None
+    data = path.read_bytes()
+    return [line for s, e in ranges for line in data[s:e].decode().splitlines()]
+
+
+def test_search(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "app.log"
+    lines = [json.dumps({"timestamp": t, "n": t}) for t in range(0, 2000, 2)]
+    lines.insert(500, "not json")
+    path.write_text("\n".join(lines) + "\n")
+
+    selected = lines_in_range(path, 1000, 1010)
+    assert selected is not None
+    assert [json.loads(line)["n"] for line in selected] == [
+        1000,
+        1002,
+        1004,
+        1006,
+        1008,
+    ]
+
+    assert lines_in_range(path, 1999, None) == []
+    assert lines_in_range(path, None, 4) == lines[:2]
+    assert lines_in_range(path, -10, 1) == lines[:1]
+
+
+def test_search_unsorted(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "app.log"
+    path.write_text('{"timestamp": 2}\n{"timestamp": 1}\n')
+    assert lines_in_range(path, 1, 2) is None
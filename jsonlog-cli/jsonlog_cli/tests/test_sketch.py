@@ -0,0 +1,60 @@
+import collections
+import random
+
+import pytest
+
+from jsonlog_cli.sketch import (
+    ExactCardinality,
+    ExactFrequencies,
+    HyperLogLog,
+    SpaceSaving,
+)
+
+
+def zipf(n: int, seed: int = 0) -> list:
+    """Values where a few are very common and most are rare."""
+    rng = random.Random(seed)
+    return [int(rng.paretovariate(1.0)) for _ in range(n)]
+
+
+def test_space_saving_finds_heavy_hitters() -> None:
+    values = zipf(100_000)
+    sketch = SpaceSaving(capacity=50)
+    for value in values:
+        sketch.add(value)
+
+    exact = collections.Counter(values)
+    for value, count, error in sketch.top(10):
+        # Counts are never underestimated, and are overestimated by at most `error`.
+        assert count - error <= exact[value] <= count
+    assert [v for v, _, _ in sketch.top(5)] == [v for v, _ in exact.most_common(5)]
+
+
+def test_space_saving_is_bounded() -> None:
+    sketch = SpaceSaving(capacity=10)
+    for value in range(1000):
+        sketch.add(value)
+    assert len(sketch.counts) <= 20
+
+
+def test_exact_frequencies() -> None:
+    frequencies = ExactFrequencies()
+    for value in "abacab":
+        frequencies.add(value)
+    assert frequencies.top(2) == [("a", 3, 0), ("b", 2, 0)]
+
+
+@pytest.mark.parametrize("n", [0, 10, 1000, 100_000])
+def test_hyperloglog(n: int) -> None:
+    sketch = HyperLogLog()
+    for value in range(n):
+        sketch.add(value)
+        sketch.add(str(value))
+    assert sketch.count() == pytest.approx(2 * n, rel=0.03)
+
+
+def test_exact_cardinality() -> None:
+    cardinality = ExactCardinality()
+    for value in [1, 2, 2, "2", None]:
+        cardinality.add(value)
+    assert cardinality.count() == 4
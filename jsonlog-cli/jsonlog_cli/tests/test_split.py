@@ -0,0 +1,99 @@
+import gzip
+import json
+import pathlib
+import typing
+
+import pytest
+
+from jsonlog_cli.filter import Filter
+from jsonlog_cli.split import FilePool, Splitter, filename
+from jsonlog_cli.stream import JSONStream
+
+RECORDS = [
+    {"service": "api", "message": "one"},
+    {"service": "db", "message": "two"},
+    {"service": "web", "message": "three"},
+    {"service": "api", "message": "four"},
+    {"message": "five"},
+    {"service": "../etc", "message": "six"},
+]
+LINES = [json.dumps(record) + "\n" for record in RECORDS] + ["not json\n"]
+
+
+def split(tmp_path: pathlib.Path, **kwargs: typing.Any) -> Splitter:
+    where = kwargs.pop("where", None)
+    render = kwargs.pop("render", None)
+    with Splitter("service", str(tmp_path / "{value}.log"), **kwargs) as splitter:
+        assert splitter.split(JSONStream(iter(LINES)), render, where) > 0
+    return splitter
+
+
+def messages(path: pathlib.Path) -> typing.List[str]:
+    return [json.loads(line)["message"] for line in path.read_text().splitlines()]
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("api", "api"),
+        (None, "none"),
+        ("", "none"),
+        ("a/b c", "a_b_c"),
+        ("..", "_"),
+        (404, "404"),
+        (True, "true"),
+    ],
+)
+def test_filename(value: typing.Any, expected: str) -> None:
+    assert filename(value) == expected
+
+
+@pytest.mark.parametrize("buffer_size", [1, 1024])
+def test_split(tmp_path: pathlib.Path, buffer_size: int) -> None:
+    split(tmp_path, max_open=2, buffer_size=buffer_size)
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        ".._etc.log",
+        "api.log",
+        "db.log",
+        "none.log",
+        "web.log",
+    ]
+    assert messages(tmp_path / "api.log") == ["one", "four"]
+    assert messages(tmp_path / "none.log") == ["five"]
+
+
+def test_split_truncates(tmp_path: pathlib.Path) -> None:
+    (tmp_path / "api.log").write_text("old\n")
+    split(tmp_path, buffer_size=1)
+    assert messages(tmp_path / "api.log") == ["one", "four"]
+
+
+def test_split_render_and_where(tmp_path: pathlib.Path) -> None:
+    split(
+        tmp_path,
+        render=lambda record: record["message"].upper(),
+        where=Filter.parse(["message!='one'"]),
+    )
+    assert (tmp_path / "api.log").read_text() == "FOUR\n"
+    assert (tmp_path / "none.log").read_text() == "FIVE\n"
+
+
+def test_split_compressed(tmp_path: pathlib.Path) -> None:
+    split(tmp_path, compression="gzip", max_open=1, buffer_size=1)
+    with gzip.open(tmp_path / "api.log", "rt") as file:
+        assert [json.loads(line)["message"] for line in file] == ["one", "four"]
+
+
+def test_pool_evicts(tmp_path: pathlib.Path) -> None:
+    pool = FilePool(max_open=2)
+    for name in ["a", "b", "a", "c"]:
+        pool.get(str(tmp_path / name)).write(name)
+    assert list(pool.files) == [str(tmp_path / "a"), str(tmp_path / "c")]
+    pool.close()
+    assert (tmp_path / "b").read_text() == "b"
+    assert (tmp_path / "a").read_text() == "aa"
+
+
+def test_output_needs_placeholder() -> None:
+    with pytest.raises(ValueError):
+        Splitter("service", "out.log")
@@ -0,0 +1,34 @@
+import subprocess
+import sys
+
+# Modules that are slow to import and only needed by some options or commands.
+LAZY_MODULES = (
+    "asyncio",
+    "bz2",
+    "ctypes",
+    "hashlib",
+    "lzma",
+    "jsonlog_cli.collapse",
+    "jsonlog_cli.database",
+    "jsonlog_cli.export",
+    "jsonlog_cli.filter",
+    "jsonlog_cli.follow",
+    "jsonlog_cli.index",
+    "jsonlog_cli.live",
+    "jsonlog_cli.sample",
+    "jsonlog_cli.search",
+    "jsonlog_cli.split",
+    "jsonlog_cli.stats",
+)
+
+
+def run(code: str) -> str:
+    result = subprocess.run(
+        [sys.executable, "-c", code], check=True, stdout=subprocess.PIPE
+    )
+    return result.stdout.decode("utf-8")
+
+
+def test_lazy_imports() -> None:
+    imported = run("import sys, jsonlog_cli.cli; print(*sorted(sys.modules))")
+    assert set(LAZY_MODULES).isdisjoint(imported.split())
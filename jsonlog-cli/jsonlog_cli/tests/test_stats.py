@@ -0,0 +1,95 @@
+import json
+import pathlib
+import typing
+
+import click.testing
+
+import jsonlog_cli.cli
+import jsonlog_cli.config
+from jsonlog_cli.filter import Filter
+from jsonlog_cli.stats import Stats, format_summary
+from jsonlog_cli.stream import JSONStream
+from jsonlog_cli.timestamp import TimestampParser
+
+LINES = [
+    '{"timestamp": "2020-01-01T00:00:10Z", "level": "info", "user": "a"}\n',
+    '{"timestamp": "2020-01-01T00:00:20Z", "level": "error", "user": "b"}\n',
+    '{"timestamp": "2020-01-01T00:01:10Z", "level": "info", "user": "a"}\n',
+    '{"timestamp": "2020-01-01T00:02:10Z", "level": "info", "user": {"id": 1}}\n',
+    "not json\n",
+]
+
+
+def summarise(
+    lines: typing.Sequence[str], exact: bool, **kwargs: typing.Any
+) -> typing.Dict[str, typing.Any]:
+    where = kwargs.pop("where", None)
+    stats = Stats(exact=exact, **kwargs)
+    stats.consume(JSONStream(lines), where)
+    summary = stats.summary()
+    # Summaries are output as JSON.
+    return json.loads(json.dumps(summary))
+
+
+def test_stats() -> None:
+    for exact in (True, False):
+        summary = summarise(
+            LINES,
+            exact=exact,
+            group_by=["level"],
+            top=["user"],
+            unique=["user"],
+            timestamps=TimestampParser("timestamp"),
+            interval=60,
+        )
+        assert summary["records"] == 4
+        assert summary["invalid"] == 1
+        assert summary["groups"]["counts"] == [
+            {"values": ["info"], "count": 3, "error": 0},
+            {"values": ["error"], "count": 1, "error": 0},
+        ]
+        assert summary["top"]["user"][0] == {"value": "a", "count": 2, "error": 0}
+        assert summary["unique"]["user"] == {"count": 3, "exact": exact}
+        assert summary["histogram"]["counts"] == [
+            {"time": "2020-01-01T00:00:00Z", "count": 2},
+            {"time": "2020-01-01T00:01:00Z", "count": 1},
+            {"time": "2020-01-01T00:02:00Z", "count": 1},
+        ]
+
+
+def test_stats_filtered() -> None:
+    where = Filter.parse(["level==info"])
+    summary = summarise(LINES, exact=True, group_by=["user"], where=where)
+    assert summary["records"] == 3
+    assert summary["invalid"] == 0
+    assert summary["groups"]["counts"][0] == {"values": ["a"], "count": 2, "error": 0}
+
+
+def test_format_summary() -> None:
+    summary = summarise(LINES, exact=False, group_by=["level"], unique=["user"])
+    assert format_summary(summary).splitlines() == [
+        "4 records (1 lines weren't JSON)",
+        "",
+        "level  count",
+        "info       3",
+        "error      1",
+        "",
+        "key   unique values",
+        "user             ~3",
+    ]
+
+
+def test_stats_cli_multiline_json(tmp_path: pathlib.Path, monkeypatch) -> None:
+    monkeypatch.setattr(jsonlog_cli.config, "configure_logging", lambda *args: None)
+    cache_path = tmp_path / "config.pickle"
+    monkeypatch.setattr(jsonlog_cli.cli, "DEFAULT_CONFIG_CACHE_PATH", cache_path)
+    path = tmp_path / "elasticsearch.log"
+    records = [json.loads(line) for line in LINES[:4]]
+    path.write_text("".join(json.dumps(record, indent=2) + "\n" for record in records))
+
+    result = click.testing.CliRunner(mix_stderr=False).invoke(
+        jsonlog_cli.cli.main, ["stats", "--json", "-p", "elasticsearch", str(path)],
+    )
+    assert result.exit_code == 0, result.stderr
+    summary = json.loads(result.stdout)
+    assert (summary["records"], summary["invalid"]) == (4, 0)
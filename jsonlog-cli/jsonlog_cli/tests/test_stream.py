@@ -0,0 +1,70 @@
+import typing
+
+import pytest
+
+from jsonlog_cli.pattern import RawPattern
+from jsonlog_cli.stream import StreamHandler
+
+LINES = [
+    '{"b": 1,  "a": "é"}\n',
+    "{\n",
+    '  "multi": [1,\n',
+    "  2]\n",
+    "}\n",
+    "not json\n",
+    '{"message": "}"}\n',
+]
+
+
+def raw(capsys, lines: typing.List[str], **options: typing.Any) -> typing.List[str]:
+    pattern = RawPattern(multiline_json=True, **options)
+    with StreamHandler(pattern, color=False) as handler:
+        handler.consume([iter(lines)])
+    return capsys.readouterr().out.splitlines()
+
+
+def test_raw_passthrough(capsys) -> None:
+    assert raw(capsys, LINES) == [
+        '{"b": 1,  "a": "é"}',
+        '{"multi": [1, 2]}',
+        "",
+        "",
+        '{"message": "}"}',
+    ]
+
+
+@pytest.mark.parametrize(
+    "options, expected",
+    [
+        ({"compact": True}, ['{"b":1,"a":"\\u00e9"}', '{"multi":[1,2]}']),
+        ({"sort_keys": True}, ['{"a": "\\u00e9", "b": 1}', '{"multi": [1, 2]}']),
+    ],
+)
+def test_raw_reencoded(
+    capsys, options: typing.Dict[str, bool], expected: typing.List[str]
+) -> None:
+    assert raw(capsys, LINES[:5], **options) == expected
+
+
+def test_raw_passthrough_is_unchanged(capsys) -> None:
+    lines = ['  {"a": 1}\r\n', '{"b": 2}']
+    with StreamHandler(RawPattern(), color=False) as handler:
+        handler.consume([iter(lines)])
+    assert capsys.readouterr().out == '  {"a": 1}\r\n{"b": 2}\n'
+
+
+def test_buffered_json_values(capsys) -> None:
+    """Lines that are JSON values but not objects don't end a multiline record."""
+    lines = ["{\n", '  "stacktrace": [\n', '    "ValueError"\n', "  ]\n", "}\n"]
+    assert raw(capsys, lines) == ['{"stacktrace": ["ValueError"]}']
+
+
+def test_raw_invalid_lines(capsys) -> None:
+    """Lines that only look like objects are reported, not copied to the output."""
+    lines = ['{"a": 1}\n', "{not json}\n", '{"a": }\n', '{"a":1} x {"b":2}\n']
+    with StreamHandler(RawPattern(multiline_json=True), color=False) as handler:
+        handler.consume([iter(lines)])
+    captured = capsys.readouterr()
+    assert [line for line in captured.out.splitlines() if line] == ['{"a": 1}']
+    assert "{not json}" in captured.err
+    assert handler.bad_lines.total == 3
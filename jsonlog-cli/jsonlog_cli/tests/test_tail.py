@@ -0,0 +1,82 @@
+import gzip
+import io
+import json
+import pathlib
+import typing
+
+import pytest
+
+import jsonlog_cli.tail
+from jsonlog_cli.filter import Filter
+from jsonlog_cli.pattern import TemplatePattern
+from jsonlog_cli.stream import StreamHandler
+from jsonlog_cli.tail import Tail, reversed_lines
+from jsonlog_cli.template import Template
+
+
+@pytest.fixture(autouse=True)
+def small_blocks(monkeypatch) -> None:
+    monkeypatch.setattr(jsonlog_cli.tail, "BLOCK_SIZE", 7)
+
+
+def lines(n: int) -> typing.List[str]:
+    return [
+        json.dumps({"message": str(i), "even": i % 2 == 0}) + "\n" for i in range(n)
+    ]
+
+
+def tail(
+    tmp_path: pathlib.Path,
+    capsys,
+    content: bytes,
+    count: int,
+    where: typing.Sequence[str] = (),
+    multiline: bool = False,
+) -> typing.List[str]:
+    path = tmp_path / "app.log"
+    path.write_bytes(content)
+    pattern = TemplatePattern(format=Template.of("{message}"), multiline_json=multiline)
+    handler = StreamHandler(pattern, where=Filter.parse(where), color=False)
+    Tail(handler, count).consume([str(path)])
+    return capsys.readouterr().out.splitlines()
+
+
+@pytest.mark.parametrize(
+    "content",
+    [b"", b"\n", b"a", b"a\n", b"a\n\nbc", b"a\nbcdefghijklmno\n", b"\xc3\xa9\nb\n"],
+)
+def test_reversed_lines(content: bytes) -> None:
+    text = content.decode("utf-8")
+    expected = []
+    offset = 0
+    for line in text.splitlines(keepends=True):
+        expected.append((offset, line if line.endswith("\n") else line + "\n"))
+        offset += len(line.encode("utf-8"))
+
+    result = reversed_lines(io.BytesIO(content), len(content))
+    assert list(result) == list(reversed(expected))
+
+
+def test_tail(tmp_path: pathlib.Path, capsys) -> None:
+    content = "".join(lines(100)).encode("utf-8")
+    assert tail(tmp_path, capsys, content, 3) == ["97", "98", "99"]
+    assert tail(tmp_path, capsys, content, 0) == []
+    assert tail(tmp_path, capsys, content, 1000) == [str(i) for i in range(100)]
+
+
+def test_tail_filtered(tmp_path: pathlib.Path, capsys) -> None:
+    content = "".join(lines(100)).encode("utf-8")
+    assert tail(tmp_path, capsys, content, 2, where=["even==true"]) == ["96", "98"]
+    assert tail(tmp_path, capsys, content, 2, where=["missing==1"]) == []
+
+
+def test_tail_multiline(tmp_path: pathlib.Path, capsys) -> None:
+    records = [json.dumps({"message": str(i)}, indent=2) + "\n" for i in range(10)]
+    content = "".join(records).encode("utf-8")
+    assert tail(tmp_path, capsys, content, 2, multiline=True) == ["8", "9"]
+    assert tail(tmp_path, capsys, content, 2, ["message==3"], multiline=True) == ["3"]
+
+
+def test_tail_compressed(tmp_path: pathlib.Path, capsys) -> None:
+    content = gzip.compress("".join(lines(100)).encode("utf-8"))
+    assert tail(tmp_path, capsys, content, 2) == ["98", "99"]
@@ -0,0 +1,65 @@
+import pydantic
+import pytest
+
+from jsonlog_cli.colours import Colour
+from jsonlog_cli.pattern import TemplatePattern
+from jsonlog_cli.record import Record, RecordDict
+from jsonlog_cli.template import Template, TemplateError
+
+DATA: RecordDict = {
+    "message": "Hello",
+    "status": 200,
+    "http": {"method": "GET", "path": "/"},
+    "items": [{"name": "first"}],
+    "none": None,
+}
+
+
+@pytest.mark.parametrize(
+    "format_string,expected",
+    [
+        ("{message}", "Hello"),
+        ("{message} {status}", "Hello 200"),
+        ("{{literal}} {message}", "{literal} Hello"),
+        ("{http.method} {http.path}", "GET /"),
+        ("{items[0].name}", "first"),
+        ("{status:>5} {message!r}", "  200 'Hello'"),
+        ("{missing} {message}", "- Hello"),
+        ("{none}", "-"),
+        ("{missing|n/a} {http.missing|?}", "n/a ?"),
+        ("{missing|}", ""),
+        ("{missing:>3}|{missing!r:d}", "  -|-"),
+        # Specs that don't suit a value are ignored rather than raising errors.
+        ("{message:d} {status:d}", "Hello 200"),
+    ],
+)
+def test_render(format_string: str, expected: str) -> None:
+    template = Template(format_string)
+    record = Record(line="", data=DATA)
+    assert template.render(record) == expected
+
+
+def test_render_colours() -> None:
+    record = Record(line="", data=DATA)
+    template = Template("{status:@bold+red} {message}")
+    assert template.fields[0].colour == Colour(fg="red", bold=True)
+    assert template.render(record, Colour(fg="cyan")) == (
+        "\x1b[31m\x1b[1m200\x1b[0m\x1b[36m Hello\x1b[0m"
+    )
+    assert Template("{message:>6@bold}").render(record) == "\x1b[1m Hello\x1b[0m"
+
+
+@pytest.mark.parametrize(
+    "format_string", ["{", "{}", "{message!x}", "{message:{width}}", "{a:@nocolour}"]
+)
+def test_invalid(format_string: str) -> None:
+    with pytest.raises(TemplateError):
+        Template(format_string)
+    with pytest.raises(pydantic.ValidationError):
+        TemplatePattern.parse_obj({"format": format_string})
+
+
+def test_template_is_cached() -> None:
+    pattern = TemplatePattern.parse_obj({"format": "{message}"})
+    assert pattern.format is Template.of("{message}")
+    assert pattern.replace(multiline_json=True).format is pattern.format
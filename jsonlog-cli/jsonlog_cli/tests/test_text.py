@@ -0,0 +1,74 @@
+import json
+import signal
+import typing
+
+import click
+import pytest
+
+import jsonlog_cli.text
+from jsonlog_cli.pattern import Pattern, indent_json
+from jsonlog_cli.text import (
+    render_block,
+    reset_terminal_width,
+    watch_terminal_size,
+    wrap_and_style_lines,
+)
+
+
+@pytest.fixture(autouse=True)
+def terminal_width(monkeypatch) -> typing.Iterator[None]:
+    monkeypatch.setattr(click, "get_terminal_size", lambda: (28, 24))
+    monkeypatch.setattr(jsonlog_cli.text, "_watching", False)
+    reset_terminal_width()
+    yield
+    reset_terminal_width()
+
+
+@pytest.fixture()
+def sigwinch() -> typing.Iterator[signal.Signals]:
+    """Restore the SIGWINCH handler after a test installs one."""
+    previous = signal.getsignal(signal.SIGWINCH)
+    signal.signal(signal.SIGWINCH, signal.SIG_DFL)
+    yield signal.SIGWINCH
+    signal.signal(signal.SIGWINCH, previous)
+
+
+def test_wrap_and_style_lines() -> None:
+    output = wrap_and_style_lines("short\n" + "word " * 6, dim=True)
+    assert click.unstyle(output).split("\n") == [
+        "    short",
+        "    word word word word",
+        "    word word",
+    ]
+
+
+def test_wrap_and_style_lines_is_cached() -> None:
+    render_block.cache_clear()
+    for _ in range(3):
+        wrap_and_style_lines("traceback", fg="red", dim=True)
+    wrap_and_style_lines("traceback", dim=True, fg="red")
+    assert render_block.cache_info().hits == 3
+
+
+def test_terminal_width_is_not_cached(monkeypatch, sigwinch: signal.Signals) -> None:
+    assert jsonlog_cli.text.terminal_width() == 28
+    monkeypatch.setattr(click, "get_terminal_size", lambda: (100, 24))
+    assert jsonlog_cli.text.terminal_width() == 100
+    # Only the CLI installs a signal handler, not code rendering a block.
+    assert signal.getsignal(sigwinch) is signal.SIG_DFL
+
+
+def test_terminal_width_is_reset(monkeypatch, sigwinch: signal.Signals) -> None:
+    watch_terminal_size()
+    assert signal.getsignal(sigwinch) is reset_terminal_width
+    assert jsonlog_cli.text.terminal_width() == 28
+    monkeypatch.setattr(click, "get_terminal_size", lambda: (100, 24))
+    assert jsonlog_cli.text.terminal_width() == 28
+    reset_terminal_width()
+    assert jsonlog_cli.text.terminal_width() == 100
+
+
+def test_format_multiline_value() -> None:
+    value = {"b": [1, {"c": None}], "a": "x"}
+    assert Pattern.format_multiline_value(value) == json.dumps(value, indent=2)
+    assert indent_json(json.dumps(value)) == json.dumps(value, indent=2)
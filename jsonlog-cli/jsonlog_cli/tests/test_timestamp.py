@@ -0,0 +1,50 @@
+import pytest
+
+from jsonlog_cli.record import Record
+from jsonlog_cli.timestamp import TimestampError, TimestampParser, parse_time
+
+
+@pytest.mark.parametrize(
+    "value,expected",
+    [
+        ("2020-01-01T00:00:00Z", 1577836800.0),
+        ("2020-01-01T00:00:01.5", 1577836801.5),
+        ("2020-01-01 00:00:01,25", 1577836801.25),
+        ("2020-01-01T01:00:00+01:00", 1577836800.0),
+        ("2019-12-31T19:30:00-0430", 1577836800.0),
+        ("2020-01-01T00:00Z", 1577836800.0),
+        (1577836800, 1577836800.0),
+        (1577836800500, 1577836800.5),
+        (1577836800.25, 1577836800.25),
+        ("1577836800", 1577836800.0),
+        (None, None),
+        ("yesterday", None),
+        ("2020-13-01T00:00:00Z", None),
+        ({"nested": True}, None),
+    ],
+)
+def test_parse(value, expected) -> None:
+    parser = TimestampParser("timestamp")
+    assert parser(Record(line="", data={"timestamp": value})) == expected
+
+
+def test_prefix_cache() -> None:
+    parser = TimestampParser("timestamp")
+    assert parser.parse("2020-01-01T00:00:01Z") == 1577836801.0
+    assert parser.parse("2020-01-01T00:00:59.5Z") == 1577836859.5
+    assert parser.prefixes == {("2020-01-01T00:00", "Z"): 1577836800.0}
+
+
+def test_strptime() -> None:
+    parser = TimestampParser("time", format="%d/%m/%Y %H:%M:%S")
+    assert parser(Record(line="", data={"time": "01/01/2020 00:00:10"})) == 1577836810.0
+
+
+def test_parse_time() -> None:
+    assert parse_time("10m", now=1000.0) == 400.0
+    assert parse_time("1.5h", now=10000.0) == 4600.0
+    assert parse_time("2020-01-01T00:00") == 1577836800.0
+    assert parse_time("2020-01-01") == 1577836800.0
+    assert parse_time("1577836800") == 1577836800.0
+    with pytest.raises(TimestampError):
+        parse_time("soon")
@@ -1,8 +1,63 @@
+"""
+Wrap and style blocks of text, such as tracebacks.
+
+The same blocks tend to repeat many times in a log (an error during an incident logs
+the same traceback over and over), so rendered blocks are cached. The CLI also
+caches the terminal's width, reading it again after the terminal is resized (on
+SIGWINCH). Other callers (like `PatternHandler`) read the width each time, as
+installing a signal handler would affect the whole process they're part of.
+"""
+
+import functools
+import signal
 import textwrap
 import typing
 
 import click
 
+# How many rendered blocks are kept.
+CACHE_SIZE = 256
+
+Style = typing.Tuple[typing.Tuple[str, typing.Any], ...]
+
+_terminal_width: typing.Optional[int] = None
+_watching = False
+
+
+def terminal_width() -> int:
+    """Return the terminal's width, only reading it again after a resize if watched."""
+    global _terminal_width
+    if not _watching:
+        width, _ = click.get_terminal_size()
+        return width
+    if _terminal_width is None:
+        _terminal_width, _ = click.get_terminal_size()
+    return _terminal_width
+
+
+def reset_terminal_width(*_: typing.Any) -> None:
+    global _terminal_width
+    _terminal_width = None
+
+
+def watch_terminal_size() -> None:
+    """
+    Cache the terminal's width, resetting it when the terminal is resized.
+
+    Must be called from the main thread. Does nothing if SIGWINCH isn't available or
+    is already in use, leaving the width to be read each time.
+    """
+    global _watching
+    sigwinch = getattr(signal, "SIGWINCH", None)
+    if sigwinch is None:
+        return
+    handler = signal.getsignal(sigwinch)
+    if handler not in (signal.SIG_DFL, None, reset_terminal_width):
+        return
+    signal.signal(sigwinch, reset_terminal_width)
+    reset_terminal_width()
+    _watching = True
+
 
 def wrap_lines(lines: str, width: int) -> typing.Iterable[str]:
     """Split text into lines and wrap them to a specified width."""
@@ -15,10 +70,14 @@ def wrap_lines(lines: str, width: int) -> typing.Iterable[str]:
 
 def wrap_and_style_lines(string: str, indent: int = 4, **style: typing.Any) -> str:
     """Format a block of text with styling, indentation and wrapping."""
-    width, _ = click.get_terminal_size()
-    width = width - (2 * indent)
+    width = terminal_width() - (2 * indent)
+    return render_block(string, width, indent, tuple(sorted(style.items())))
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def render_block(string: str, width: int, indent: int, style: Style) -> str:
     start = " " * indent
-    lines = wrap_lines(string, width)
-    lines = (click.style(line, **style) for line in lines)
-    lines = (start + line for line in lines)
-    return "\n".join(lines)
+    styles = dict(style)
+    return "\n".join(
+        start + click.style(line, **styles) for line in wrap_lines(string, width)
+    )
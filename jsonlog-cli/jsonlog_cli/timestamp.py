@@ -0,0 +1,176 @@
+"""
+Parse timestamps from records into seconds since the epoch.
+
+Timestamps are parsed as ISO 8601 strings (e.g. `2020-01-01T12:00:00.123Z`) or
+numbers of seconds, milliseconds, microseconds or nanoseconds since the epoch, unless
+a `strptime` format is given. Timestamps without a timezone are treated as UTC.
+
+Timestamps in a log are usually close together, and consecutive ISO 8601 timestamps
+almost always share everything up to the minute and their timezone. Each parser
+caches the time that prefix represents, so that most timestamps only need their
+seconds parsed.
+"""
+
+import calendar
+import datetime
+import re
+import time
+import typing
+
+import jsonlog_cli.record
+import jsonlog_cli.types
+
+Timestamp = float
+
+ISO_8601 = re.compile(
+    r"(\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2})"  # Prefix, up to the minute.
+    r"(?::(\d{2}(?:[.,]\d+)?))?"  # Seconds and fractions of a second.
+    r"\s*(Z|z|UTC|[+-]\d{2}(?::?\d{2})?)?$"  # Timezone.
+)
+
+# Numbers larger than these are assumed to be in smaller units than seconds.
+EPOCH_UNITS: typing.Sequence[typing.Tuple[float, float]] = (
+    (1e17, 1e9),  # Nanoseconds.
+    (1e14, 1e6),  # Microseconds.
+    (1e11, 1e3),  # Milliseconds.
+)
+
+CACHE_SIZE = 64
+
+# Dates and durations (times relative to now, e.g. `10m`) for the command line.
+DATE = re.compile(r"\d{4}-\d{2}-\d{2}")
+DURATION = re.compile(r"(\d+(?:\.\d+)?)([smhdw])")
+DURATION_UNITS: typing.Mapping[str, int] = {
+    "s": 1,
+    "m": 60,
+    "h": 60 * 60,
+    "d": 24 * 60 * 60,
+    "w": 7 * 24 * 60 * 60,
+}
+
+
+class TimestampError(ValueError):
+    pass
+
+
+class TimestampParser:
+    """
+    Extracts and parses timestamps from records.
+
+    Create a separate parser for each stream, so that the prefix cache follows the
+    timestamps in that stream.
+    """
+
+    key: str
+    format: typing.Optional[str]
+    prefixes: typing.Dict[typing.Tuple[str, typing.Optional[str]], Timestamp]
+
+    def __init__(self, key: str, format: typing.Optional[str] = None) -> None:
+        self.key = key
+        self.format = format
+        self.prefixes = {}
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.key!r}, format={self.format!r})"
+
+    def __call__(self, record: jsonlog_cli.record.Record) -> typing.Optional[Timestamp]:
+        """Return the timestamp of a record, or None if it doesn't have one."""
+        try:
+            return self.parse(record.extract(self.key))
+        except (TimestampError, ValueError, OverflowError):
+            return None
+
+    def parse(self, value: jsonlog_cli.types.Value) -> typing.Optional[Timestamp]:
+        if value is None or isinstance(value, bool):
+            return None
+
+        if isinstance(value, (int, float)):
+            return parse_epoch(value)
+
+        if not isinstance(value, str):
+            raise TimestampError(f"Can't parse a timestamp from {value!r}")
+
+        if self.format is not None:
+            return parse_strptime(value, self.format)
+
+        match = ISO_8601.match(value)
+        if match is None:
+            return parse_epoch(float(value))
+
+        prefix, seconds, timezone = match.groups()
+        base = self.prefixes.get((prefix, timezone))
+        if base is None:
+            if len(self.prefixes) >= CACHE_SIZE:
+                self.prefixes.clear()
+            base = self.prefixes[prefix, timezone] = parse_prefix(prefix, timezone)
+
+        if seconds is None:
+            return base
+        return base + float(seconds.replace(",", "."))
+
+
+def parse_epoch(value: float) -> Timestamp:
+    """Parse a number of seconds (or smaller units) since the epoch."""
+    for limit, divisor in EPOCH_UNITS:
+        if abs(value) >= limit:
+            return value / divisor
+    return float(value)
+
+
+def parse_prefix(prefix: str, timezone: typing.Optional[str]) -> Timestamp:
+    """Parse the start of an ISO 8601 timestamp, up to the minute."""
+    year, month, day = int(prefix[0:4]), int(prefix[5:7]), int(prefix[8:10])
+    hour, minute = int(prefix[11:13]), int(prefix[14:16])
+    if not (1 <= month <= 12 and 1 <= day <= 31 and hour <= 23 and minute <= 59):
+        raise TimestampError(f"Invalid timestamp {prefix!r}")
+    timestamp = calendar.timegm((year, month, day, hour, minute, 0))
+    return float(timestamp - parse_offset(timezone))
+
+
+def parse_offset(timezone: typing.Optional[str]) -> int:
+    """Parse a timezone into an offset from UTC in seconds."""
+    if timezone is None or timezone in ("Z", "z", "UTC"):
+        return 0
+    sign = -1 if timezone[0] == "-" else 1
+    digits = timezone[1:].replace(":", "")
+    hours, minutes = int(digits[:2]), int(digits[2:] or 0)
+    return sign * (hours * 3600 + minutes * 60)
+
+
+def parse_strptime(value: str, format: str) -> Timestamp:
+    parsed = datetime.datetime.strptime(value, format)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed.timestamp()
+
+
+def parse_time(value: str, now: typing.Optional[Timestamp] = None) -> Timestamp:
+    """
+    Parse a time given on the command line.
+
+    Accepts anything a record's timestamp could be, a date, or a duration before now
+    (e.g. `30s`, `10m`, `2h`, `1d` or `1w`).
+    """
+    value = value.strip()
+    if DURATION.fullmatch(value):
+        return (time.time() if now is None else now) - parse_duration(value)
+
+    if DATE.fullmatch(value):
+        value += "T00:00"
+
+    try:
+        timestamp = TimestampParser("").parse(value)
+    except ValueError:
+        timestamp = None
+    if timestamp is None:
+        raise TimestampError(f"Can't parse a time from {value!r}")
+    return timestamp
+
+
+def parse_duration(value: str) -> float:
+    """Parse a duration (e.g. `30s`, `10m`, `2h`, `1d` or `1w`) into seconds."""
+    match = DURATION.fullmatch(value.strip())
+    if match is None:
+        raise TimestampError(f"Can't parse a duration from {value!r}")
+    amount, unit = match.groups()
+    return float(amount) * DURATION_UNITS[unit]
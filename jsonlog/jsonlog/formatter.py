@@ -62,8 +62,12 @@ class BaseJSONFormatter:
     indent: typing.Optional[int] = dataclasses.field(default=DEFAULT_INDENT)
 
     def format(self, record: logging.LogRecord) -> str:
+        """Formats a LogRecord as JSON."""
+        return json.dumps(self.payload(record), indent=self.indent)
+
+    def payload(self, record: logging.LogRecord) -> JSON:
         """
-        Formats a LogRecord as JSON.
+        Collects the attributes of a LogRecord that are formatted as JSON.
 
         See `Formatter` for a full list of supported attributes. In addition to those
         attributes, `BaseJSONFormatter` modifies, removes or includes these attributes:
@@ -111,9 +115,7 @@ class BaseJSONFormatter:
         # will be included in the JSON object (including attributes from `extra`).
         attrs = self.filter_attrs(attrs)
         extra = self.filter_extra(extra)
-        payload = self.filter_payload({**attrs, **extra})
-
-        return json.dumps(payload, indent=self.indent)
+        return self.filter_payload({**attrs, **extra})
 
     def format_level(self, _levelno: int, levelname: str) -> JSONValue:
         """Format a value describing the log level of the record."""
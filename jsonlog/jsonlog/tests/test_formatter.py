@@ -1,3 +1,4 @@
+import json
 import logging
 
 import jsonlog
@@ -28,6 +29,13 @@ def test_json_keys(record: logging.LogRecord) -> None:
     assert line.startswith('{"level": "INFO", "message": "')
 
 
+def test_json_payload(record: logging.LogRecord) -> None:
+    formatter = jsonlog.formatter.JSONFormatter(keys=["level", "message"])
+    payload = formatter.payload(record)
+    assert payload["level"] == "INFO"
+    assert formatter.format(record) == json.dumps(payload)
+
+
 def test_json_args(capture: jsonlog.tests.capture.Capture):
     jsonlog.basicConfig()
     logging.warning("%s %s", "Hello", "World")